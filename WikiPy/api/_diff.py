@@ -60,7 +60,6 @@ class Diff:
             content1 = list(map(dj_html.escape, content1))
             content2 = list(map(dj_html.escape, content2))
         diff_gen = list(difflib.ndiff(content1, content2, charjunk=lambda _: False))  # Keep all characters
-        print(diff_gen)
         return self.__extract_diff(diff_gen, keep_lines)
 
     # TODO line numbers
@@ -0,0 +1,103 @@
+"""
+This module defines the link batch that resolves the existence of linked pages in bulk.
+
+Rendering internal links requires to know whether their target page exists to render red links.
+Instead of querying the database for each link, the targets of all links of a page are registered
+in a batch before rendering, then resolved at once the first time the existence of one of them is needed.
+Each page context holds its own batch that serves as a lookup table for the whole request.
+Which of the existing targets are redirections is resolved along with their existence, from the redirect table.
+"""
+import typing as typ
+
+from . import pages, titles
+from .. import parser
+
+_Key = typ.Tuple[int, str, bool]
+
+
+class LinkBatch:
+    """Collects page titles and resolves their existence and redirections with a few queries per batch."""
+
+    def __init__(self):
+        self.__titles: typ.Dict[str, typ.Tuple[int, str]] = {}
+        self.__pending: typ.Set[_Key] = set()
+        self.__existence: typ.Dict[_Key, bool] = {}
+        self.__redirects: typ.Set[typ.Tuple[int, str]] = set()
+
+    def split_title(self, page_title: str) -> typ.Tuple[int, str]:
+        """
+        Splits the namespace ID and title from the given full page title.
+        Results are memoized.
+
+        :param page_title: Page’s full title.
+        :return: A tuple containing the namespace ID and the title.
+        """
+        if page_title not in self.__titles:
+            self.__titles[page_title] = titles.extract_namespace_and_title(page_title, ns_as_id=True)
+        return self.__titles[page_title]
+
+    def add(self, page_title: str, talk: bool = False):
+        """
+        Registers a page whose existence will be resolved with the next batch.
+
+        :param page_title: Page’s full title.
+        :param talk: True to register the talk page.
+        """
+        key = (*self.split_title(page_title), talk)
+        if key not in self.__existence:
+            self.__pending.add(key)
+
+    def add_links(self, node: parser.WikicodeNode):
+        """
+        Registers the targets of all internal links in the given node tree.
+
+        :param node: The root node of the tree.
+        """
+        for link in node.get_internal_links():
+            self.add(link.page_title, talk=link.params.get('action') == 'talk')
+
+    def execute(self):
+        """Resolves the existence of all pending pages."""
+        if not self.__pending:
+            return
+        for talk in (False, True):
+            keys = [(ns_id, title) for ns_id, title, t in self.__pending if t == talk]
+            if keys:
+                existing = pages.get_existing_pages(keys, talk=talk)
+                for ns_id, title in keys:
+                    self.__existence[(ns_id, title, talk)] = (ns_id, title) in existing
+                if not talk and existing:
+                    self.__redirects.update(pages.get_redirects_targets(existing))
+        self.__pending.clear()
+
+    def page_exists(self, namespace_id: int, title: str, talk: bool = False) -> bool:
+        """
+        Checks whether a page or its talk page exists.
+        Pending pages are resolved first if the page is not already known.
+
+        :param namespace_id: Page’s namespace ID.
+        :param title: Page’s title.
+        :param talk: True to check the talk page.
+        :return: True if the page exists, false otherwise.
+        """
+        key = (namespace_id, title, talk)
+        if key not in self.__existence:
+            self.__pending.add(key)
+            self.execute()
+        return self.__existence[key]
+
+    def is_redirect(self, namespace_id: int, title: str) -> bool:
+        """
+        Checks whether a page is a redirection.
+        Pending pages are resolved first if the page is not already known.
+
+        :param namespace_id: Page’s namespace ID.
+        :param title: Page’s title.
+        :return: True if the page exists and is a redirection, false otherwise.
+        """
+        return self.page_exists(namespace_id, title) and (namespace_id, title) in self.__redirects
+
+
+__all__ = [
+    'LinkBatch',
+]
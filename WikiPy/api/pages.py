@@ -3,13 +3,18 @@ This module defines functions to interact with pages.
 """
 import dataclasses
 import datetime
+import json
+import logging
 import random
+import time
 import typing as typ
 
 import django.core.paginator as dj_page
+import django.db.models as dj_models
 import django.db.transaction as dj_db_trans
 
-from . import _diff, errors, titles, logs, _action
+from . import _diff, errors, titles, logs, parser_cache, _action
+from . import datetime as api_dt
 from .. import settings, models, special_pages, parser, media_backends, util
 
 page_title_validator = models.page_title_validator
@@ -28,16 +33,43 @@ def page_exists(namespace_id: int, title: str, talk: bool = False) -> bool:
     :param talk: True to check the talk page.
     :return: True if the page exists, false otherwise.
     """
-    if namespace_id != settings.SPECIAL_NS.id:
+    return (namespace_id, title) in get_existing_pages([(namespace_id, title)], talk=talk)
+
+
+def get_existing_pages(pages: typ.Iterable[typ.Tuple[int, str]], talk: bool = False) -> typ.Set[typ.Tuple[int, str]]:
+    """
+    Checks which of the given pages or their talk pages exist. Works for both special and normal pages.
+    Performs a single DB query for all normal pages.
+
+    A talk page exists if it has at least one topic that is not deleted.
+
+    :param pages: A collection of (namespace ID, title) tuples.
+    :param talk: True to check the talk pages.
+    :return: The set of (namespace ID, title) tuples among the given ones for which the page exists.
+    """
+    existing = set()
+    titles_by_ns: typ.Dict[int, typ.Set[str]] = {}
+    for namespace_id, title in pages:
+        if namespace_id == settings.SPECIAL_NS.id:
+            if special_pages.get_special_page(titles.get_special_page_title(title)) is not None:
+                existing.add((namespace_id, title))
+        else:
+            titles_by_ns.setdefault(namespace_id, set()).add(title)
+
+    if titles_by_ns:
         if talk:
-            return len(get_messages_for_page(namespace_id, title, performer=None, ignore_hidden_topics=True)) != 0
+            query = dj_models.Q()
+            for namespace_id, ns_titles in titles_by_ns.items():
+                query |= dj_models.Q(page_namespace_id=namespace_id, page_title__in=ns_titles)
+            existing.update(models.TalkTopic.objects.filter(query, deleted=False)
+                            .values_list('page_namespace_id', 'page_title').distinct())
         else:
-            try:
-                page = models.Page.objects.get(namespace_id=namespace_id, title=title)
-            except models.Page.DoesNotExist:
-                return False
-            return page.exists
-    return special_pages.get_special_page(titles.get_special_page_title(title)) is not None
+            query = dj_models.Q()
+            for namespace_id, ns_titles in titles_by_ns.items():
+                query |= dj_models.Q(namespace_id=namespace_id, title__in=ns_titles)
+            existing.update(models.Page.objects.filter(query, deleted=False).values_list('namespace_id', 'title'))
+
+    return existing
 
 
 def paginate(current_user: models.User, values: typ.Iterable[typ.Any], url_params: typ.Dict[str, str]) \
@@ -181,6 +213,91 @@ def get_redirect(wikicode: str) -> typ.Optional[typ.Tuple[str, typ.Optional[str]
     return parser.WikicodeParser.get_redirect(wikicode)
 
 
+class RedirectTarget(typ.NamedTuple):
+    """The target of a redirection, as stored in the redirect table."""
+    namespace_id: int
+    title: str
+    anchor: typ.Optional[str]
+
+    @property
+    def full_title(self) -> str:
+        """The full title of the target page."""
+        return titles.get_full_page_title(self.namespace_id, self.title)
+
+
+def get_redirect_target(wikicode: str) -> typ.Optional[RedirectTarget]:
+    """
+    If the given wikicode is a redirection, returns its target with a normalized namespace and title.
+
+    :param wikicode: The wikicode.
+    :return: The target if the wikicode is a redirection to a valid title; None otherwise.
+    """
+    if not (redirect := get_redirect(wikicode)):
+        return None
+    page_title, anchor = redirect
+    try:
+        namespace_id, title = titles.extract_namespace_and_title(
+            titles.get_actual_page_title(titles.title_from_url(page_title)),
+            ns_as_id=True
+        )
+    except (errors.EmptyPageTitleError, errors.BadTitleError):
+        return None
+    return RedirectTarget(namespace_id, title, anchor)
+
+
+def get_redirects_targets(pages: typ.Iterable[typ.Tuple[int, str]]) \
+        -> typ.Dict[typ.Tuple[int, str], RedirectTarget]:
+    """
+    Returns the targets of the given pages that are redirections, using the redirect table.
+    Performs a single DB query for all pages and does not load any revision.
+
+    :param pages: A collection of (namespace ID, title) tuples.
+    :return: A dictionary mapping the (namespace ID, title) tuples of the redirection pages among the given ones
+        to their target.
+    """
+    titles_by_ns: typ.Dict[int, typ.Set[str]] = {}
+    for namespace_id, title in pages:
+        titles_by_ns.setdefault(namespace_id, set()).add(title)
+    if not titles_by_ns:
+        return {}
+
+    query = dj_models.Q()
+    for namespace_id, ns_titles in titles_by_ns.items():
+        query |= dj_models.Q(page__namespace_id=namespace_id, page__title__in=ns_titles)
+    rows = models.Redirect.objects.filter(query, page__deleted=False).values_list(
+        'page__namespace_id', 'page__title', 'target_namespace_id', 'target_title', 'target_anchor')
+    return {(namespace_id, title): RedirectTarget(*target) for namespace_id, title, *target in rows}
+
+
+def resolve_redirects(namespace_id: int, title: str, visited: typ.Iterable[typ.Tuple[int, str]] = (),
+                      performer: models.User = None) -> typ.List[RedirectTarget]:
+    """
+    Follows the chain of redirections that starts from the given page, using the redirect table.
+    Each redirection is resolved with one indexed query, no revision is loaded.
+    The chain stops before a page that was already visited, after settings.MAX_REDIRECTS_DEPTH redirections
+    or at the first page the performer cannot read, whose redirection is not followed.
+
+    :param namespace_id: Namespace ID of the first page.
+    :param title: Title of the first page.
+    :param visited: Pages already visited in the chain as (namespace ID, title) tuples, if it is being continued.
+    :param performer: If specified, the user whose read rights are checked for each page of the chain.
+    :return: The targets of the followed redirections, in order. Empty if the page is not a redirection
+        or redirects to a visited page.
+    """
+    visited = {(namespace_id, title), *visited}
+    targets = []
+    for _ in range(settings.MAX_REDIRECTS_DEPTH):
+        target = get_redirects_targets([(namespace_id, title)]).get((namespace_id, title))
+        if not target or (target.namespace_id, target.title) in visited:
+            break
+        targets.append(target)
+        namespace_id, title = target.namespace_id, target.title
+        visited.add((namespace_id, title))
+        if performer and not performer.can_read_page(namespace_id, title):
+            break
+    return targets
+
+
 # endregion
 # region Subpages
 
@@ -278,6 +395,61 @@ def get_default_content_model(namespace_id: int, title: str):
     return content_model
 
 
+def get_transcluding_pages(namespace_id: int, title: str) -> dj_models.QuerySet:
+    """
+    Returns all pages that transclude the given page, either directly or through other templates.
+
+    :param namespace_id: Namespace ID of the transcluded page.
+    :param title: Title of the transcluded page.
+    :return: The query set of pages that transclude the page.
+    """
+    return models.Page.objects.filter(templatelink__template_namespace_id=namespace_id,
+                                      templatelink__template_title=title)
+
+
+def get_all_linking_pages(namespace_id: int, title: str) -> dj_models.QuerySet:
+    """
+    Returns all pages that link to the given page. If it is a file page, pages that embed the file are included.
+
+    :param namespace_id: Namespace ID of the linked page.
+    :param title: Title of the linked page.
+    :return: The query set of pages that link to the page.
+    """
+    links = models.PageLink.objects.filter(target_namespace_id=namespace_id, target_title=title)
+    query = dj_models.Q(id__in=links.values('page_id'))
+    if namespace_id == settings.FILE_NS.id:
+        query |= dj_models.Q(id__in=models.FileLink.objects.filter(file_name=title).values('page_id'))
+    return models.Page.objects.filter(query)
+
+
+def get_linking_pages(namespace_id: int, title: str, from_page_id: int = 0, limit: int = 50) \
+        -> typ.Tuple[typ.List[models.Page], typ.Optional[int]]:
+    """
+    Returns the pages that link to the given page. If it is a file page, pages that embed the file are included.
+    Pages are sorted by ID and paginated by keyset: each page of results starts after the ID
+    of the last page of the previous one.
+
+    :param namespace_id: Namespace ID of the linked page.
+    :param title: Title of the linked page.
+    :param from_page_id: Only pages with a greater ID will be returned.
+    :param limit: The maximum number of pages to return.
+    :return: The list of linking pages and the ID to start the next results from,
+        or None if there are no more results.
+    """
+    queries = [models.PageLink.objects.filter(target_namespace_id=namespace_id, target_title=title)]
+    if namespace_id == settings.FILE_NS.id:
+        queries.append(models.FileLink.objects.filter(file_name=title))
+    page_ids = set()
+    for query in queries:
+        page_ids.update(query.filter(page_id__gt=from_page_id).order_by('page_id')
+                        .values_list('page_id', flat=True)[:limit + 1])
+    page_ids = sorted(page_ids)
+    has_more = len(page_ids) > limit
+    page_ids = page_ids[:limit]
+    pages = [page.lock() for page in models.Page.objects.filter(id__in=page_ids).order_by('id')]
+    return pages, page_ids[-1] if has_more else None
+
+
 # endregion
 # region Revisions
 
@@ -370,6 +542,50 @@ def get_page_revision(namespace_id: int, title: str, *, performer: models.User =
         return None
 
 
+@_action.api_action(settings.RIGHT_READ_PAGES)
+def get_latest_revisions(pages: typ.Iterable[typ.Tuple[int, str]], *, performer: models.User = None) \
+        -> typ.Dict[typ.Tuple[int, str], typ.Optional[models.PageRevision]]:
+    """
+    Returns the latest non-hidden revision of each of the given pages.
+    Behaves like get_page_revision but fetches all pages and revisions with only two queries.
+
+    :param pages: The pages to get the latest revision of, as (namespace ID, title) tuples.
+    :param performer: The user requesting the revisions. Should ALWAYS be specified outside of API.
+    :return: A dictionary mapping each page to its latest revision
+        or None if the page does not exist or the user is not allowed to read it.
+    :raises RevisionDoesNotExistError: If all revisions of one of the pages are hidden.
+    """
+    revisions = dict.fromkeys(pages)
+    readable = [(ns_id, title) for ns_id, title in revisions
+                if ns_id != settings.SPECIAL_NS.id and (not performer or performer.can_read_page(ns_id, title))]
+    if not readable:
+        return revisions
+
+    query = dj_models.Q()
+    for ns_id, title in readable:
+        query |= dj_models.Q(namespace_id=ns_id, title=title)
+    latest_revision = (models.PageRevision.objects.filter(page=dj_models.OuterRef('pk'), hidden=False)
+                       .order_by('-date').values('id')[:1])
+    pages_ = (models.Page.objects.filter(query, deleted=False)
+              .annotate(latest_revision_id=dj_models.Subquery(latest_revision)))
+    latest_revisions_ids = {(page.namespace_id, page.title): page.latest_revision_id for page in pages_}
+    if None in latest_revisions_ids.values():
+        raise errors.RevisionDoesNotExistError(None)
+
+    revisions_by_id = models.PageRevision.objects.in_bulk(latest_revisions_ids.values())
+    for page, revision_id in latest_revisions_ids.items():
+        revision = revisions_by_id[revision_id]
+        revision.lock()
+        if performer and not performer.has_right(settings.RIGHT_DELETE_REVISIONS):
+            if revision.author_hidden:
+                revision.author = None
+            if revision.comment_hidden:
+                revision.comment = None
+        revisions[page] = revision
+
+    return revisions
+
+
 @_action.api_action(settings.RIGHT_READ_PAGES)
 def get_page_revisions(page: models.Page, *, performer: models.User) -> typ.List[models.PageRevision]:
     """
@@ -493,8 +709,8 @@ def get_subcategories(category_title: str) -> typ.Sequence[typ.Tuple[models.Page
 # region Page operations
 
 
-def render_wikicode(wikicode: str, context, no_redirect: bool = False, enable_comment: bool = False) \
-        -> typ.Union[str, typ.Tuple[str, bool]]:
+def render_wikicode(wikicode: str, context, no_redirect: bool = False, enable_comment: bool = False,
+                    parser_: parser.WikicodeParser = None) -> typ.Union[str, typ.Tuple[str, bool]]:
     """
     Renders the given parsed wikicode.
     :param wikicode: The wikicode to render.
@@ -503,18 +719,322 @@ def render_wikicode(wikicode: str, context, no_redirect: bool = False, enable_co
     :param no_redirect: If true and the wikicode is a redirection,
                         it will be rendered instead of rendering the page it points to.
     :param enable_comment: If true, the generation comment will be appended to the rendered HTML.
+    :param parser_: The parser to use. Useful to inspect it after the render. If None, a new one will be used.
     :return: The wikicode rendered as HTML. If no_redirect is true, a boolean will also be returned, indicating whether
              the code is a redirection or not.
     """
-    p = parser.WikicodeParser()
+    p = parser_ or parser.WikicodeParser()
     parsed_wikicode = p.parse_wikicode(wikicode, context, no_redirect=no_redirect)
-    render = context.skin.render_wikicode(parsed_wikicode, context, enable_comment=enable_comment)
+    render = context.skin.render_wikicode(parsed_wikicode, context, enable_comment=enable_comment, profile=p.profile)
+    _log_parser_profile(p, context)
 
     if no_redirect:
         return render, isinstance(parsed_wikicode, parser.RedirectNode)
     return render
 
 
+def _log_parser_profile(parser_: parser.WikicodeParser, context):
+    """
+    Logs the profile of the given parser, if profiling was enabled.
+
+    :param parser_: The parser to log the profile of.
+    :param context: The context of the page that was rendered.
+    :type context: WikiPy.page_context.PageContext
+    """
+    if parser_.profile:
+        page_title = titles.get_full_page_title(context.page.namespace_id, context.page.title)
+        logging.info(f'Parser profile: {json.dumps({"page": page_title, **parser_.profile.to_dict()})}')
+
+
+def iter_sections(wikicode: str, context) -> typ.Iterator[typ.Union[str, parser_cache.CachedSection]]:
+    """
+    Parses and renders each section of the given wikicode separately, lazily.
+    Sections found in the parser cache are reused, the others are parsed and then stored in the cache.
+
+    For each section, the chunks of its render are yielded as soon as they are rendered,
+    followed by the section’s complete output. Cached sections are yielded as a single chunk.
+
+    The parser resource limits apply to the whole page: all sections share the same budget,
+    to which the cost of cached sections is added too. Once a limit is exceeded, the remaining sections are skipped.
+
+    :param wikicode: The wikicode to parse.
+    :param context: The context to use for the render.
+    :type context: WikiPy.page_context.PageContext
+    :return: A generator of render chunks (str) and section outputs (CachedSection), in order.
+        Blank parts are skipped.
+    """
+    budget = parser.ParserBudget()
+    header, sections = parser.WikicodeParser.split_sections(wikicode)
+    for part in [header, *sections.values()]:
+        if budget.limit_exceeded:
+            break
+        if not part.strip():
+            continue
+        # A cached section that would exceed the budget is parsed again to get the truncated output
+        if (output := parser_cache.get_section(part, context)) and budget.fits(output.cost):
+            budget.add(output.cost)
+            yield output.render
+        else:
+            counters = budget.counters
+            p = parser.WikicodeParser(budget=budget)
+            parsed_part = p.parse_wikicode(part, context, no_redirect=True)
+            chunks = []
+            for chunk in context.skin.render_wikicode_chunks(parsed_part, context, profile=p.profile):
+                chunks.append(chunk)
+                yield chunk
+            _log_parser_profile(p, context)
+            output = parser_cache.CachedSection(
+                render=''.join(chunks),
+                categories=p.categories,
+                templates=frozenset(p.templates),
+                links=frozenset(_get_link_targets(
+                    [*(link.page_title for link in parsed_part.get_internal_links()), *p.links])),
+                files=frozenset(file.file_name for file in parsed_part.get_files()),
+                volatility=frozenset(p.volatility),
+                max_depth_reached=p.max_depth_reached,
+                too_many_redirects=p.too_many_redirects,
+                circular_transclusion=p.circular_transclusion_detected,
+                called_non_existant_template=p.called_non_existant_template,
+                limit_exceeded=p.limit_exceeded,
+                date=api_dt.now(),
+                cost=tuple(after - before for before, after in zip(counters, budget.counters)),
+            )
+            # The output of a section that exceeded a limit depends on the budget used by the previous ones
+            if not p.limit_exceeded:
+                parser_cache.save_section(part, context, output)
+        yield output
+
+
+def _get_link_targets(pages_titles: typ.Iterable[str]) -> typ.Set[typ.Tuple[int, str]]:
+    """
+    Returns the pages the given internal links point to. Special pages are ignored.
+
+    :param pages_titles: The full titles of the links’ targets.
+    :return: The set of (namespace ID, title) tuples of the linked pages.
+    """
+    targets = set()
+    for page_title in pages_titles:
+        ns_id, title = titles.extract_namespace_and_title(page_title, ns_as_id=True)
+        if ns_id != settings.SPECIAL_NS.id and title:
+            targets.add((ns_id, title))
+    return targets
+
+
+def parse_sections(wikicode: str, context) -> typ.List[parser_cache.CachedSection]:
+    """
+    Parses and renders each section of the given wikicode separately.
+    Sections found in the parser cache are reused, the others are parsed and then stored in the cache.
+
+    :param wikicode: The wikicode to parse.
+    :param context: The context to use for the render.
+    :type context: WikiPy.page_context.PageContext
+    :return: The output of the text before the first section followed by those of each section, in order.
+        Blank parts are skipped.
+    """
+    return [output for output in iter_sections(wikicode, context)
+            if isinstance(output, parser_cache.CachedSection)]
+
+
+@dataclasses.dataclass(frozen=True)
+class PageLinksData:
+    """The data derived from the wikicode of a page that is stored in the categories, links and redirect tables."""
+    categories: typ.Dict[str, str]
+    templates: typ.FrozenSet[typ.Tuple[int, str]]
+    links: typ.FrozenSet[typ.Tuple[int, str]]
+    files: typ.FrozenSet[str]
+    redirect: typ.Optional[RedirectTarget] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class ParserOutput:
+    """
+    The output of the parse of the whole wikicode of a page, made of the outputs of its sections.
+    The render includes the generation comment if it was requested.
+    """
+    render: str
+    sections: typ.Tuple[parser_cache.CachedSection, ...]
+
+    @property
+    def categories(self) -> typ.Dict[str, str]:
+        """The categories of all sections and their sort keys."""
+        return {name: sort_key for section in self.sections for name, sort_key in section.categories.items()}
+
+    @property
+    def templates(self) -> typ.FrozenSet[typ.Tuple[int, str]]:
+        """The templates transcluded by all sections."""
+        return frozenset(template for section in self.sections for template in section.templates)
+
+    @property
+    def links(self) -> typ.FrozenSet[typ.Tuple[int, str]]:
+        """The pages linked by all sections."""
+        return frozenset(link for section in self.sections for link in section.links)
+
+    @property
+    def files(self) -> typ.FrozenSet[str]:
+        """The files embedded by all sections."""
+        return frozenset(file_name for section in self.sections for file_name in section.files)
+
+    @property
+    def volatility(self) -> typ.Set[str]:
+        """The volatilities of the magic keywords used by all sections."""
+        return {volatility for section in self.sections for volatility in section.volatility}
+
+    @property
+    def max_depth_reached(self) -> bool:
+        """Whether the maximum transclusion depth was reached in any section."""
+        return any(section.max_depth_reached for section in self.sections)
+
+    @property
+    def too_many_redirects(self) -> bool:
+        """Whether too many redirections were followed in any section."""
+        return any(section.too_many_redirects for section in self.sections)
+
+    @property
+    def circular_transclusion(self) -> bool:
+        """Whether a circular transclusion was detected in any section."""
+        return any(section.circular_transclusion for section in self.sections)
+
+    @property
+    def called_non_existant_template(self) -> bool:
+        """Whether any section called a template that does not exist."""
+        return any(section.called_non_existant_template for section in self.sections)
+
+    @property
+    def limit_exceeded(self) -> typ.Optional[str]:
+        """The first parser limit that was exceeded in any section, or None if none was."""
+        return next((section.limit_exceeded for section in self.sections if section.limit_exceeded), None)
+
+    @property
+    def links_data(self) -> PageLinksData:
+        """The data to store in the categories and links tables."""
+        return PageLinksData(categories=self.categories, templates=self.templates, links=self.links,
+                             files=self.files)
+
+
+def parse_page(wikicode: str, context, enable_comment: bool = False) -> ParserOutput:
+    """
+    Parses and renders the given wikicode section by section, reusing the cached outputs of unchanged sections.
+    Each section is rendered as a separate document, the wikicode should not be a redirection.
+
+    :param wikicode: The wikicode to parse.
+    :param context: The context to use for the render.
+    :type context: WikiPy.page_context.PageContext
+    :param enable_comment: If true, the generation comment will be appended to the rendered HTML.
+    :return: The output of all sections.
+    """
+    start = time.time()
+    sections = tuple(parse_sections(wikicode, context))
+    render = ''.join(section.render for section in sections)
+    if enable_comment:
+        render += context.skin.get_generation_comment(context, (time.time() - start) * 1000)
+    return ParserOutput(render=render, sections=sections)
+
+
+def render_sections(wikicode: str, context, enable_comment: bool = False) -> typ.Tuple[str, typ.Set[str]]:
+    """
+    Renders the given wikicode section by section, reusing the cached renders of unchanged sections.
+    Each section is rendered as a separate document, the wikicode should not be a redirection.
+
+    :param wikicode: The wikicode to render.
+    :param context: The context to use for the render.
+    :type context: WikiPy.page_context.PageContext
+    :param enable_comment: If true, the generation comment will be appended to the rendered HTML.
+    :return: The wikicode rendered as HTML and the volatilities of all sections.
+    """
+    output = parse_page(wikicode, context, enable_comment=enable_comment)
+    return output.render, output.volatility
+
+
+def get_page_links_data(wikicode: str, context) -> PageLinksData:
+    """
+    Extracts the categories and links of each section of the given wikicode, like parse_sections,
+    but without building node trees, without rendering and without using the parser cache.
+    The redirection target is extracted too if the wikicode is a redirection.
+
+    :param wikicode: The wikicode to scan.
+    :param context: The context to use for the expansion of templates.
+    :type context: WikiPy.page_context.PageContext
+    :return: The categories and links of the wikicode.
+    """
+    categories = {}
+    templates = set()
+    links = set()
+    files = set()
+    # As for renders, the parser resource limits apply to the whole page
+    budget = parser.ParserBudget()
+    header, sections = parser.WikicodeParser.split_sections(wikicode)
+    for part in [header, *sections.values()]:
+        if budget.limit_exceeded:
+            break
+        if not part.strip():
+            continue
+        p = parser.WikicodeParser(budget=budget)
+        metadata = p.extract_metadata(part, context)
+        categories.update(metadata.categories)
+        templates.update(p.templates)
+        links.update(_get_link_targets(metadata.links | p.links))
+        files.update(metadata.files)
+    return PageLinksData(categories=categories, templates=frozenset(templates), links=frozenset(links),
+                         files=frozenset(files), redirect=get_redirect_target(wikicode))
+
+
+@dj_db_trans.atomic
+def set_pages_links_data(pages_data: typ.Dict[int, PageLinksData]):
+    """
+    Replaces the categories, links and redirection targets of the given pages.
+    Only the rows that changed are written, with a few bulk queries for all pages.
+
+    :param pages_data: A dictionary mapping page IDs to their new categories and links.
+    """
+    current_categories = {(pc.page_id, pc.category_name): pc
+                          for pc in models.PageCategory.objects.filter(page_id__in=pages_data)}
+    created_categories = []
+    updated_categories = []
+    for page_id, data in pages_data.items():
+        for category_name, sort_key in data.categories.items():
+            if pc := current_categories.pop((page_id, category_name), None):
+                if pc.sort_key != sort_key:
+                    pc.sort_key = sort_key
+                    updated_categories.append(pc)
+            else:
+                created_categories.append(models.PageCategory(page_id=page_id, category_name=category_name,
+                                                              sort_key=sort_key))
+    models.PageCategory.objects.bulk_create(created_categories)
+    models.PageCategory.objects.bulk_update(updated_categories, ['sort_key'])
+    # Categories that are still in the dict were removed
+    if current_categories:
+        models.PageCategory.objects.filter(id__in=[pc.id for pc in current_categories.values()]).delete()
+
+    _set_pages_rows(models.TemplateLink, ('template_namespace_id', 'template_title'),
+                    {page_id: data.templates for page_id, data in pages_data.items()})
+    _set_pages_rows(models.PageLink, ('target_namespace_id', 'target_title'),
+                    {page_id: data.links for page_id, data in pages_data.items()})
+    _set_pages_rows(models.FileLink, ('file_name',),
+                    {page_id: {(file_name,) for file_name in data.files} for page_id, data in pages_data.items()})
+    _set_pages_rows(models.Redirect, ('target_namespace_id', 'target_title', 'target_anchor'),
+                    {page_id: [data.redirect] if data.redirect else [] for page_id, data in pages_data.items()})
+
+
+def _set_pages_rows(model: typ.Type[models.LockableModel], fields: typ.Tuple[str, ...],
+                    pages_rows: typ.Dict[int, typ.Collection[typ.Tuple]]):
+    """
+    Replaces the rows of the given pages in a table that associates pages with values.
+
+    :param model: The model class of the table.
+    :param fields: The names of the fields that hold the values.
+    :param pages_rows: A dictionary mapping page IDs to the tuples of values of their rows, in the order of fields.
+    """
+    current_rows = {(page_id, *values): row_id for row_id, page_id, *values
+                    in model.objects.filter(page_id__in=pages_rows).values_list('id', 'page_id', *fields)}
+    rows = {(page_id, *values) for page_id, page_rows in pages_rows.items() for values in page_rows}
+    # Removed rows are deleted first as they may conflict with new ones in tables with one row per page
+    if removed_rows := [row_id for row, row_id in current_rows.items() if row not in rows]:
+        model.objects.filter(id__in=removed_rows).delete()
+    model.objects.bulk_create([
+        model(page_id=row[0], **dict(zip(fields, row[1:]))) for row in rows - current_rows.keys()
+    ])
+
+
 # TODO handle conflicts
 @_action.api_action(settings.RIGHT_EDIT_PAGES)
 @dj_db_trans.atomic
@@ -565,24 +1085,6 @@ def submit_page_content(context, namespace_id: int, title: str,
         cd.maintenance = maintenance_category
         cd.save()
 
-    def _set_page_categories(categories: typ.Dict[str, str]):
-        # Add/update categories
-        for category_name, sort_key in categories.items():
-            pc, created = models.PageCategory.objects.get_or_create(
-                page=page,
-                category_name=category_name,
-                defaults={
-                    'sort_key': sort_key,
-                }
-            )
-            if not created:
-                pc.sort_key = sort_key
-            pc.save()
-        # Delete all categories that were removed
-        for pc in models.PageCategory.objects.filter(page=page):
-            if pc.category_name not in categories:
-                pc.delete()
-
     def _edit_size(old_text: str, new_text: str) -> int:
         return len(new_text.encode('UTF-8')) - len(old_text.encode('UTF-8'))
 
@@ -592,31 +1094,77 @@ def submit_page_content(context, namespace_id: int, title: str,
     wikicode = wikicode.replace('\r\n', '\n')
     if section_id is not None:
         header, sections = parser.WikicodeParser.split_sections(prev_content)
-        sections[section_id] = wikicode
+        if section_id == 0:
+            header = wikicode
+        else:
+            sections[section_id] = wikicode
         new_content = parser.WikicodeParser.paste_sections(header, sections)
     else:
         new_content = wikicode
 
-    parser_ = parser.WikicodeParser()
-    parser_.parse_wikicode(wikicode, context, no_redirect=True)
-    # TODO categorize errors
-    # cf. https://en.wikipedia.org/wiki/Category:Pages_where_template_include_size_is_exceeded
-    too_many_transclusions = parser_.max_depth_reached
-    too_many_redirects = parser_.too_many_redirects
-    circular_transclusion = parser_.circular_transclusion_detected
-    called_missing_template = parser_.called_non_existant_template
-    _set_page_categories(parser_.categories)
-
+    revision = latest_revision
     if not latest_revision or prev_content != new_content:
-        size = _edit_size(prev_content, wikicode)
-        revision = models.PageRevision(page=page, author=context.user.django_user, content=wikicode, comment=comment,
-                                       minor=minor, diff_size=size)
+        size = _edit_size(prev_content, new_content)
+        revision = models.PageRevision(page=page, author=context.user.django_user, content=new_content,
+                                       comment=comment, minor=minor, diff_size=size)
         revision.save()
+
+    from .. import page_context
+    # Parse with the saved revision so that revision magic keywords refer to it instead of the previous one.
+    # Only the sections that changed are actually parsed, the others are fetched from the parser cache.
+    revision_context = page_context.RevisionPageContext(context, wikicode=new_content, revision=revision)
+    output = parse_page(new_content, revision_context, enable_comment=True)
+    # TODO categorize errors
+    # cf. https://en.wikipedia.org/wiki/Category:Pages_where_template_include_size_is_exceeded
+    too_many_transclusions = output.max_depth_reached
+    too_many_redirects = output.too_many_redirects
+    circular_transclusion = output.circular_transclusion
+    called_missing_template = output.called_non_existant_template
+    limit_exceeded = output.limit_exceeded
+    set_pages_links_data({page.id: dataclasses.replace(output.links_data, redirect=get_redirect_target(new_content))})
+
+    if revision is not latest_revision:
+        parser_cache.invalidate_pages(get_transcluding_pages(namespace_id, title))
+        # Links to the page change color when it is created and get a class when it becomes or stops being a redirect
+        if not latest_revision or bool(get_redirect(prev_content)) != bool(get_redirect(new_content)):
+            parser_cache.invalidate_pages(get_all_linking_pages(namespace_id, title))
+        # The page is most likely viewed right after the edit, store the render so that this view is a cache hit.
+        # Redirections are rendered as a whole by page views, not section by section.
+        if not get_redirect(new_content):
+            parser_cache.save_render(revision, revision_context, output.render, False, volatility=output.volatility)
         if not latest_revision:
             logs.add_log_entry(models.LOG_PAGE_CREATION, context.user, page_namespace_id=page.namespace_id,
                                page_title=page.title, reason=comment)
 
 
+def _get_page_context(context, namespace_id: int, title: str, user: models.User):
+    """
+    Returns the context of the given page as seen by the given user when editing it,
+    with the same request, language and skin as the given context.
+
+    :param context: The current page context.
+    :type context: WikiPy.page_context.PageContext
+    :param namespace_id: Page’s namespace ID.
+    :param title: Page’s title.
+    :param user: The user the context is for.
+    :return: The page’s context.
+    :rtype: WikiPy.page_context.PageContext
+    """
+    from .. import page_handlers
+
+    page_context, _ = page_handlers.ActionHandler(
+        action=page_handlers.ACTION_EDIT,
+        request=context.request,
+        namespace_id=namespace_id,
+        title=title,
+        user=user,
+        language=context.language,
+        skin_id=context.skin.id,
+        redirect_enabled=False
+    ).get_page_context()
+    return page_context
+
+
 @_action.api_action(settings.RIGHT_READ_PAGES)
 @dj_db_trans.atomic
 def rename_page(context, old_namespace_id: int, old_title: str, new_namespace_id: int, new_title: str,
@@ -656,12 +1204,31 @@ def rename_page(context, old_namespace_id: int, old_title: str, new_namespace_id
     if not performer.can_edit_page(new_page.namespace_id, new_page.title)[0]:
         raise errors.PageRenameForbiddenError(current_page, 'target edit forbidden')
 
-    # Copy page revisions
-    for revision in get_page_revisions(current_page, performer=performer):
+    # Pages returned by get_page() are locked, the new page is saved from a fresh instance
+    new_page = _get_page(new_page.namespace_id, new_page.title) or models.Page(
+        namespace_id=new_page.namespace_id,
+        title=new_page.title,
+        content_model=current_page.content_model,
+        content_language_code=current_page.content_language_code
+    )
+    new_page.deleted = False
+    new_page.save()
+    # Copy page revisions, with their hidden fields, from unlocked instances
+    for revision in models.PageRevision.objects.filter(page_id=current_page.id).order_by('id'):
+        date = revision.date
         # Set id to None then save to clone model instance
         revision.id = None
         revision.page = new_page
         revision.save()
+        # The date is reset by auto_now_add on creation
+        models.PageRevision.objects.filter(id=revision.id).update(date=date)
+    # Copied revisions are not parsed, the rows derived from the wikicode have to be written for the new page.
+    # The given context is not the new page’s, page-dependent keywords and relative links would use the wrong title.
+    if latest_revision := new_page.latest_revision:
+        new_page_context = _get_page_context(context, new_page.namespace_id, new_page.title, performer)
+        set_pages_links_data({new_page.id: get_page_links_data(latest_revision.content, new_page_context)})
+    parser_cache.invalidate_pages(get_transcluding_pages(new_page.namespace_id, new_page.title))
+    parser_cache.invalidate_pages(get_all_linking_pages(new_page.namespace_id, new_page.title))
 
     if move_talks:
         # TODO move talk page
@@ -671,9 +1238,9 @@ def rename_page(context, old_namespace_id: int, old_title: str, new_namespace_id
     if create_redirection or not performer.has_right(settings.RIGHT_DELETE_PAGES):
         wikicode = f'@REDIRECT[[{new_page.full_title}]]'
         comment = reason
-        current_revision_id = get_page_revision(current_page.namespace_id, current_page.title, performer=performer)
-        submit_page_content(context, current_page.namespace_id, current_page.title, wikicode, comment,
-                            current_revision_id=current_revision_id, performer=performer)
+        current_revision = get_page_revision(current_page.namespace_id, current_page.title, performer=performer)
+        submit_page_content(context, current_page.namespace_id, current_page.title, wikicode, comment, False,
+                            current_revision_id=current_revision.id, performer=performer)
     else:
         # TODO delete the old page
         pass
@@ -686,7 +1253,8 @@ def rename_page(context, old_namespace_id: int, old_title: str, new_namespace_id
         new_page_namespace_id=new_page.namespace_id,
         new_page_title=new_page.title,
         reason=reason,
-        created_redirection=create_redirection
+        created_redirection=create_redirection,
+        moved_talks=move_talks
     )
 
 
@@ -839,6 +1407,82 @@ def restore_message(message_id: int, *, performer: models.User):
     pass  # TODO
 
 
+# endregion
+# region Side menus
+
+SIDE_MENUS_PAGE_TITLE = 'SideMenus'
+
+
+class SideMenuEntry(typ.NamedTuple):
+    """
+    An entry of a side menu defined in the WikiPy:SideMenus page.
+    The URL is either the ID of an item of the page template or the full title of the linked page.
+    """
+    url: str
+    text: str
+
+    @property
+    def page_title(self) -> str:
+        """The full title of the linked page, without the anchor."""
+        return self.url.split('#', maxsplit=1)[0]
+
+
+# Side menus of the WikiPy:SideMenus page, shared by all requests handled by this process,
+# and the ID of the revision they were parsed from. None if the page has not been parsed yet.
+_side_menus: typ.Optional[typ.Tuple[typ.Optional[int], typ.Dict[str, typ.Tuple[SideMenuEntry, ...]]]] = None
+
+
+def get_side_menus(context=None) -> typ.Dict[str, typ.Tuple[SideMenuEntry, ...]]:
+    """
+    Returns the side menus defined in the WikiPy:SideMenus page.
+    The page is parsed once per process then cached. The cache is checked against the ID of the page’s latest
+    revision with a single indexed query, so that edits made through any process are seen by all of them.
+    If a page context is given, the checked menus are kept in it and that query is run only once per request.
+
+    Lines starting with a single “*” declare a menu, lines starting with “**” declare an entry of the last menu
+    as either “<url>” or “<url>|<text>”. The special URL “main_page” links to the main page.
+
+    :param context: Context of the page being rendered, if any.
+    :type context: WikiPy.page_context.PageContext
+    :return: A dictionary mapping the names of the menus to their entries, in the order of the page.
+    """
+    if context is not None:
+        if 'side_menus' not in context.request_memo:
+            context.request_memo['side_menus'] = get_side_menus()
+        return context.request_memo['side_menus']
+
+    global _side_menus
+    revision_id = (models.PageRevision.objects
+                   .filter(page__namespace_id=settings.WIKIPY_NS.id, page__title=SIDE_MENUS_PAGE_TITLE,
+                           page__deleted=False, hidden=False)
+                   .order_by('-date', '-id').values_list('id', flat=True).first())
+    if _side_menus is not None and _side_menus[0] == revision_id:
+        return _side_menus[1]
+
+    wikicode = models.PageRevision.objects.get(id=revision_id).content if revision_id is not None else ''
+    menus: typ.Dict[str, typ.List[SideMenuEntry]] = {}
+    current_menu = None
+    for line in wikicode.split('\n'):
+        if line.startswith('**'):
+            if current_menu is None:
+                continue
+            line = line[2:].strip()
+            if '|' in line:
+                url, text = line.split('|', maxsplit=1)
+            else:
+                url = text = line
+            if url == 'main_page':
+                if text == url:
+                    text = settings.MAIN_PAGE_TITLE
+                url = titles.get_full_page_title(settings.MAIN_PAGE_NAMESPACE_ID, settings.MAIN_PAGE_TITLE)
+            menus[current_menu].append(SideMenuEntry(url=url, text=text))
+        elif line.startswith('*'):
+            current_menu = line[1:].strip()
+            menus.setdefault(current_menu, [])
+    _side_menus = (revision_id, {menu: tuple(entries) for menu, entries in menus.items()})
+    return _side_menus[1]
+
+
 # endregion
 # region Utility
 
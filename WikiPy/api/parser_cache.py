@@ -0,0 +1,346 @@
+"""
+This module defines the parser cache.
+
+The parser cache stores the rendered HTML of page revisions to avoid parsing and rendering
+the same wikicode again on every read. Each render is identified by the revision’s ID, the skin,
+the language and a hash of the user options and groups that affect the rendering.
+Groups are part of the key as transcluded pages are fetched with the rights of the user.
+
+Renders are not deleted when a template is edited. Instead, the pages that transclude it are marked as touched
+and renders older than the page’s cache_touched date are considered stale.
+
+Renders that use volatile magic keywords expire sooner if they depend on the current time,
+or are stored per user if they depend on the current user. In the latter case, a marker without any render
+is stored under the shared key to indicate that the actual render must be looked up under the user’s key.
+
+The parsed and rendered output of each section of a page is also cached, keyed by the hash of its wikicode,
+so that editing a section does not require parsing the other ones again. Sections are always stored
+in Django’s cache, whatever the selected backend, and follow the same staleness and expiry rules as renders.
+Sections whose render depends on the current user or on the rendered revision are not cached,
+as section keys are shared by all revisions and users.
+"""
+import abc
+import dataclasses
+import datetime
+import hashlib
+import random
+import typing as typ
+
+import django.core.cache as dj_cache
+import django.db as dj_db
+import django.db.models as dj_models
+
+from . import datetime as api_dt
+from .. import models, parser, settings
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedRender:
+    """A rendered page revision as stored in the parser cache."""
+    render: str
+    is_redirect: bool
+    date: datetime.datetime
+    per_user: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedSection:
+    """The parsed and rendered output of a page section as stored in the parser cache."""
+    render: str
+    categories: typ.Dict[str, str]
+    templates: typ.FrozenSet[typ.Tuple[int, str]]
+    links: typ.FrozenSet[typ.Tuple[int, str]]
+    files: typ.FrozenSet[str]
+    volatility: typ.FrozenSet[str]
+    max_depth_reached: bool
+    too_many_redirects: bool
+    circular_transclusion: bool
+    called_non_existant_template: bool
+    limit_exceeded: typ.Optional[str]
+    date: datetime.datetime
+    # Expansion size, template calls and nodes count that the parse of the section added to the page’s budget
+    cost: typ.Tuple[int, int, int] = (0, 0, 0)
+
+
+@dataclasses.dataclass(frozen=True)
+class ParserCacheStats:
+    """Parser cache hit and miss counters since the server started."""
+    backend: str
+    hits: int
+    misses: int
+
+    @property
+    def hit_ratio(self) -> float:
+        """The ratio of cache queries that were hits, between 0 and 1. 0 if the cache was never queried."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+
+class ParserCacheBackend(abc.ABC):
+    """Base class for parser cache storage backends."""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> typ.Optional[CachedRender]:
+        """
+        Returns the render stored under the given key.
+
+        :param key: The cache key.
+        :return: The render or None if there is no render for this key or it has expired.
+        """
+        pass
+
+    @abc.abstractmethod
+    def set(self, key: str, revision: models.PageRevision, value: CachedRender, expiry: int):
+        """
+        Stores a render under the given key.
+
+        :param key: The cache key.
+        :param revision: The rendered revision.
+        :param value: The render to store.
+        :param expiry: The number of seconds after which the render expires.
+        """
+        pass
+
+    def prune(self):
+        """Deletes expired renders and evicts renders in excess, if the backend does not do it by itself."""
+        pass
+
+
+class _DjangoCacheBackend(ParserCacheBackend):
+    """
+    This backend stores renders in Django’s default cache.
+    Eviction is delegated to the cache itself, the local memory cache evicts least recently used entries
+    once its MAX_ENTRIES option is reached.
+    """
+    KEY_PREFIX = 'wpy_parser_cache:'
+
+    def get(self, key):
+        return dj_cache.cache.get(self.KEY_PREFIX + key)
+
+    def set(self, key, revision, value, expiry):
+        dj_cache.cache.set(self.KEY_PREFIX + key, value, timeout=expiry)
+
+
+class _DatabaseBackend(ParserCacheBackend):
+    """
+    This backend stores renders in the ParserCacheEntry table.
+    Expired entries are deleted when accessed. The table is pruned by the scheduled background tasks
+    and by a random PARSER_CACHE_PRUNE_PROBABILITY fraction of writes: expired entries are deleted
+    and the least recently used ones are evicted once there are more than PARSER_CACHE_MAX_ENTRIES entries.
+    """
+
+    def get(self, key):
+        try:
+            entry = models.ParserCacheEntry.objects.get(key=key)
+        except models.ParserCacheEntry.DoesNotExist:
+            return None
+
+        now = api_dt.now()
+        if entry.expiration_date < now:
+            entry.delete()
+            return None
+        models.ParserCacheEntry.objects.filter(id=entry.id).update(last_access=now)
+        return CachedRender(render=entry.render, is_redirect=entry.is_redirect, date=entry.date,
+                            per_user=entry.per_user)
+
+    def set(self, key, revision, value, expiry):
+        now = api_dt.now()
+        try:
+            models.ParserCacheEntry.objects.update_or_create(key=key, defaults={
+                'revision': revision,
+                'render': value.render,
+                'is_redirect': value.is_redirect,
+                'per_user': value.per_user,
+                'date': value.date,
+                'expiration_date': now + datetime.timedelta(seconds=expiry),
+                'last_access': now,
+            })
+        except dj_db.IntegrityError:  # Another request stored the same render in the meantime
+            pass
+        # Pruning scans the whole table, only some writes pay for it
+        if random.random() < settings.PARSER_CACHE_PRUNE_PROBABILITY:
+            self.prune()
+
+    def prune(self):
+        entries = models.ParserCacheEntry.objects
+        entries.filter(expiration_date__lt=api_dt.now()).delete()
+        if (excess := entries.count() - settings.PARSER_CACHE_MAX_ENTRIES) > 0:
+            ids = list(entries.order_by('last_access').values_list('id', flat=True)[:excess])
+            entries.filter(id__in=ids).delete()
+
+
+_BACKENDS: typ.Dict[str, ParserCacheBackend] = {
+    settings.PARSER_CACHE_BACKEND_DJANGO: _DjangoCacheBackend(),
+    settings.PARSER_CACHE_BACKEND_DATABASE: _DatabaseBackend(),
+}
+
+SECTION_KEY_PREFIX = 'wpy_parser_cache_section:'
+
+_hits = 0
+_misses = 0
+
+
+def get_backend() -> ParserCacheBackend:
+    """Returns the parser cache backend selected in the config file."""
+    return _BACKENDS[settings.PARSER_CACHE_BACKEND]
+
+
+def prune():
+    """Prunes the storage of the selected parser cache backend."""
+    get_backend().prune()
+
+
+def get_cache_key(revision: models.PageRevision, context, per_user: bool = False) -> str:
+    """
+    Returns the parser cache key for the given revision and page context.
+
+    :param revision: The rendered revision.
+    :param context: The context of the page being rendered.
+    :type context: WikiPy.page_context.PageContext
+    :param per_user: If true, the key will be specific to the context’s user.
+    :return: The cache key.
+    """
+    key = f'{revision.id}:{_get_context_key(context)}'
+    if per_user:
+        key += f':{context.user.django_user.id}'
+    return key
+
+
+def get_section_cache_key(wikicode: str, context) -> str:
+    """
+    Returns the parser cache key for the given section wikicode and page context.
+
+    :param wikicode: The section’s wikicode.
+    :param context: The context of the page being rendered.
+    :type context: WikiPy.page_context.PageContext
+    :return: The cache key.
+    """
+    page = context.page
+    content_hash = hashlib.sha1(wikicode.encode('UTF-8')).hexdigest()
+    return f'{page.namespace_id}:{page.title}:{_get_context_key(context)}:{content_hash}'
+
+
+def _get_context_key(context) -> str:
+    """
+    Returns the part of the cache keys that depends on the given page context.
+
+    :param context: The context of the page being rendered.
+    :type context: WikiPy.page_context.PageContext
+    :return: The key part.
+    """
+    user = context.user
+    user_data = user.data
+    # Transcluded pages are fetched with the user’s read rights, renders are only shared by users of the same groups
+    groups = user.groups
+    permissions = sorted(group.name for group in groups)
+    if not any(group.has_right(settings.RIGHT_READ_PAGES) or group.has_right(settings.RIGHT_EDIT_USER_PAGES)
+               for group in groups):
+        # Such users can only read their own user pages
+        permissions.append(user.username)
+    options = (
+        user_data.timezone,
+        user_data.datetime_format_id,
+        user_data.max_image_thumbnail_size,
+        tuple(permissions),
+    )
+    options_hash = hashlib.sha1(repr(options).encode('UTF-8')).hexdigest()
+    return f'{context.skin.id}:{context.language.code}:{options_hash}'
+
+
+def get_render(revision: models.PageRevision, context) -> typ.Optional[CachedRender]:
+    """
+    Returns the cached render of the given revision for the given page context.
+
+    :param revision: The revision to get the render of.
+    :param context: The context of the page being rendered.
+    :type context: WikiPy.page_context.PageContext
+    :return: The cached render or None if it is not in the cache or is stale.
+    """
+    global _hits, _misses
+    backend = get_backend()
+    render = backend.get(get_cache_key(revision, context))
+    if render is not None and render.per_user:
+        render = backend.get(get_cache_key(revision, context, per_user=True))
+    touched = context.page.cache_touched
+    if render is not None and (touched is None or render.date >= touched):
+        _hits += 1
+        return render
+    _misses += 1
+    return None
+
+
+def save_render(revision: models.PageRevision, context, render: str, is_redirect: bool,
+                volatility: typ.Collection[str] = ()):
+    """
+    Stores the render of the given revision for the given page context.
+
+    :param revision: The rendered revision.
+    :param context: The context of the page that was rendered.
+    :type context: WikiPy.page_context.PageContext
+    :param render: The rendered HTML.
+    :param is_redirect: Whether the revision is a redirection.
+    :param volatility: The volatilities of the magic keywords used by the render.
+    """
+    backend = get_backend()
+    now = api_dt.now()
+    if parser.VOLATILE_TIME in volatility:
+        expiry = settings.PARSER_CACHE_VOLATILE_EXPIRY
+    else:
+        expiry = settings.PARSER_CACHE_EXPIRY
+    value = CachedRender(render=render, is_redirect=is_redirect, date=now)
+
+    if parser.VOLATILE_USER in volatility:
+        marker = CachedRender(render='', is_redirect=is_redirect, date=now, per_user=True)
+        backend.set(get_cache_key(revision, context), revision, marker, expiry)
+        backend.set(get_cache_key(revision, context, per_user=True), revision, value, expiry)
+    else:
+        backend.set(get_cache_key(revision, context), revision, value, expiry)
+
+
+def get_section(wikicode: str, context) -> typ.Optional[CachedSection]:
+    """
+    Returns the cached output of the given section for the given page context.
+
+    :param wikicode: The section’s wikicode.
+    :param context: The context of the page being rendered.
+    :type context: WikiPy.page_context.PageContext
+    :return: The cached section or None if it is not in the cache or is stale.
+    """
+    section = dj_cache.cache.get(SECTION_KEY_PREFIX + get_section_cache_key(wikicode, context))
+    touched = context.page.cache_touched
+    if section is not None and (touched is None or section.date >= touched):
+        return section
+    return None
+
+
+def save_section(wikicode: str, context, section: CachedSection):
+    """
+    Stores the output of the given section for the given page context.
+    Sections whose render depends on the current user or on the rendered revision are ignored.
+
+    :param wikicode: The section’s wikicode.
+    :param context: The context of the page that was rendered.
+    :type context: WikiPy.page_context.PageContext
+    :param section: The section’s output.
+    """
+    if parser.VOLATILE_USER in section.volatility or parser.VOLATILE_REVISION in section.volatility:
+        return
+    if parser.VOLATILE_TIME in section.volatility:
+        expiry = settings.PARSER_CACHE_VOLATILE_EXPIRY
+    else:
+        expiry = settings.PARSER_CACHE_EXPIRY
+    dj_cache.cache.set(SECTION_KEY_PREFIX + get_section_cache_key(wikicode, context), section, timeout=expiry)
+
+
+def invalidate_pages(pages: dj_models.QuerySet):
+    """
+    Marks all cached renders of the given pages as stale.
+
+    :param pages: A Page query set.
+    """
+    pages.update(cache_touched=api_dt.now())
+
+
+def get_stats() -> ParserCacheStats:
+    """Returns the parser cache hit and miss counters of the current process."""
+    return ParserCacheStats(backend=settings.PARSER_CACHE_BACKEND, hits=_hits, misses=_misses)
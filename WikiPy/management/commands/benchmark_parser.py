@@ -0,0 +1,273 @@
+"""
+This module defines a command to benchmark the wikicode parser, the rendering of node trees
+and the extraction of metadata.
+
+The benchmark runs against a throwaway test database (in memory with SQLite) that is populated
+with a synthetic corpus of pages and templates, so that the production database is never touched
+and results are comparable between runs. Each case of the corpus stresses a specific part of the parser:
+    - flat: a large page made of plain paragraphs with a few links and styles;
+    - nested: deeply nested bold, italic, underlined text and links;
+    - templates: a page with a heavy template fan-out, each template transcluding several others;
+    - variables: templates with long chains of variable default values;
+    - categories: a page with many categories.
+
+Results can be saved as JSON and compared to the results of a previous run to detect regressions.
+Runs with different parser backends can be compared the same way to pick the fastest one for a given content mix.
+"""
+import datetime
+import json
+import logging
+import platform
+import statistics
+import time
+import typing as typ
+
+import django.test as dj_test
+import django.test.utils as dj_test_utils
+import django.utils.crypto as dj_crypto
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import settings, page_handlers, parser
+from ...api import users as api_users, pages as api_pages, link_batch as api_link_batch
+
+logger = logging.getLogger(__name__)
+
+_USERNAME = 'Benchmark'
+_COMMENT = 'Benchmark corpus.'
+_PAGE_TITLE = 'Benchmark'
+_PERCENTILES = (50, 90, 99)
+_PHASES = ('parse', 'render', 'extract')
+_LOREM = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt '
+          'ut labore et dolore magna aliqua.')
+
+
+class _Case(typ.NamedTuple):
+    """A benchmark case: the wikicode of the benchmarked page and the templates it depends on."""
+    name: str
+    wikicode: str
+    templates: typ.Dict[str, str]
+
+
+def _flat_case(scale: int) -> _Case:
+    paragraphs = []
+    for i in range(500 * scale):
+        if i % 25 == 0:
+            paragraphs.append(f'== Section {i // 25} ==')
+        paragraphs.append(f'{_LOREM} See [[Page {i % 50}|page {i % 50}]] and **this** //text// {i}.')
+    return _Case('flat', '\n\n'.join(paragraphs), {})
+
+
+def _nested_case(scale: int) -> _Case:
+    depth = 20
+    block = ''
+    for i in range(depth):
+        block = f'**a //b __c [[Page {i}|d {block} e]] f__ g// h**'
+    return _Case('nested', '\n\n'.join([block] * (10 * scale)), {})
+
+
+def _templates_case(scale: int) -> _Case:
+    fan_out = 10
+    templates = {
+        'Bench-Leaf': '[[Page {[1|0]}|leaf {[1|0]}]] **{[2|value]}**',
+        'Bench-Branch': ' '.join(f'{{{{Bench-Leaf|{i}|{{[1|branch]}}}}}}' for i in range(fan_out)),
+        'Bench-Root': '\n\n'.join(f'{{{{Bench-Branch|{i}}}}}' for i in range(fan_out)),
+    }
+    return _Case('templates', '\n\n'.join(['{{Bench-Root}}'] * (4 * scale)), templates)
+
+
+def _variables_case(scale: int) -> _Case:
+    depth = 50
+    default = 'default'
+    for i in range(depth):
+        default = f'{{[v{i}|{default}]}}'
+    templates = {'Bench-Defaults': default}
+    calls = [f'{{{{Bench-Defaults|v{i % depth}=value {i}}}}}' for i in range(200 * scale)]
+    return _Case('variables', '\n\n'.join(calls), templates)
+
+
+def _categories_case(scale: int) -> _Case:
+    categories = [f'[[@Benchmark category {i}|Key {i}]]' for i in range(500 * scale)]
+    return _Case('categories', _LOREM + '\n\n' + '\n'.join(categories), {})
+
+
+CASES: typ.Dict[str, typ.Callable[[int], _Case]] = {
+    'flat': _flat_case,
+    'nested': _nested_case,
+    'templates': _templates_case,
+    'variables': _variables_case,
+    'categories': _categories_case,
+}
+
+
+def _get_stats(times: typ.List[float], size: int) -> typ.Dict[str, float]:
+    """
+    Computes statistics on the given times.
+
+    :param times: The measured times in seconds.
+    :param size: The size of the processed wikicode in bytes.
+    :return: The mean, min, max and percentiles in milliseconds, the number of runs per second
+        and the throughput in KB/s.
+    """
+    times = sorted(times)
+    stats = {
+        'mean_ms': statistics.mean(times) * 1000,
+        'min_ms': times[0] * 1000,
+        'max_ms': times[-1] * 1000,
+    }
+    for p in _PERCENTILES:
+        stats[f'p{p}_ms'] = times[min(len(times) - 1, round(p / 100 * (len(times) - 1)))] * 1000
+    stats['runs_per_s'] = 1 / statistics.mean(times)
+    stats['throughput_kbps'] = size / 1000 / statistics.mean(times)
+    return {k: round(v, 3) for k, v in stats.items()}
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the wikicode parser, renderer and metadata extraction on a synthetic corpus against a test database.'
+
+    def add_arguments(self, parser_):
+        parser_.add_argument('--iterations', type=int, default=20, help='Number of timed runs per case')
+        parser_.add_argument('--warmup', type=int, default=2, help='Number of untimed runs per case')
+        parser_.add_argument('--scale', type=int, default=1, help='Size multiplier of the generated corpus')
+        parser_.add_argument('--case', dest='cases', action='append', choices=list(CASES),
+                             help='Case to run, may be repeated; all cases are run by default')
+        parser_.add_argument('--skin', default='default', help='ID of the skin to render with')
+        parser_.add_argument('--backend', choices=settings.PARSER_BACKENDS,
+                             help='Parser backend to benchmark; the one of the config file by default')
+        parser_.add_argument('--output', help='Path of the JSON file to save the results to')
+        parser_.add_argument('--compare', help='Path of a JSON results file of a previous run to compare to')
+        parser_.add_argument('--threshold', type=float, default=10,
+                             help='Percentage above which a slower median time is reported as a regression')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('at least one iteration is required')
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='UTF-8') as f:
+                previous = json.load(f)
+
+        cases = [CASES[name](options['scale']) for name in options['cases'] or CASES]
+        options['backend'] = options['backend'] or settings.PARSER_BACKEND
+
+        logger.info('Creating test database…')
+        old_config = dj_test_utils.setup_databases(verbosity=0, interactive=False)
+        try:
+            user = self._create_user()
+            results = {case.name: self._run_case(case, user, options) for case in cases}
+        finally:
+            dj_test_utils.teardown_databases(old_config, verbosity=0)
+
+        report = {
+            'version': settings.VERSION,
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'backend': options['backend'],
+            'iterations': options['iterations'],
+            'scale': options['scale'],
+            'cases': results,
+        }
+        self._print_report(report)
+        if previous:
+            self._print_comparison(report, previous, options['threshold'])
+        if options['output']:
+            with open(options['output'], mode='w', encoding='UTF-8') as f:
+                json.dump(report, f, indent=2)
+            logger.info(f'Results saved to {options["output"]}.')
+
+    @staticmethod
+    def _create_user():
+        password = dj_crypto.get_random_string(length=100)
+        user = api_users.create_user(_USERNAME, password=password, ignore_email=True)
+        api_users.add_user_to_group(user, settings.GROUP_ADMINISTRATORS, performer=None, auto=True, reason=_COMMENT)
+        return api_users.get_user_from_name(_USERNAME)
+
+    @staticmethod
+    def _get_context(user, skin_id: str, namespace_id: int, title: str):
+        request = dj_test.RequestFactory().get('/')
+        request.session = SessionStore()
+        request.user = user.django_user
+        context, _ = page_handlers.ActionHandler(
+            action=page_handlers.ACTION_EDIT,
+            request=request,
+            namespace_id=namespace_id,
+            title=title,
+            user=user,
+            language=settings.i18n.get_language(settings.DEFAULT_LANGUAGE_CODE),
+            skin_id=skin_id,
+            redirect_enabled=False
+        ).get_page_context()
+        return context
+
+    def _run_case(self, case: _Case, user, options) -> typ.Dict[str, typ.Any]:
+        logger.info(f'Running case "{case.name}"…')
+        for title, wikicode in case.templates.items():
+            context = self._get_context(user, options['skin'], settings.TEMPLATE_NS.id, title)
+            api_pages.submit_page_content(context, settings.TEMPLATE_NS.id, title, wikicode, _COMMENT, False,
+                                          performer=user)
+
+        context = self._get_context(user, options['skin'], settings.MAIN_NS.id, f'{_PAGE_TITLE} {case.name}')
+        parse_times = []
+        render_times = []
+        extract_times = []
+        html_size = 0
+        for i in range(options['warmup'] + options['iterations']):
+            # Each run simulates a new request, existence of linked pages must not be already known
+            context.link_batch = api_link_batch.LinkBatch()
+            p = parser.WikicodeParser(backend=options['backend'])
+            start = time.perf_counter()
+            parsed = p.parse_wikicode(case.wikicode, context)
+            parse_end = time.perf_counter()
+            html = context.skin.render_wikicode(parsed, context)
+            render_end = time.perf_counter()
+            parser.WikicodeParser(backend=options['backend']).extract_metadata(case.wikicode, context)
+            extract_end = time.perf_counter()
+            if i >= options['warmup']:
+                parse_times.append(parse_end - start)
+                render_times.append(render_end - parse_end)
+                extract_times.append(extract_end - render_end)
+                html_size = len(html.encode('UTF-8'))
+
+        size = len(case.wikicode.encode('UTF-8'))
+        return {
+            'wikicode_size': size,
+            'html_size': html_size,
+            'parse': _get_stats(parse_times, size),
+            'render': _get_stats(render_times, size),
+            'extract': _get_stats(extract_times, size),
+        }
+
+    def _print_report(self, report: typ.Dict[str, typ.Any]):
+        self.stdout.write(f'WikiPy {report["version"]}, Python {report["python"]}, {report["backend"]} backend, '
+                          f'{report["iterations"]} iterations, scale {report["scale"]}')
+        header = f'{"case":<12}{"phase":<8}{"mean":>10}{"p50":>10}{"p90":>10}{"p99":>10}{"runs/s":>10}{"KB/s":>12}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, result in report['cases'].items():
+            for phase in _PHASES:
+                stats = result[phase]
+                self.stdout.write(f'{name:<12}{phase:<8}{stats["mean_ms"]:>10.2f}{stats["p50_ms"]:>10.2f}'
+                                  f'{stats["p90_ms"]:>10.2f}{stats["p99_ms"]:>10.2f}{stats["runs_per_s"]:>10.1f}'
+                                  f'{stats["throughput_kbps"]:>12.1f}')
+        self.stdout.write('Times are in milliseconds.')
+
+    def _print_comparison(self, report: typ.Dict[str, typ.Any], previous: typ.Dict[str, typ.Any], threshold: float):
+        self.stdout.write(f'Comparison with WikiPy {previous.get("version")} run from {previous.get("date")} '
+                          f'with the {previous.get("backend", settings.PARSER_BACKEND_STATE_MACHINE)} backend:')
+        regressions = 0
+        for name, result in report['cases'].items():
+            if name not in previous.get('cases', {}):
+                continue
+            for phase in _PHASES:
+                if phase not in previous['cases'][name]:
+                    continue
+                before = previous['cases'][name][phase]['p50_ms']
+                after = result[phase]['p50_ms']
+                change = (after - before) / before * 100 if before else 0
+                flag = ''
+                if change > threshold:
+                    flag = ' REGRESSION'
+                    regressions += 1
+                self.stdout.write(f'{name:<12}{phase:<8}{before:>10.2f} -> {after:>10.2f} ms ({change:+.1f} %){flag}')
+        if regressions:
+            self.stdout.write(self.style.WARNING(f'{regressions} regression(s) above {threshold} %.'))
@@ -0,0 +1,168 @@
+"""
+This module defines a command that parses all pages again to rebuild the tables derived from their wikicode:
+categories, transcluded templates, page links, file links and redirections.
+
+It should be run after editing templates that many pages depend on or after upgrading the parser.
+Pages are streamed from the database in chunks that are parsed in parallel by a pool of processes,
+each with its own database connection. The derived rows of each chunk are then written in bulk by the main process.
+
+The ID of the last page of each written chunk is saved in a checkpoint file if one is specified,
+so that an interrupted run can be resumed with the same command.
+"""
+import collections
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+import typing as typ
+
+import django.db as dj_db
+import django.http as dj_http
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import settings, models, page_handlers, setup
+from ...api import users as api_users, pages as api_pages, errors as api_errors
+
+logger = logging.getLogger(__name__)
+
+# Set in each worker process by _init_worker()
+_user: typ.Optional[models.User] = None
+
+
+def _init_worker(username: str):
+    """Initializes a worker process."""
+    global _user
+    _user = api_users.get_user_from_name(username)
+
+
+def _get_page_context(page: models.Page):
+    request = dj_http.HttpRequest()
+    request.method = 'GET'
+    context, _ = page_handlers.ActionHandler(
+        action=page_handlers.ACTION_EDIT,
+        request=request,
+        namespace_id=page.namespace_id,
+        title=page.title,
+        user=_user,
+        language=settings.i18n.get_language(settings.DEFAULT_LANGUAGE_CODE),
+        skin_id=_user.data.skin,
+        redirect_enabled=False
+    ).get_page_context()
+    return context
+
+
+def _parse_chunk(pages_ids: typ.List[int]) -> typ.Dict[int, api_pages.PageLinksData]:
+    """
+    Parses the latest revision of each of the given pages. Run in worker processes.
+
+    :param pages_ids: The IDs of the pages to parse.
+    :return: A dictionary mapping the page IDs to their categories and links.
+    """
+    pages = {(page.namespace_id, page.title): page for page in models.Page.objects.filter(id__in=pages_ids)}
+    try:
+        revisions = api_pages.get_latest_revisions(pages, performer=_user)
+    except api_errors.RevisionDoesNotExistError:  # Some pages only have hidden revisions, fetch them one by one
+        revisions = {}
+        for key in pages:
+            try:
+                revisions[key] = api_pages.get_page_revision(*key, performer=_user)
+            except api_errors.RevisionDoesNotExistError:
+                revisions[key] = None
+
+    results = {}
+    for key, page in pages.items():
+        if revision := revisions.get(key):
+            try:
+                results[page.id] = api_pages.get_page_links_data(revision.content, _get_page_context(page))
+            except Exception as e:
+                logger.exception(f'Could not parse page "{page.full_title}" (ID {page.id}): {e}')
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Parses all pages again to rebuild their categories, links and redirect tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--namespace', dest='namespaces', type=int, action='append',
+                            help='ID of a namespace to reparse, may be repeated; all namespaces by default')
+        parser.add_argument('-p', '--processes', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes')
+        parser.add_argument('-c', '--chunk-size', type=int, default=100, help='Number of pages per chunk')
+        parser.add_argument('--checkpoint', help='Path of the file to save progress to and resume from')
+        parser.add_argument('--restart', action='store_true', help='Ignore the existing checkpoint, if any')
+
+    def handle(self, *args, **options):
+        namespaces = sorted(set(options['namespaces'] or []))
+        if unknown := [ns_id for ns_id in namespaces if ns_id not in settings.NAMESPACES]:
+            raise CommandError(f'unknown namespace IDs: {", ".join(map(str, unknown))}')
+        if options['processes'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('the number of processes and the chunk size must be positive')
+        if not setup.are_pages_setup():
+            raise CommandError('the wiki is not set up')
+
+        last_page_id = self._load_checkpoint(options['checkpoint'], namespaces, options['restart'])
+        pages = models.Page.objects.filter(deleted=False).exclude(namespace_id=settings.SPECIAL_NS.id)
+        if namespaces:
+            pages = pages.filter(namespace_id__in=namespaces)
+        total = pages.count()
+        done = pages.filter(id__lte=last_page_id).count()
+        if last_page_id:
+            self.stdout.write(f'Resuming after page ID {last_page_id} ({done}/{total} pages already done).')
+
+        def chunks() -> typ.Iterator[typ.List[int]]:
+            from_id = last_page_id
+            while chunk := list(pages.filter(id__gt=from_id).order_by('id')
+                                .values_list('id', flat=True)[:options['chunk_size']]):
+                from_id = chunk[-1]
+                yield chunk
+
+        start = time.time()
+        updated = 0
+        # Forked workers must not share the connections of the main process, they open their own
+        dj_db.connections.close_all()
+        with multiprocessing.Pool(options['processes'], initializer=_init_worker,
+                                  initargs=(setup.WIKI_USER_NAME,)) as pool:
+            chunks_iterator = chunks()
+            # Only a few chunks are queued per worker so that pages are streamed instead of all loaded at once.
+            # Chunks are written in order, hence every page before a checkpoint has been written.
+            pending = collections.deque(
+                (chunk, pool.apply_async(_parse_chunk, (chunk,)))
+                for chunk in itertools.islice(chunks_iterator, 2 * options['processes'])
+            )
+            while pending:
+                chunk, result = pending.popleft()
+                results = result.get()
+                if next_chunk := next(chunks_iterator, None):
+                    pending.append((next_chunk, pool.apply_async(_parse_chunk, (next_chunk,))))
+                api_pages.set_pages_links_data(results)
+                self._save_checkpoint(options['checkpoint'], namespaces, chunk[-1])
+                done += len(chunk)
+                updated += len(results)
+                elapsed = time.time() - start
+                self.stdout.write(f'{done}/{total} pages ({done / total * 100:.1f} %), '
+                                  f'{updated / elapsed if elapsed else 0:.1f} pages/s')
+
+        if options['checkpoint'] and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+        self.stdout.write(self.style.SUCCESS(f'Reparsed {updated} pages in {time.time() - start:.1f} s.'))
+
+    @staticmethod
+    def _load_checkpoint(path: typ.Optional[str], namespaces: typ.List[int], restart: bool) -> int:
+        if not path or restart or not os.path.exists(path):
+            return 0
+        with open(path, encoding='UTF-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('namespaces') != namespaces:
+            raise CommandError(f'checkpoint {path} was saved for other namespaces, use --restart to ignore it')
+        return checkpoint['last_page_id']
+
+    @staticmethod
+    def _save_checkpoint(path: typ.Optional[str], namespaces: typ.List[int], last_page_id: int):
+        if not path:
+            return
+        # Write then rename so that an interruption never leaves a truncated checkpoint
+        with open(path + '.tmp', mode='w', encoding='UTF-8') as f:
+            json.dump({'namespaces': namespaces, 'last_page_id': last_page_id}, f)
+        os.replace(path + '.tmp', path)
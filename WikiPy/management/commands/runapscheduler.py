@@ -13,6 +13,7 @@ from django_apscheduler.jobstores import DjangoJobStore
 from django_apscheduler.models import DjangoJobExecution
 
 import WikiPy.api.db_tasks as api_db_tasks
+import WikiPy.api.parser_cache as api_parser_cache
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +41,15 @@ class Command(BaseCommand):
         )
         logger.info('Added job "db_background_task".')
 
+        scheduler.add_job(
+            api_parser_cache.prune,
+            trigger=CronTrigger(minute='*/15'),  # Every 15 minutes
+            id='prune_parser_cache',
+            max_instances=1,
+            replace_existing=True
+        )
+        logger.info('Added job "prune_parser_cache".')
+
         scheduler.add_job(
             delete_old_job_executions,
             trigger=CronTrigger(
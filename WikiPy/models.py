@@ -178,6 +178,8 @@ class Page(ModelWithRevisions):
                                         validators=[content_model_validator])
     content_language_code = dj_models.CharField(max_length=20, default=settings.DEFAULT_LANGUAGE_CODE,
                                                 validators=[language_validator])
+    # Date of the last edit to one of the pages this page transcludes, cached renders older than it are stale
+    cache_touched = dj_models.DateTimeField(blank=True, null=True, default=None)
 
     @property
     def exists(self) -> bool:
@@ -274,6 +276,65 @@ class PageCategory(LockableModel):
         unique_together = ('page', 'category_name')
 
 
+class TemplateLink(LockableModel):
+    """
+    This class associates pages with the pages they transclude, either directly or through other templates.
+    Redirections followed to reach a template are also recorded.
+    """
+    page = dj_models.ForeignKey(Page, on_delete=dj_models.CASCADE)
+    # Do not link to Page object as pages might transclude non-existant templates
+    template_namespace_id = dj_models.IntegerField(validators=[namespace_id_validator])
+    template_title = dj_models.CharField(max_length=Page._meta.get_field('title').max_length,
+                                         validators=[page_title_validator])
+
+    class Meta:
+        unique_together = ('page', 'template_namespace_id', 'template_title')
+        indexes = [dj_models.Index(fields=['template_namespace_id', 'template_title'])]
+
+
+class PageLink(LockableModel):
+    """
+    This class associates pages with the pages they link to, either directly or through transcluded templates.
+    Links to special pages are not recorded.
+    """
+    page = dj_models.ForeignKey(Page, on_delete=dj_models.CASCADE)
+    # Do not link to Page object as pages might link to non-existant pages
+    target_namespace_id = dj_models.IntegerField(validators=[namespace_id_validator])
+    target_title = dj_models.CharField(max_length=Page._meta.get_field('title').max_length,
+                                       validators=[page_title_validator])
+
+    class Meta:
+        unique_together = ('page', 'target_namespace_id', 'target_title')
+        # Also covers the page ID to paginate linking pages without any sort
+        indexes = [dj_models.Index(fields=['target_namespace_id', 'target_title', 'page'])]
+
+
+class FileLink(LockableModel):
+    """This class associates pages with the multimedia files they embed."""
+    page = dj_models.ForeignKey(Page, on_delete=dj_models.CASCADE)
+    file_name = dj_models.CharField(max_length=Page._meta.get_field('title').max_length)
+
+    class Meta:
+        unique_together = ('page', 'file_name')
+        indexes = [dj_models.Index(fields=['file_name', 'page'])]
+
+
+class Redirect(LockableModel):
+    """
+    This class associates redirection pages with the page they redirect to.
+    It is updated whenever a page is edited so that redirections can be resolved without loading any revision.
+    """
+    page = dj_models.OneToOneField(Page, on_delete=dj_models.CASCADE)
+    # Do not link to Page object as pages might redirect to non-existant pages
+    target_namespace_id = dj_models.IntegerField(validators=[namespace_id_validator])
+    target_title = dj_models.CharField(max_length=Page._meta.get_field('title').max_length,
+                                       validators=[page_title_validator])
+    target_anchor = dj_models.CharField(max_length=100, blank=True, null=True, default=None)
+
+    class Meta:
+        indexes = [dj_models.Index(fields=['target_namespace_id', 'target_title'])]
+
+
 class Revision(LockableModel):
     """
     Base class for revisions.
@@ -390,6 +451,22 @@ class PageRevision(Revision):
         return self.get_previous(ignore_hidden=False) is None
 
 
+class ParserCacheEntry(LockableModel):
+    """
+    This class represents a rendered page revision stored by the “database” parser cache backend.
+    Entries are identified by a key derived from the revision, skin, language and user options.
+    """
+    key = dj_models.CharField(max_length=200, unique=True)
+    revision = dj_models.ForeignKey(PageRevision, on_delete=dj_models.CASCADE)
+    render = dj_models.TextField()
+    is_redirect = dj_models.BooleanField()
+    # If true, this entry has no render and the actual render is stored under the user-specific key
+    per_user = dj_models.BooleanField(default=False)
+    date = dj_models.DateTimeField()
+    expiration_date = dj_models.DateTimeField(db_index=True)
+    last_access = dj_models.DateTimeField(db_index=True)
+
+
 class PageProtectionStatus(LockableModel):
     """
     This class represents the protection status of a page.
@@ -9,9 +9,13 @@ import django.core.paginator as dj_page
 import django.template.context as dj_context
 
 from . import models, settings, forms, skins
+from .api import link_batch as api_link_batch
 
 TemplateContext = dj_context.RequestContext
 
+# Inserted in place of the page content when it is streamed, the rendered page is split around it
+STREAMED_CONTENT_PLACEHOLDER = '<!--wpy-streamed-content-->'
+
 
 @dataclasses.dataclass
 class PageContext:
@@ -53,6 +57,10 @@ class PageContext:
 
     def __post_init__(self):
         self._context = None
+        # Lookup table for the existence of linked pages, shared by all links rendered during the request
+        self.link_batch = api_link_batch.LinkBatch()
+        # Values computed at most once per request, shared by all contexts derived from this one
+        self.request_memo: typ.Dict[str, typ.Any] = {}
 
     def __getattr__(self, item):
         if self._context:
@@ -66,6 +74,8 @@ class RedirectPageContext(PageContext):
     redirect_anchor: typ.Optional[str]
     is_path: bool
     display_redirect: bool
+    # Full titles of the intermediate redirections that were followed to get to the target
+    followed_redirects: typ.List[str]
 
     def __init__(
             self,
@@ -74,13 +84,15 @@ class RedirectPageContext(PageContext):
             to: str,
             anchor: str = None,
             is_path: bool = False,
-            display: bool = False
+            display: bool = False,
+            followed_redirects: typ.List[str] = None
     ):
         self._context = context
         self.redirect = to
         self.redirect_anchor = anchor
         self.is_path = is_path
         self.display_redirect = display
+        self.followed_redirects = followed_redirects or []
 
 
 @dataclasses.dataclass(init=False)
@@ -106,6 +118,7 @@ class RevisionPageContext(PageContext):
 @dataclasses.dataclass(init=False)
 class ReadPageContext(RevisionPageContext):
     rendered_page_content: str
+    rendered_page_chunks: typ.Optional[typ.Iterator[str]]
     is_redirection: bool
     redirected_from: typ.Optional[typ.Tuple[int, str]]
     page_categories: typ.List[typ.Tuple[models.Page, models.CategoryData]]
@@ -120,10 +133,12 @@ class ReadPageContext(RevisionPageContext):
             archived: bool = False,
             rendered_page_content: str = '',
             redirected_from: typ.Tuple[int, str] = None,
-            page_categories: typ.List[typ.Tuple[models.Page, models.CategoryData]] = None
+            page_categories: typ.List[typ.Tuple[models.Page, models.CategoryData]] = None,
+            rendered_page_chunks: typ.Iterator[str] = None
     ):
         super().__init__(context, wikicode=wikicode, revision=revision, archived=archived)
         self.rendered_page_content = rendered_page_content
+        self.rendered_page_chunks = rendered_page_chunks
         self.is_redirection = is_redirection
         self.redirected_from = redirected_from
         self.page_categories = page_categories
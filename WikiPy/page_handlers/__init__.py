@@ -5,6 +5,7 @@ from __future__ import annotations
 
 import abc
 import string
+import time
 import typing as typ
 
 import django.core.handlers.wsgi as dj_wsgi
@@ -13,8 +14,9 @@ import pygments
 import pygments.formatters as pyg_format
 import pygments.lexers as pyg_lex
 
-from .. import settings, models, special_pages, page_context, skins, forms, setup
-from ..api import pages as api_pages, users as api_users, titles as api_titles, datetime as api_dt, errors as api_errors
+from .. import settings, models, special_pages, page_context, parser, skins, forms, setup
+from ..api import pages as api_pages, users as api_users, titles as api_titles, datetime as api_dt, \
+    errors as api_errors, parser_cache as api_parser_cache
 
 STATUS_FOUND = 200
 STATUS_FORBIDDEN = 403
@@ -75,7 +77,8 @@ class ActionHandler(abc.ABC):
             revision_id: int = None,
             redirect_enabled: bool = True,
             redirects_list: typ.List[str] = None,
-            special_page_kwargs: typ.Dict[str, typ.Any] = None
+            special_page_kwargs: typ.Dict[str, typ.Any] = None,
+            stream: bool = False
     ):
         """
         Creates a handler for the given action.
@@ -92,6 +95,9 @@ class ActionHandler(abc.ABC):
             the resulting context will be for the target page, not the requested page.
         :param redirects_list: The list of all redirects until this point. Used to detect redirection loops.
         :param special_page_kwargs: If the requested page is special, these arguments will be passed onto it.
+        :param stream: If true, the wikicode of read pages that are not in the parser cache will be rendered
+            lazily. The page content will then be a placeholder and the chunks will be in the context’s
+            rendered_page_chunks attribute.
         """
         self._action = action
         self._request = request
@@ -110,6 +116,7 @@ class ActionHandler(abc.ABC):
         self._get = request.GET
         self._post = request.POST
         self._special_page_kwargs = special_page_kwargs or {}
+        self._stream = stream
 
         # Fields that should be defined by subclasses in get_page_context()
         self._mode: str = MODE_READ
@@ -154,8 +161,7 @@ class ActionHandler(abc.ABC):
 
         if self._action != ACTION_RAW:
             if self._page.content_model == settings.PAGE_TYPE_WIKI:
-                render, is_redirect = api_pages.render_wikicode(self._wikicode, context, no_redirect=True,
-                                                                enable_comment=True)
+                render, is_redirect = self._render_wikicode(context)
             else:
                 # Custom HTML formatter because default one wraps
                 # pre tag inside div and we don’t want that.
@@ -191,6 +197,9 @@ class ActionHandler(abc.ABC):
                 else:
                     render = self._wikicode
                 is_redirect = False
+            if not isinstance(render, str):
+                context.rendered_page_chunks = render
+                render = page_context.STREAMED_CONTENT_PLACEHOLDER
             render = dj_safe.mark_safe(render)
 
             if self._page.namespace_id == settings.CATEGORY_NS.id:
@@ -216,6 +225,59 @@ class ActionHandler(abc.ABC):
 
         return context
 
+    def _render_wikicode(self, context: page_context.PageContext) \
+            -> typ.Tuple[typ.Union[str, typ.Iterator[str]], bool]:
+        """
+        Renders the current wikicode. If it is the content of the current revision,
+        the render is fetched from the parser cache or stored into it.
+
+        :param context: The read page context.
+        :return: The rendered wikicode and a boolean indicating whether the wikicode is a redirection.
+            If streaming is enabled and the wikicode is neither cached nor a redirection,
+            a generator of render chunks is returned instead of the render.
+        """
+        cacheable = self._revision is not None and self._wikicode == self._revision.content
+        if cacheable and (cached := api_parser_cache.get_render(self._revision, context)):
+            return cached.render, cached.is_redirect
+
+        if api_pages.get_redirect(self._wikicode):
+            parser_ = parser.WikicodeParser()
+            render, is_redirect = api_pages.render_wikicode(self._wikicode, context, no_redirect=True,
+                                                            enable_comment=True, parser_=parser_)
+            volatility = parser_.volatility
+        elif self._stream and self._action == ACTION_READ:
+            return self._stream_wikicode(context, cacheable), False
+        else:
+            render, volatility = api_pages.render_sections(self._wikicode, context, enable_comment=True)
+            is_redirect = False
+        if cacheable:
+            api_parser_cache.save_render(self._revision, context, render, is_redirect, volatility=volatility)
+        return render, is_redirect
+
+    def _stream_wikicode(self, context: page_context.PageContext, cacheable: bool) -> typ.Iterator[str]:
+        """
+        Renders the current wikicode section by section, yielding chunks as soon as they are rendered.
+        Once all chunks have been consumed, the whole render is stored into the parser cache.
+
+        :param context: The read page context.
+        :param cacheable: Whether the render should be stored into the parser cache.
+        :return: A generator of render chunks.
+        """
+        start = time.time()
+        chunks = []
+        volatility = set()
+        for output in api_pages.iter_sections(self._wikicode, context):
+            if isinstance(output, str):
+                chunks.append(output)
+                yield output
+            else:
+                volatility.update(output.volatility)
+        comment = context.skin.get_generation_comment(context, (time.time() - start) * 1000)
+        yield comment
+        if cacheable:
+            api_parser_cache.save_render(self._revision, context, ''.join(chunks) + comment, False,
+                                         volatility=volatility)
+
     def _get_base_page_context(self) -> page_context.PageContext:
         """Returns the base page context."""
         main_page_full_title = api_titles.get_full_page_title(settings.MAIN_PAGE_NAMESPACE_ID, settings.MAIN_PAGE_TITLE)
@@ -326,6 +388,24 @@ class _ReadActionHandler(ActionHandler):
             status = STATUS_FOUND
             page_lang = None
             wikicode = ''
+            # Pages of the current chain of redirections, which must not be followed again
+            visited = [(self._page.namespace_id, self._page.title)]
+            visited.extend(api_titles.extract_namespace_and_title(t, ns_as_id=True) for t in self._redirects_list or [])
+            if self._revision_id is None and self._redirect_enabled:
+                # Redirections are resolved with the redirect table, the revision is only loaded if displayed.
+                # The chain stops at the first page the user cannot read, which is then displayed as forbidden.
+                if targets := api_pages.resolve_redirects(self._page.namespace_id, self._page.title,
+                                                          visited=visited, performer=self._user):
+                    self._mode = MODE_READ
+                    self._content_language = self._language
+                    self._noindex = True
+                    return page_context.RedirectPageContext(
+                        self._get_base_page_context(),
+                        targets[-1].full_title,
+                        anchor=targets[-1].anchor,
+                        display=True,
+                        followed_redirects=[target.full_title for target in targets[:-1]]
+                    ), STATUS_FOUND
             try:
                 revision = api_pages.get_page_revision(self._page.namespace_id, self._page.title,
                                                        performer=self._user, revision_id=self._revision_id)
@@ -334,11 +414,12 @@ class _ReadActionHandler(ActionHandler):
                 elif self._revision_id is None:
                     wikicode = revision.content
                     page_lang = self._page.content_language
-                    if redir := api_pages.get_redirect(wikicode):
+                    # Redirections saved before the redirect table existed have no row until reparse_all is run.
+                    # Redirections that have one were already followed, unless their target was visited.
+                    if (self._redirect_enabled and (target := api_pages.get_redirect_target(wikicode))
+                            and (target.namespace_id, target.title) not in visited):
                         display_redirect = True
-                        redirect, redirect_anchor = redir
-                        if redirect in (self._redirects_list or []):
-                            self._redirect_enabled = False
+                        redirect, redirect_anchor = target.full_title, target.anchor
             except api_errors.RevisionDoesNotExistError:
                 wikicode, page_lang = api_pages.get_message('InvalidRevisionID', performer=self._user)
                 wikicode = self._format_message(wikicode, revision_id=self._revision_id)
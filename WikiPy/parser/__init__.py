@@ -3,15 +3,21 @@ The parser generates tokens from wikicode.
 """
 from __future__ import annotations
 
-import random
+import contextlib
+import logging
 import re
+import time
 import typing as typ
 
 from . import _functions
 from . import _magic_keywords
 from . import _nodes
+from . import _preprocessor
+from . import _profiler
 from . import _tags
+from ._profiler import *
 from ._registry import *
+from ._serialization import *
 
 WikicodeNode = _nodes.WikicodeNode
 RedirectNode = _nodes.RedirectNode
@@ -48,7 +54,82 @@ def _init_special_tags() -> typ.Dict[str, _tags.NonHTMLTag]:
     return {t.open_delimiter: t for t in tags}
 
 
-# TODO nowiki, noinclude, includeonly, onlyinclude tags
+def _init_delimiters_patterns(special_tags: typ.Dict[str, _tags.NonHTMLTag]) -> typ.Dict[str, typ.Pattern[str]]:
+    """
+    Returns a mapping associating every special tag’s opening delimiter to a pattern that matches, in order of priority,
+    the line breaks that abort the tag, its nested opening delimiters and its closing delimiter.
+    """
+    patterns = {}
+    for open_delimiter, tag in special_tags.items():
+        delimiters = []
+        if not tag.multiline:
+            delimiters.append('\n')
+        if tag.auto_recursive and tag.open_delimiter != tag.close_delimiter:
+            delimiters.append(tag.open_delimiter)
+        delimiters.append(tag.close_delimiter)
+        patterns[open_delimiter] = re.compile('|'.join(map(re.escape, delimiters)))
+    return patterns
+
+
+class WikicodeMetadata(typ.NamedTuple):
+    """The categories, links and files of a wikicode, as extracted by WikicodeParser.extract_metadata()."""
+    # Category titles mapped to their sort key
+    categories: typ.Dict[str, typ.Optional[str]]
+    # Full titles of linked pages
+    links: typ.Set[str]
+    # Names of embedded files
+    files: typ.Set[str]
+
+
+class ParserBudget:
+    """
+    The resource limits counters of a parse.
+    A budget can be shared by the parsers of all sections of a page so that the limits apply to the whole page.
+    """
+    __slots__ = ('expansion_size', 'template_calls', 'nodes_count', 'deadline', 'limit_exceeded')
+
+    def __init__(self):
+        from .. import settings
+
+        self.expansion_size = 0
+        self.template_calls = 0
+        self.nodes_count = 0
+        self.deadline = time.perf_counter() + settings.PARSER_MAX_TIME
+        # The first limit (one of the WikicodeParser.LIMIT_* constants) that was exceeded, None if none was
+        self.limit_exceeded: typ.Optional[str] = None
+
+    @property
+    def counters(self) -> typ.Tuple[int, int, int]:
+        """The expansion size, template calls and nodes counters."""
+        return self.expansion_size, self.template_calls, self.nodes_count
+
+    def fits(self, cost: typ.Tuple[int, int, int]) -> bool:
+        """
+        Checks whether the given cost can be added to this budget without exceeding any limit.
+
+        :param cost: The expansion size, template calls and nodes count to add.
+        :return: True if no limit would be exceeded.
+        """
+        from .. import settings
+
+        expansion_size, template_calls, nodes_count = cost
+        return (not self.limit_exceeded
+                and self.expansion_size + expansion_size <= settings.PARSER_MAX_EXPANSION_SIZE
+                and self.template_calls + template_calls <= settings.PARSER_MAX_TEMPLATE_CALLS
+                and self.nodes_count + nodes_count <= settings.PARSER_MAX_NODES)
+
+    def add(self, cost: typ.Tuple[int, int, int]):
+        """
+        Adds the given cost to this budget’s counters.
+
+        :param cost: The expansion size, template calls and nodes count to add.
+        """
+        expansion_size, template_calls, nodes_count = cost
+        self.expansion_size += expansion_size
+        self.template_calls += template_calls
+        self.nodes_count += nodes_count
+
+
 class WikicodeParser:
     """
     The parser’s role is to convert wikicode into a token tree
@@ -58,6 +139,23 @@ class WikicodeParser:
     REDIRECT_PATTERN = re.compile(r'@REDIRECT\[\[([^\n]+?)(?:#([^\n]+?))?]]')
     MAX_TRANSCLUSIONS_DEPTH = 50  # TODO change after tests
 
+    VARIABLE_NAME_PATTERN = re.compile(r'[ \w.-]*')
+    VARIABLE_DELIMITERS_PATTERN = re.compile(r'{\[|]}')
+    TEMPLATE_NAME_PATTERN = re.compile(r'[\s\w:.-]*')
+    TEMPLATE_PARAM_NAME_PATTERN = re.compile(r'[\s\w.-]*')
+    TEMPLATE_DELIMITERS_PATTERN = re.compile(r'{{|}}|\|')
+    FUNCTION_NAME_PATTERN = re.compile(r'\w*')
+    FUNCTION_DELIMITERS_PATTERN = re.compile(r'{{|}}|\[\[|]]|\|')
+    SECTION_TITLE_PATTERN = re.compile(r'(=+)[ \t]*[^\n]+?[ \t]*\1[ \t]*')
+    SECTION_LINE_PATTERN = re.compile(r'[^\n]*\n|[^\n]+')
+    SECTION_TEMPLATE_DELIMITERS_PATTERN = re.compile(r'{{|}}')
+
+    # Resource limits
+    LIMIT_EXPANSION_SIZE = 'expansion_size'
+    LIMIT_TEMPLATE_CALLS = 'template_calls'
+    LIMIT_NODES = 'nodes'
+    LIMIT_TIME = 'time'
+
     # States
     TEXT = 'text'
     SPECIAL_TAG = 'special_tag'
@@ -133,18 +231,58 @@ class WikicodeParser:
     """
 
     __magic_keywords: typ.Dict[str, _registry.MagicKeyword] = {}
+    __magic_keywords_pattern: typ.Optional[typ.Pattern[str]] = None
     __special_tags: typ.Dict[str, _tags.NonHTMLTag] = _init_special_tags()
+    __text_delimiters_pattern = re.compile('|'.join(map(re.escape, [*__special_tags, '\n\n'])))
+    __tags_delimiters_patterns = _init_delimiters_patterns(__special_tags)
     __html_tags: typ.Dict[str, _tags.ExtendedHTMLTag] = {}  # TODO add extension ID
     __functions: typ.Dict[str, _registry.ParserFunction] = {}
+    __no_profile = contextlib.nullcontext()
+    __grammar = None  # Built on first use by the lark backend
+    __placeholder_pattern = re.compile(r'\?#`″PLACEHOLDER--(\w+)-[\dA-F]{8,}--REDLOHECALP″`#\?')
 
-    def __init__(self):
+    def __init__(self, profile: bool = None, backend: str = None, budget: ParserBudget = None):
+        """
+        :param profile: If true, the time spent in each parsing phase will be recorded in the profile property.
+            If None, the parser_profiling option of the config file will be used.
+        :param backend: The tokenizer to use, one of the PARSER_BACKEND_* constants of the settings module.
+            If None, the parser_backend option of the config file will be used.
+            Both tokenizers produce the same node trees.
+        :param budget: If specified, the resource limits will be counted in this budget, which is not reset
+            between parses. If None, each parse gets a new budget.
+        :raise ValueError: If the backend is unknown.
+        """
+        from .. import settings
+
+        if profile is None:
+            profile = settings.PARSER_PROFILING
+        if backend is None:
+            backend = settings.PARSER_BACKEND
+        if backend not in settings.PARSER_BACKENDS:
+            raise ValueError(f'invalid parser backend "{backend}"')
+        self.__profile = _profiler.ParserProfile() if profile else None
+        self.__backend = backend
         self.__max_depth_reached = False
         self.__too_many_redirects = False
         self.__circular_transclusion = False
         self.__called_non_existant_template = False
-        self.__delimiters_starts = {t.open_delimiter[0] for t in self.__special_tags.values()}
-        self.__placeholders = {}
+        self.__limit_exceeded: typ.Optional[str] = None
+        self.__tokenizing_aborted = False
+        self.__shared_budget = budget
+        self.__budget = budget or ParserBudget()
+        self.__placeholders: typ.Dict[str, str] = {}
         self.__categories = {}  # TODO
+        self.__templates = set()
+        self.__links: typ.Set[str] = set()
+        self.__templates_titles: typ.Dict[str, typ.Tuple[int, str]] = {}
+        self.__templates_revisions: typ.Dict[typ.Tuple[int, str], typ.Any] = {}
+        self.__templates_redirects: typ.Dict[typ.Tuple[int, str], typ.Optional[typ.Tuple[int, str]]] = {}
+        self.__expansions: typ.Dict[typ.Tuple[typ.Tuple[int, str], tuple], typ.Tuple[int, bool, str]] = {}
+        self.__expansions_cache_hits = 0
+        self.__expansions_cache_misses = 0
+        self.__depth_limit_hits = 0
+        self.__volatility = set()
+        self.__magic_keywords_values: typ.Dict[str, str] = {}
 
     @property
     def max_depth_reached(self) -> bool:
@@ -166,11 +304,73 @@ class WikicodeParser:
         """Whether there was an attempt to transclude a non-existant template."""
         return self.__called_non_existant_template
 
+    @property
+    def limit_exceeded(self) -> typ.Optional[str]:
+        """
+        The first resource limit (one of the LIMIT_* constants) that was exceeded while parsing the code,
+        None if the parse stayed within all limits.
+        """
+        return self.__limit_exceeded
+
+    @property
+    def volatility(self) -> typ.Set[str]:
+        """
+        The volatilities (VOLATILE_TIME, VOLATILE_USER, VOLATILE_REVISION) of all magic keywords
+        that were substituted while parsing.
+        Empty if the render of the parsed wikicode does not depend on the time, the current user or the revision.
+        """
+        return set(self.__volatility)
+
+    @property
+    def expansions_cache_hits(self) -> int:
+        """The number of template calls whose expansion was reused from a previous identical call."""
+        return self.__expansions_cache_hits
+
+    @property
+    def expansions_cache_misses(self) -> int:
+        """The number of template calls that had to be expanded."""
+        return self.__expansions_cache_misses
+
+    @property
+    def backend(self) -> str:
+        """The tokenizer used by this parser, one of the PARSER_BACKEND_* constants of the settings module."""
+        return self.__backend
+
+    @property
+    def profile(self) -> typ.Optional[_profiler.ParserProfile]:
+        """The profile of the parses performed by this parser. None if profiling is disabled."""
+        return self.__profile
+
+    def measure(self, phase: str) -> typ.ContextManager:
+        """
+        Returns a context manager that measures the time spent in the given phase if profiling is enabled.
+
+        :param phase: The phase to measure, one of the PHASE_* constants.
+        :return: The context manager.
+        """
+        return self.__profile.measure(phase) if self.__profile else self.__no_profile
+
     @property
     def categories(self) -> typ.Dict[str, str]:
         """The list of categories with their sort key that where encountered while parsing."""
         return dict(self.__categories)
 
+    @property
+    def templates(self) -> typ.Set[typ.Tuple[int, str]]:
+        """
+        The set of pages that were transcluded while parsing, as (namespace ID, title) tuples.
+        Redirections and non-existant templates are included.
+        """
+        return set(self.__templates)
+
+    @property
+    def links(self) -> typ.Set[str]:
+        """
+        The full titles of the pages the result of parser functions depended on while parsing,
+        like the pages whose existence was checked. Links tags are not included, they are part of the node tree.
+        """
+        return set(self.__links)
+
     def parse_wikicode(self, wikicode: str, context, no_redirect: bool = False) \
             -> typ.Union[_nodes.DocumentNode, _nodes.RedirectNode]:
         """
@@ -183,8 +383,48 @@ class WikicodeParser:
                             RedirectNode will be returned instead.
         :return: The parsed wikicode as a DocumentNode or RedirectNode.
         """
+        self._reset_limits()
         return self._parse_wikicode_impl(wikicode, context, 0, no_redirect, {})
 
+    def extract_metadata(self, wikicode: str, context) -> WikicodeMetadata:
+        """
+        Extracts the categories, links and files of the given wikicode without building its node tree.
+        Magic keywords, variables, transclusions and functions are expanded as by parse_wikicode()
+        but the expanded wikicode is then only scanned for link, category and file tags.
+        Only the nodes of these tags are created, no paragraph, text or style nodes.
+        The result is the same as the one of parse_wikicode() with no_redirect set to true,
+        except that the nodes count limit is not enforced.
+        The categories and templates properties are updated the same way.
+
+        :param wikicode: The wikicode to scan.
+        :param context: The page context to use.
+        :type context: WikiPy.page_context.PageContext
+        :return: The categories, links and files of the wikicode. Redirections have none.
+        """
+        self._reset_limits()
+        metadata = WikicodeMetadata(categories={}, links=set(), files=set())
+        wikicode = wikicode.strip()
+        if self.get_redirect(wikicode):
+            return metadata
+
+        wikicode = self._preprocess(wikicode)
+        wikicode = self._substitute_and_transclude(wikicode, context, 0, {})
+        with self.measure(PHASE_FUNCTIONS):
+            wikicode = self._substitute_functions(wikicode, context)
+        wikicode = wikicode.replace('{{!}}', '|')  # Substitute '|' placeholders
+        wikicode = self.make_safe(wikicode)
+        with self.measure(PHASE_PLACEHOLDERS):
+            wikicode = self._substitute_placeholders(wikicode)
+        with self.measure(PHASE_TOKENIZING):
+            self._scan_metadata(wikicode, metadata)
+        self.__categories.update(metadata.categories)
+        return metadata
+
+    def _reset_limits(self):
+        """Resets the resource limits counters before a new parse, unless the budget is shared."""
+        self.__budget = self.__shared_budget or ParserBudget()
+        self.__tokenizing_aborted = False
+
     def _parse_wikicode_impl(self, wikicode: str, context, depth: int, no_redirect: bool,
                              variables_values: typ.Dict[str, str]) \
             -> typ.Union[_nodes.DocumentNode, _nodes.RedirectNode]:
@@ -208,6 +448,7 @@ class WikicodeParser:
         # Maximum depth reached, stop parsing
         if depth > self.MAX_TRANSCLUSIONS_DEPTH:
             self.__max_depth_reached = True
+            self.__depth_limit_hits += 1
             return _nodes.DocumentNode(_nodes.ParagraphNode(_nodes.TextNode(text=self.make_safe(wikicode))))
 
         if redirect := self.get_redirect(wikicode):
@@ -216,7 +457,8 @@ class WikicodeParser:
                 root_node = _nodes.RedirectNode(target_page=page_title, anchor=anchor)
             else:
                 ns, title = api_titles.extract_namespace_and_title(page_title, ns_as_id=True)
-                revision = api_pages.get_page_revision(ns, title, performer=context.user)
+                with self.measure(PHASE_DB_LOOKUPS):
+                    revision = api_pages.get_page_revision(ns, title, performer=context.user)
                 if revision:
                     root_node = self._parse_wikicode_impl(revision.content, context, depth + 1, no_redirect=False,
                                                           variables_values=variables_values)
@@ -224,13 +466,38 @@ class WikicodeParser:
                     root_node = _nodes.DocumentNode(
                         _nodes.ParagraphNode(_nodes.TextNode(text=self.make_safe(wikicode))))
         else:
+            wikicode = self._preprocess(wikicode)
             wikicode = self._substitute_and_transclude(wikicode, context, depth, variables_values)
-            wikicode = self._substitute_functions(wikicode)
+            with self.measure(PHASE_FUNCTIONS):
+                wikicode = self._substitute_functions(wikicode, context)
             wikicode = wikicode.replace('{{!}}', '|')  # Substitute '|' placeholders
-            root_node = _nodes.DocumentNode(*self._parse_document(wikicode, top=depth == 0))
+            with self.measure(PHASE_TOKENIZING):
+                root_node = _nodes.DocumentNode(*self._parse_document(wikicode, context, top=depth == 0))
 
         return root_node
 
+    def _preprocess(self, wikicode: str, template_revision=None) -> str:
+        """
+        Handles the nowiki, noinclude, includeonly and onlyinclude tags of the given wikicode.
+        The contents of nowiki tags are replaced by placeholders that are only substituted
+        once the whole document has been tokenized.
+
+        :param wikicode: The wikicode to preprocess.
+        :param template_revision: If the wikicode is transcluded, the template revision it is the content of.
+            The preprocessed wikicode of template revisions is cached.
+        :type template_revision: WikiPy.models.PageRevision
+        :return: The preprocessed wikicode.
+        """
+        with self.measure(PHASE_PREPROCESSING):
+            if template_revision is not None:
+                chunks = _preprocessor.preprocess_template(template_revision)
+            else:
+                chunks = _preprocessor.preprocess(wikicode, transcluded=False)
+            if len(chunks) == 1:
+                return chunks[0]
+            return ''.join(chunk if i % 2 == 0 else self._generate_placeholder('nowiki', self.make_safe(chunk))
+                           for i, chunk in enumerate(chunks))
+
     def _substitute_and_transclude(self, wikicode: str, context, depth: int, variables_values: typ.Dict[str, str]) \
             -> str:
         """
@@ -246,24 +513,38 @@ class WikicodeParser:
         :param variables_values: A dictionary mapping variables to their respective values.
         :return: The substituted wikicode.
         """
-        wikicode = self._substitute_magic_keywords(wikicode, context)
-        wikicode = self._substitute_variables(wikicode, variables_values)
-        return self._perform_transclusions(wikicode, context, depth)
+        with self.measure(PHASE_MAGIC_KEYWORDS):
+            wikicode = self._substitute_magic_keywords(wikicode, context)
+        with self.measure(PHASE_VARIABLES):
+            wikicode = self._substitute_variables(wikicode, variables_values)
+        with self.measure(PHASE_TRANSCLUSIONS):
+            return self._perform_transclusions(wikicode, context, depth)
 
     def _substitute_magic_keywords(self, wikicode: str, context) -> str:
         """
-        Substitutes magic keywords with their value.
+        Substitutes magic keywords with their value in a single pass.
+        Each keyword is evaluated at most once per parse.
 
         :param wikicode: The wikicode to perform substitutions on.
         :param context: The context to use.
         :type context: WikiPy.page_context.PageContext
         :return: The substituted wikicode.
         """
-        for name, mk in self.__magic_keywords.items():
-            token = f'{{{{{name}}}}}'
-            if token in wikicode:
-                wikicode = wikicode.replace(token, mk(context) if mk.takes_context else mk())
-        return wikicode
+        if not self.__magic_keywords_pattern:
+            return wikicode
+
+        values = self.__magic_keywords_values
+
+        def substitute(match: typ.Match[str]) -> str:
+            name = match[1]
+            if name not in values:
+                mk = self.__magic_keywords[name]
+                if mk.volatile:
+                    self.__volatility.add(mk.volatile)
+                values[name] = mk(context) if mk.takes_context else mk()
+            return values[name]
+
+        return self.__magic_keywords_pattern.sub(substitute, wikicode)
 
     def _substitute_variables(self, wikicode: str, variables_values: typ.Dict[str, str], depth: int = 0) -> str:
         """
@@ -277,86 +558,49 @@ class WikicodeParser:
         # Maximum depth reached, stop parsing
         if depth > self.MAX_TRANSCLUSIONS_DEPTH:
             self.__max_depth_reached = True
+            self.__depth_limit_hits += 1
             return wikicode
 
+        def value_of(name: str, default: str) -> str:
+            name = name.strip()
+            if name in variables_values:
+                return variables_values[name]
+            return self._substitute_variables(default.strip(), variables_values, depth=depth + 1)
+
         open_delimiter = '{['
         close_delimiter = ']}'
-        result = ''
-        buffer = ''
-        in_variable = False
-        in_name = False
-        var_name = ''
-        default_value = ''
-        # Number of times the variable opening delimiter has been encountered
-        opened_tags = 0
+        chunks = []
+        length = len(wikicode)
         i = 0
 
-        while i < len(wikicode):
-            c = wikicode[i]
-            next_c = wikicode[i + 1] if i < len(wikicode) - 1 else ''
-            open_del = c + next_c == open_delimiter
-            close_del = c + next_c == close_delimiter
-
-            if not in_variable:
-                if open_del:
-                    result += buffer
-                    in_variable = True
-                    in_name = True
-                    opened_tags += 1
-                    var_name = ''
-                    default_value = ''
-                    buffer = ''
-                    i += 1
-                else:
-                    buffer += c
-
-            elif in_name:
-                if re.match(r'[ \w.-]', c):
-                    var_name += c
-                elif c == '|' or close_del:
-                    in_name = False
-                    if close_del:
-                        in_variable = False
-                        result += variables_values.get(var_name.strip(), open_delimiter + var_name + close_delimiter)
-                        opened_tags -= 1
-                        i += 1
-                else:
-                    buffer += open_delimiter + var_name
-                    in_variable = False
-                    in_name = False
-                    opened_tags -= 1
-                    i -= 1  # Step back to not skip current character, it may be part of a tag opening
-
-            else:
-                if open_del:
-                    opened_tags += 1
-                    default_value += c + next_c
-                    i += 1
-                elif close_del:
-                    opened_tags -= 1
+        while (start := wikicode.find(open_delimiter, i)) != -1:
+            chunks.append(wikicode[i:start])
+            m = self.VARIABLE_NAME_PATTERN.match(wikicode, start + 2)
+            var_name = m.group()
+            i = m.end()
+
+            if wikicode.startswith(close_delimiter, i):
+                chunks.append(variables_values.get(var_name.strip(), open_delimiter + var_name + close_delimiter))
+                i += 2
+            elif i < length and wikicode[i] == '|':
+                # Look for the closing delimiter matching the opening one
+                default_start = i + 1
+                opened_tags = 1
+                for m in self.VARIABLE_DELIMITERS_PATTERN.finditer(wikicode, default_start):
+                    opened_tags += 1 if m.group() == open_delimiter else -1
                     if opened_tags == 0:
-                        result += variables_values.get(
-                            var_name.strip(),
-                            self._substitute_variables(default_value.strip(), variables_values, depth=depth + 1)
-                        )
-                        default_value = ''
-                        in_variable = False
-                        i += 1
-                    else:
-                        default_value += c
-                else:
-                    default_value += c
-
-            i += 1
-        if in_variable:
-            buffer += open_delimiter + var_name
-            if not in_name:
-                buffer += '|' + variables_values.get(
-                    var_name.strip(),
-                    self._substitute_variables(default_value.strip(), variables_values, depth=depth + 1)
-                )
+                        chunks.append(value_of(var_name, wikicode[default_start:m.start()]))
+                        i = m.end()
+                        break
+                else:  # Unclosed variable
+                    chunks.append(open_delimiter + var_name + '|' + value_of(var_name, wikicode[default_start:]))
+                    i = length
+            else:
+                # Invalid character in name or end of text, resume from current character
+                chunks.append(open_delimiter + var_name)
 
-        return result + buffer
+        chunks.append(wikicode[i:])
+        return ''.join(chunks)
 
     def _perform_transclusions(self, wikicode: str, context, depth: int) -> str:
         """
@@ -371,308 +615,728 @@ class WikicodeParser:
         # Maximum depth reached, stop parsing
         if depth > self.MAX_TRANSCLUSIONS_DEPTH:
             self.__max_depth_reached = True
+            self.__depth_limit_hits += 1
             return wikicode
 
-        from ..api import titles as api_titles, pages as api_pages
-        from .. import settings
-
-        def transclude():
-            redirects_depth = 0
-            current_template_name = template_name
-            while redirects_depth <= settings.MAX_REDIRECTS_DEPTH:
-                ns_id, title = api_titles.extract_namespace_and_title(current_template_name, ns_as_id=True)
-                if ns_id == settings.MAIN_NS.id and not current_template_name.strip().startswith(':'):
-                    full_title = api_titles.get_full_page_title(settings.TEMPLATE_NS.id, title)
-                else:
-                    full_title = api_titles.get_full_page_title(ns_id, title)
-                ns_id, title = api_titles.extract_namespace_and_title(
-                    api_titles.get_actual_page_title(api_titles.title_from_url(full_title)),
-                    ns_as_id=True
-                )
-
-                if ns_id == context.page.namespace_id and title == context.page.title:
-                    self.__circular_transclusion = True
-                    text = context.language.translate('parser.error.circular_transclusion')
-                    return self._generate_placeholder(
-                        'error',
-                        f'<span class="wpy-parser-error wpy-circular-transclusion">{text}</span>'
-                    )
-
-                revision = api_pages.get_page_revision(ns_id, title, performer=context.user)
-                if revision:
-                    redirect = self.get_redirect(revision.content)
-                    if redirect:
-                        current_template_name = redirect[0]
-                        redirects_depth += 1
-                    else:
-                        return self._substitute_and_transclude(revision.content, context, depth + 1,
-                                                               variables_values={k.strip(): v.strip() for k, v in
-                                                                                 params_values.items()})
-                else:
-                    self.__called_non_existant_template = True
-                    return f'[[{api_titles.get_namespace_name(ns_id)}:{title}]]'
-
-            self.__too_many_redirects = True
-            text = context.language.translate('parser.error.too_many_redirects', template_name=template_name)
-            return self._generate_placeholder(
-                'error',
-                f'<span class="wpy-parser-error wpy-too-many-redirects">{text}</span>'
-            )
-
         open_delimiter = '{{'
         close_delimiter = '}}'
-        result = ''
-        buffer = ''
-        in_template = False
-        in_name = False
-        in_param_name = False
-        in_param_value = False
-        template_name = ''
-        param_index = 1
-        param_name = ''
-        param_value = ''
-        params_values = {}
-        opened_tags = 0
+        chunks = []
+        length = len(wikicode)
         i = 0
 
-        while i < len(wikicode):
-            c = wikicode[i]
-            next_c = wikicode[i + 1] if i < len(wikicode) - 1 else ''
-            open_del = c + next_c == open_delimiter
-            close_del = c + next_c == close_delimiter
-
-            if not in_template:
-                if open_del:
-                    result += buffer
-                    in_template = True
-                    in_name = True
-                    template_name = ''
-                    param_index = 1
-                    param_name = ''
-                    param_value = ''
-                    params_values = {}
-                    buffer = ''
-                    i += 1
-                else:
-                    buffer += c
-
-            elif in_name:
-                if re.match(r'[\s\w:.-]', c):
-                    template_name += c
-                elif c == '|' or close_del:
-                    in_name = False
-                    if close_del:
-                        in_template = False
-                        result += transclude()
-                        i += 1
-                    else:
-                        in_param_name = True
-                        param_name = ''
-                        param_value = ''
-                else:
-                    buffer += open_delimiter + template_name
-                    in_template = False
-                    in_name = False
-                    i -= 1  # Step back to not skip current character, it may be part of a tag opening
-
-            elif in_param_name:
-                if re.match(r'[\s\w.-]', c):
-                    param_name += c
-                elif c == '=':
+        while (start := wikicode.find(open_delimiter, i)) != -1:
+            chunks.append(wikicode[i:start])
+            m = self.TEMPLATE_NAME_PATTERN.match(wikicode, start + 2)
+            template_name = m.group()
+            i = m.end()
+
+            if wikicode.startswith(close_delimiter, i):
+                chunks.append((template_name, {}))
+                i += 2
+                continue
+            if i == length or wikicode[i] != '|':
+                # Invalid character in name or end of text, resume from current character
+                chunks.append(open_delimiter + template_name)
+                continue
+
+            i += 1
+            param_index = 1
+            param_name = ''
+            param_value = ''
+            params_values = {}
+            closed = False
+
+            while i < length:
+                m = self.TEMPLATE_PARAM_NAME_PATTERN.match(wikicode, i)
+                param_name = m.group()
+                param_value = ''
+                i = m.end()
+                if i == length:
+                    break
+
+                c = wikicode[i]
+                opened_tags = 0
+                if c == '=':
                     if param_name.strip() == '':
                         param_value = param_name + '='
                         param_name = str(param_index)
                         param_index += 1
-                    in_param_name = False
-                    in_param_value = True
-                elif c == '|' or close_del:
+                    i += 1
+                elif c == '|' or wikicode.startswith(close_delimiter, i):
                     # Positional parameter, param_name contains the actual value
                     params_values[str(param_index)] = param_name
-                    if close_del:
-                        in_template = False
-                        in_param_name = False
-                        result += transclude()
-                        i += 1
-                        buffer = ''
-                    else:
-                        param_name = ''
+                    param_name = ''
+                    if c == '|':
                         param_index += 1
-                elif open_del:
-                    opened_tags += 1
-                    in_param_name = False
-                    in_param_value = True
-                    param_value = param_name + c + next_c
+                        i += 1
+                        continue
+                    closed = True
+                    i += 2
+                    break
+                elif wikicode.startswith(open_delimiter, i):
+                    opened_tags = 1
+                    param_value = param_name + open_delimiter
                     param_name = str(param_index)
                     param_index += 1
-                    i += 1
+                    i += 2
                 else:
-                    in_param_name = False
-                    in_param_value = True
                     param_value = param_name
+                    i += 1
 
-            elif in_param_value:
-                if opened_tags > 0:
-                    if close_del:
-                        opened_tags -= 1
-                        param_value += c + next_c
-                        i += 1
-                    elif open_del:
+                # Look for the end of the parameter’s value
+                value_start = i
+                for m in self.TEMPLATE_DELIMITERS_PATTERN.finditer(wikicode, value_start):
+                    delimiter = m.group()
+                    if delimiter == open_delimiter:
                         opened_tags += 1
-                        param_value += c + next_c
-                        i += 1
-                    else:
-                        param_value += c
-                elif c == '|' or close_del:
-                    params_values[param_name] = param_value
-                    in_param_value = False
-                    if close_del:
-                        in_template = False
-                        result += transclude()
-                        i += 1
-                        buffer = ''
+                    elif opened_tags > 0:
+                        if delimiter == close_delimiter:
+                            opened_tags -= 1
                     else:
-                        in_param_name = True
+                        params_values[param_name] = param_value + wikicode[value_start:m.start()]
                         param_name = ''
-                        param_value = ''
-                elif open_del:
-                    opened_tags += 1
-                    param_value += c + next_c
-                    i += 1
+                        i = m.end()
+                        closed = delimiter == close_delimiter
+                        break
                 else:
-                    param_value += c
+                    param_value += wikicode[value_start:]
+                    i = length
+                if closed:
+                    break
+
+            if closed:
+                chunks.append((template_name, params_values))
+            else:  # Unclosed template
+                chunks.append(open_delimiter + template_name)
+                if param_name:
+                    params_values[param_name] = param_value
+                if params_values:
+                    def subst(item):
+                        if not item[0].strip().isdigit():
+                            key = (item[0] + '=')
+                        else:
+                            key = ''
+                        return key + self._perform_transclusions(item[1], context, depth)
 
-            i += 1
-        if in_template:
-            buffer += open_delimiter + template_name
-            if param_name:
-                params_values[param_name] = param_value
-            if params_values:
-                def subst(item):
-                    if not item[0].strip().isdigit():
-                        key = (item[0] + '=')
-                    else:
-                        key = ''
-                    return key + self._perform_transclusions(item[1], context, depth)
+                    chunks.append('|' + '|'.join(map(subst, params_values.items())))
+
+        chunks.append(wikicode[i:])
+
+        # Fetch all templates of this level at once before expanding them
+        calls = [chunk for chunk in chunks if isinstance(chunk, tuple)]
+        if calls:
+            self._prefetch_templates([template_name for template_name, _ in calls], context)
+            chunks = [self._transclude(chunk[0], chunk[1], context, depth) if isinstance(chunk, tuple) else chunk
+                      for chunk in chunks]
+
+        return ''.join(chunks)
+
+    def _prefetch_templates(self, templates_names: typ.Iterable[str], context):
+        """
+        Fetches the latest revisions of the given templates and of the pages they redirect to.
+        Redirections are resolved with the redirect table, one query per level of redirection,
+        and only the revisions of the pages that are not redirections are fetched, with a single query.
+
+        :param templates_names: The raw names of the templates to fetch.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        """
+        from .. import settings
+
+        # The current page is never fetched as transcluding it is an error
+        current_page = {(context.page.namespace_id, context.page.title)}
+        pages = {self._resolve_template_title(template_name) for template_name in templates_names} - current_page
+        templates = set()
+        for _ in range(settings.MAX_REDIRECTS_DEPTH + 1):
+            if not pages:
+                break
+            self._fetch_templates_redirects(pages)
+            targets = {self.__templates_redirects[page] for page in pages} - {None}
+            templates.update(page for page in pages if not self.__templates_redirects[page])
+            pages = targets - self.__templates_redirects.keys() - current_page
+        self._fetch_templates_revisions(templates, context)
+
+    def _fetch_templates_redirects(self, pages: typ.Iterable[typ.Tuple[int, str]]):
+        """
+        Fetches the redirection targets of the given pages that were not already fetched during this parse.
+
+        :param pages: The pages to fetch, as (namespace ID, title) tuples.
+        """
+        from ..api import pages as api_pages
+
+        if missing := [page for page in pages if page not in self.__templates_redirects]:
+            with self.measure(PHASE_DB_LOOKUPS):
+                targets = api_pages.get_redirects_targets(missing)
+            for page in missing:
+                target = targets.get(page)
+                self.__templates_redirects[page] = (target.namespace_id, target.title) if target else None
+
+    def _fetch_templates_revisions(self, pages: typ.Iterable[typ.Tuple[int, str]], context):
+        """
+        Fetches the latest revisions of the given pages that were not already fetched during this parse.
+
+        :param pages: The pages to fetch, as (namespace ID, title) tuples.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        """
+        from ..api import pages as api_pages
+
+        if missing := [page for page in pages if page not in self.__templates_revisions]:
+            with self.measure(PHASE_DB_LOOKUPS):
+                self.__templates_revisions.update(api_pages.get_latest_revisions(missing, performer=context.user))
+
+    def _resolve_template_title(self, template_name: str) -> typ.Tuple[int, str]:
+        """
+        Returns the namespace ID and title of the page the given template name refers to.
+        Names without a namespace refer to pages of the Template namespace, unless they start with a colon.
+
+        :param template_name: The raw name of the template.
+        :return: The page’s namespace ID and title.
+        """
+        from ..api import titles as api_titles
+        from .. import settings
+
+        if template_name not in self.__templates_titles:
+            ns_id, title = api_titles.extract_namespace_and_title(template_name, ns_as_id=True)
+            if ns_id == settings.MAIN_NS.id and not template_name.strip().startswith(':'):
+                full_title = api_titles.get_full_page_title(settings.TEMPLATE_NS.id, title)
+            else:
+                full_title = api_titles.get_full_page_title(ns_id, title)
+            self.__templates_titles[template_name] = api_titles.extract_namespace_and_title(
+                api_titles.get_actual_page_title(api_titles.title_from_url(full_title)),
+                ns_as_id=True
+            )
+        return self.__templates_titles[template_name]
+
+    def _transclude(self, template_name: str, params_values: typ.Dict[str, str], context, depth: int) -> str:
+        """
+        Transcludes the given template, following redirections.
+        If a resource limit is exceeded, an error is returned instead and all subsequent transclusions are skipped.
+
+        :param template_name: The raw name of the template to transclude.
+        :param params_values: The values of the template’s parameters.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :param depth: The current recursive parsing depth.
+        :return: The expanded template.
+        """
+        from .. import settings
+
+        budget = self.__budget
+        if budget.limit_exceeded:
+            return ''
+        budget.template_calls += 1
+        if budget.template_calls > settings.PARSER_MAX_TEMPLATE_CALLS:
+            return self._limit_error(self.LIMIT_TEMPLATE_CALLS, context)
+        if time.perf_counter() > budget.deadline:
+            return self._limit_error(self.LIMIT_TIME, context)
+
+        expansion = self._get_expansion(template_name, params_values, context, depth)
+        if budget.limit_exceeded:  # Exceeded while expanding
+            return expansion
+        budget.expansion_size += len(expansion)
+        if budget.expansion_size > settings.PARSER_MAX_EXPANSION_SIZE:
+            return self._limit_error(self.LIMIT_EXPANSION_SIZE, context)
+        return expansion
+
+    def _get_expansion(self, template_name: str, params_values: typ.Dict[str, str], context, depth: int) -> str:
+        """
+        Returns the expansion of the given template.
+        Expansions are memoized for the duration of the parse, keyed by the template’s title and parameters.
+        An expansion that did not reach the maximum depth is reused for calls at the same depth or shallower,
+        otherwise it is only reused for calls at the exact same depth.
+
+        :param template_name: The raw name of the template to transclude.
+        :param params_values: The values of the template’s parameters.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :param depth: The current recursive parsing depth.
+        :return: The expanded template.
+        """
+        from ..api import titles as api_titles
+
+        variables_values = {k.strip(): v.strip() for k, v in params_values.items()}
+        key = (self._resolve_template_title(template_name), tuple(sorted(variables_values.items())))
+        if key in self.__expansions:
+            expansion_depth, limited, expansion = self.__expansions[key]
+            if depth == expansion_depth or not limited and depth < expansion_depth:
+                self.__expansions_cache_hits += 1
+                if limited:  # Propagate to the expansions that contain this one
+                    self.__depth_limit_hits += 1
+                return expansion
+
+        self.__expansions_cache_misses += 1
+        depth_limit_hits = self.__depth_limit_hits
+        if self.__profile:
+            with self.__profile.measure_template(api_titles.get_full_page_title(*key[0])):
+                expansion, memoizable = self._expand_template(template_name, variables_values, context, depth)
+        else:
+            expansion, memoizable = self._expand_template(template_name, variables_values, context, depth)
+        if memoizable:
+            self.__expansions[key] = (depth, self.__depth_limit_hits != depth_limit_hits, expansion)
+        return expansion
 
-                buffer += '|' + '|'.join(map(subst, params_values.items()))
+    def _expand_template(self, template_name: str, variables_values: typ.Dict[str, str], context, depth: int) \
+            -> typ.Tuple[str, bool]:
+        """
+        Expands the given template, following redirections.
 
-        return result + buffer
+        :param template_name: The raw name of the template to transclude.
+        :param variables_values: The values of the template’s parameters.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :param depth: The current recursive parsing depth.
+        :return: The expanded template and a boolean indicating whether the expansion may be memoized.
+        """
+        from ..api import titles as api_titles
+        from .. import settings
 
-    # noinspection PyMethodMayBeStatic
-    def _substitute_functions(self, wikicode: str) -> str:
+        redirects_depth = 0
+        ns_id, title = self._resolve_template_title(template_name)
+        while redirects_depth <= settings.MAX_REDIRECTS_DEPTH:
+            if ns_id == context.page.namespace_id and title == context.page.title:
+                self.__circular_transclusion = True
+                text = context.language.translate('parser.error.circular_transclusion')
+                return self._generate_placeholder(
+                    'error',
+                    f'<span class="wpy-parser-error wpy-circular-transclusion">{text}</span>'
+                ), True
+
+            self.__templates.add((ns_id, title))
+            self._fetch_templates_redirects([(ns_id, title)])
+            if target := self.__templates_redirects[(ns_id, title)]:
+                ns_id, title = target
+                redirects_depth += 1
+                continue
+            self._fetch_templates_revisions([(ns_id, title)], context)
+            if revision := self.__templates_revisions[(ns_id, title)]:
+                wikicode = self._preprocess(revision.content, template_revision=revision)
+                return self._substitute_and_transclude(wikicode, context, depth + 1,
+                                                       variables_values=variables_values), True
+            else:
+                self.__called_non_existant_template = True
+                return f'[[{api_titles.get_namespace_name(ns_id)}:{title}]]', True
+
+        self.__too_many_redirects = True
+        # Not memoizable as the error message contains the raw template name
+        text = context.language.translate('parser.error.too_many_redirects', template_name=template_name)
+        return self._generate_placeholder(
+            'error',
+            f'<span class="wpy-parser-error wpy-too-many-redirects">{text}</span>'
+        ), False
+
+    def _substitute_functions(self, wikicode: str, context) -> str:
         """
-        Substitutes all parser functions.
+        Substitutes all parser function calls ({{#name:arg1|arg2|…}}) with their result.
+        Calls in arguments are substituted before the function is called.
 
         :param wikicode: The wikicode to perform substitutions on.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
         :return: The substituted wikicode.
         """
-        return wikicode  # TODO
+        open_delimiter = '{{#'
+        if open_delimiter not in wikicode:
+            return wikicode
+
+        chunks = []
+        length = len(wikicode)
+        i = 0
+
+        while (start := wikicode.find(open_delimiter, i)) != -1:
+            chunks.append(wikicode[i:start])
+            m = self.FUNCTION_NAME_PATTERN.match(wikicode, start + 3)
+            function_name = m.group()
+            i = m.end()
+
+            if function_name and wikicode.startswith('}}', i):
+                chunks.append(self._call_function(function_name, [], context))
+                i += 2
+                continue
+            if not function_name or i == length or wikicode[i] != ':':
+                # Invalid character in name or end of text, resume from current character
+                chunks.append(wikicode[start:i])
+                continue
+
+            # Split arguments, ignoring pipes in nested templates, functions and links
+            args = []
+            arg_start = i + 1
+            opened_tags = 0
+            for m in self.FUNCTION_DELIMITERS_PATTERN.finditer(wikicode, arg_start):
+                delimiter = m.group()
+                if delimiter in ('{{', '[['):
+                    opened_tags += 1
+                elif opened_tags > 0:
+                    if delimiter != '|':
+                        opened_tags -= 1
+                elif delimiter == '|':
+                    args.append(wikicode[arg_start:m.start()])
+                    arg_start = m.end()
+                elif delimiter == '}}':
+                    args.append(wikicode[arg_start:m.start()])
+                    args = [self._substitute_functions(arg, context).strip() for arg in args]
+                    chunks.append(self._call_function(function_name, args, context))
+                    i = m.end()
+                    break
+            else:  # Unclosed call, resume from current character
+                chunks.append(wikicode[start:i])
+
+        chunks.append(wikicode[i:])
+        return ''.join(chunks)
+
+    def _call_function(self, function_name: str, args: typ.List[str], context) -> str:
+        """
+        Calls the given parser function.
 
-    def _parse_document(self, wikicode: str, top: bool = False) -> typ.Sequence[_nodes.WikicodeNode]:
+        :param function_name: The name of the function.
+        :param args: The arguments to pass to the function.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :return: The function’s result or an error if the function does not exist, the arguments do not match
+            or the function raised an exception.
         """
-        Converts the wiki code into a sequence of nodes.
+        function = self.__functions.get(function_name)
+        if not function:
+            error, css_class = 'unknown_function', 'wpy-unknown-function'
+        elif not function.accepts(*args):
+            error, css_class = 'invalid_function_arguments', 'wpy-invalid-function-arguments'
+        else:
+            if function.page_argument is not None and function.page_argument < len(args):
+                self.__links.add(args[function.page_argument])
+            try:
+                return function(*args)
+            except Exception:  # A faulty function, possibly from an extension, must not break the whole render
+                logging.exception(f'Error in parser function "{function_name}" called with arguments {args!r}.')
+                error, css_class = 'function_error', 'wpy-function-error'
+        text = context.language.translate(f'parser.error.{error}', function_name=function_name)
+        return self._generate_placeholder('error', f'<span class="wpy-parser-error {css_class}">{text}</span>')
+
+    def _parse_document(self, wikicode: str, context, top: bool = False) -> typ.Sequence[_nodes.WikicodeNode]:
+        """
+        Converts the wiki code into a sequence of nodes using the selected tokenizer.
+        If a resource limit is exceeded, the remaining wikicode is discarded.
 
         :param wikicode: The wikicode to parse.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
         :param top: Indicates whether the given wikicode is at the root document.
             If true, all placeholders will be substituted with their value.
         :return: A sequence of nodes.
         """
+        from .. import settings
+
+        wikicode = self.make_safe(wikicode)  # TEMP remove once HTML tags are correctly parsed
+
+        if top:
+            # Tags should be already parsed at this point,
+            # we can safely re-insert placeholders (except nowikis)
+            with self.measure(PHASE_PLACEHOLDERS):
+                wikicode = self._substitute_placeholders(wikicode)
+
+        if self.__backend == settings.PARSER_BACKEND_LARK:
+            nodes = self._tokenize_with_grammar(wikicode, context)
+        else:
+            nodes = self._tokenize(wikicode, context)
+
+        if top:
+            for node in nodes:
+                with self.measure(PHASE_PLACEHOLDERS):
+                    node.substitute_placeholders(lambda text: self._substitute_placeholders(text, nowiki=True))
+                self.__categories.update({
+                    category_node.title: category_node.sort_key
+                    for category_node in node.get_categories()
+                })
+
+        return nodes
+
+    def _tokenize(self, wikicode: str, context) -> typ.List[_nodes.WikicodeNode]:
+        """
+        Converts the given escaped wikicode into a sequence of nodes with the hand-written state machine.
 
+        :param wikicode: The wikicode to parse.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :return: A list of nodes.
+        """
         def new_paragraph(b: str):
             nonlocal paragraph
 
             if b.strip():
                 paragraph.append(_nodes.TextNode(text=b))
+                self.__budget.nodes_count += 1
             if not paragraph.is_empty:
                 nodes.append(paragraph)
                 paragraph = _nodes.ParagraphNode()
-
-        wikicode = self.make_safe(wikicode)  # TEMP remove once HTML tags are correctly parsed
-
-        if top:
-            # Tags should be already parsed at this point,
-            # we can safely re-insert placeholders (except nowikis)
-            wikicode = self._substitute_placeholders(wikicode)
+                self.__budget.nodes_count += 1
 
         state = self.TEXT
         tag = None
         nodes = []
         paragraph = _nodes.ParagraphNode()
-        buffer = ''
+        buffer = []
         # Number of times the current delimiter has been encountered for the current tag
         opened_tags = 0
+        length = len(wikicode)
         i = 0
 
-        while i < len(wikicode):
-            c = wikicode[i]
-            next_c = wikicode[i + 1] if i < len(wikicode) - 1 else ''
+        while i < length:
+            if self._check_tokenizing_limits(buffer, context):
+                break
 
             if state == self.TEXT:
-                if t := self.__special_tags.get(c + next_c):
-                    tag = t
+                m = self.__text_delimiters_pattern.search(wikicode, i)
+            else:
+                m = self.__tags_delimiters_patterns[tag.open_delimiter].search(wikicode, i)
+            if not m:
+                buffer.append(wikicode[i:])
+                break
+            buffer.append(wikicode[i:m.start()])
+            delimiter = m.group()
+            i = m.end()
+
+            if state == self.TEXT:
+                if delimiter == '\n\n':
+                    new_paragraph(''.join(buffer))
+                    buffer = []
+                else:
+                    tag = self.__special_tags[delimiter]
                     opened_tags = 1
-                    if buffer:
-                        paragraph.append(_nodes.TextNode(text=buffer))
-                        buffer = ''
+                    if text := ''.join(buffer):
+                        paragraph.append(_nodes.TextNode(text=text))
+                        self.__budget.nodes_count += 1
+                    buffer = []
                     state = self.SPECIAL_TAG
-                    i += 1
-                elif c + next_c == '\n\n':
-                    new_paragraph(buffer)
-                    buffer = ''
-                    i += 1
-                else:
-                    buffer += c
 
-            elif state == self.SPECIAL_TAG:
-                if c == '\n' and not tag.multiline:
-                    buffer = tag.open_delimiter + buffer
+            elif delimiter == '\n':
+                buffer.insert(0, tag.open_delimiter)
+                state = self.TEXT
+                tag = None
+                i = m.start()  # Do not skip the line break, it may be part of a paragraph break
+            elif tag.auto_recursive and tag.open_delimiter != tag.close_delimiter \
+                    and delimiter == tag.open_delimiter:
+                opened_tags += 1
+                buffer.append(delimiter)
+            else:
+                opened_tags -= 1
+                if opened_tags == 0:
+                    node = self._parse_tag(tag, ''.join(buffer), context)
+                    if node.is_inline:
+                        paragraph.append(node)
+                    else:
+                        new_paragraph('')
+                        nodes.append(node)
+                    buffer = []
                     state = self.TEXT
-                    i -= 1
-                elif tag.auto_recursive and tag.open_delimiter != tag.close_delimiter \
-                        and c + next_c == tag.open_delimiter:
-                    opened_tags += 1
-                    buffer += c + next_c
-                    i += 1
-                elif c + next_c == tag.close_delimiter:
-                    opened_tags -= 1
-                    if opened_tags == 0:
-                        node = tag.parse_wikicode(buffer)
-                        if node.content_to_parse is not None:
-                            internal_nodes = self._parse_document(node.content_to_parse)
-                            if tag.multiline:
-                                node.set_parsed_content_nodes(internal_nodes)
-                            elif len(internal_nodes) != 0:
-                                # noinspection PyUnresolvedReferences
-                                node.set_parsed_content_nodes(internal_nodes[0].nodes)
-                        if node.is_inline:
-                            paragraph.append(node)
-                        else:
-                            new_paragraph('')
-                            nodes.append(node)
-                        buffer = ''
-                        state = self.TEXT
-                        i += 1
-                        tag = None
+                    tag = None
                 else:
-                    buffer += c
+                    i = m.start() + 1
 
-            i += 1
         if tag:
-            buffer = tag.open_delimiter + buffer
-        new_paragraph(buffer)
+            buffer.insert(0, tag.open_delimiter)
+        new_paragraph(''.join(buffer))
 
-        if top:
-            for node in nodes:
-                node.substitute_placeholders(self.__placeholders)
-                self.__categories.update({
-                    category_node.title: category_node.sort_key
-                    for category_node in node.get_categories()
-                })
+        return nodes
+
+    def _tokenize_with_grammar(self, wikicode: str, context) -> typ.List[_nodes.WikicodeNode]:
+        """
+        Converts the given escaped wikicode into a sequence of nodes with the lark grammar.
+        Nodes are built from the grammar’s tokens exactly as the state machine of _tokenize() builds them
+        and resource limits are checked at the same points, so that both methods return the same nodes.
+
+        :param wikicode: The wikicode to parse.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :return: A list of nodes.
+        """
+        from . import _grammar
 
-        print('Parser nodes:', nodes)  # DEBUG
+        def new_paragraph(b: str):
+            nonlocal paragraph
+
+            if b.strip():
+                paragraph.append(_nodes.TextNode(text=b))
+                self.__budget.nodes_count += 1
+            if not paragraph.is_empty:
+                nodes.append(paragraph)
+                paragraph = _nodes.ParagraphNode()
+                self.__budget.nodes_count += 1
+
+        if WikicodeParser.__grammar is None:
+            WikicodeParser.__grammar = _grammar.Grammar(self.__special_tags)
+
+        nodes = []
+        paragraph = _nodes.ParagraphNode()
+        buffer = []
+        # The state machine consumes text along with the delimiter that follows it
+        pending_text = ''
+        length = len(wikicode)
+
+        for kind, tag, token, end in WikicodeParser.__grammar.tokenize(wikicode):
+            if kind == _grammar.TOKEN_TEXT:
+                pending_text = token
+                continue
+            if self._check_tokenizing_limits(buffer, context):
+                pending_text = ''
+                break
+            buffer.append(pending_text)
+            pending_text = ''
+
+            if kind == _grammar.TOKEN_PARAGRAPH_BREAK:
+                new_paragraph(''.join(buffer))
+                buffer = []
+                continue
+
+            if text := ''.join(buffer):
+                paragraph.append(_nodes.TextNode(text=text))
+                self.__budget.nodes_count += 1
+            buffer = []
+            content = token[len(tag.open_delimiter):]
+            # A tag opened at the very end of the wikicode is not searched for a closing delimiter
+            if end == length and not content:
+                buffer.insert(0, tag.open_delimiter)
+                break
+            if self._check_tokenizing_limits(buffer, context):
+                buffer.insert(0, tag.open_delimiter)
+                break
+
+            if kind == _grammar.TOKEN_TAG:
+                node = self._parse_tag(tag, content[:-len(tag.close_delimiter)], context)
+                if node.is_inline:
+                    paragraph.append(node)
+                else:
+                    new_paragraph('')
+                    nodes.append(node)
+            else:  # Aborted tags are plain text
+                buffer = [tag.open_delimiter, content]
+
+        if pending_text and not self._check_tokenizing_limits(buffer, context):
+            buffer.append(pending_text)
+        new_paragraph(''.join(buffer))
 
         return nodes
 
+    def _check_tokenizing_limits(self, buffer: typ.List[str], context) -> bool:
+        """
+        Checks whether tokenizing must stop because a resource limit was exceeded.
+        If a limit has just been exceeded, an error placeholder is appended to the given buffer.
+
+        :param buffer: The text buffer of the tokenizer.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :return: True if tokenizing must stop.
+        """
+        from .. import settings
+
+        if self.__tokenizing_aborted:
+            return True
+        if self.__budget.nodes_count > settings.PARSER_MAX_NODES:
+            limit = self.LIMIT_NODES
+        # If the time limit was exceeded while expanding templates, the wikicode is still tokenized
+        # as its size is bounded by the expansion size limit
+        elif not self.__budget.limit_exceeded and time.perf_counter() > self.__budget.deadline:
+            limit = self.LIMIT_TIME
+        else:
+            return False
+        buffer.append(self._limit_error(limit, context))
+        self.__tokenizing_aborted = True
+        return True
+
+    def _parse_tag(self, tag: _tags.NonHTMLTag, content: str, context) -> _nodes.WikicodeNode:
+        """
+        Creates the node of the given special tag and parses its content recursively.
+
+        :param tag: The special tag.
+        :param content: The text between the tag’s delimiters.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :return: The tag’s node.
+        """
+        node = tag.parse_wikicode(content)
+        self.__budget.nodes_count += 1
+        if node.content_to_parse is not None:
+            internal_nodes = self._parse_document(node.content_to_parse, context)
+            if tag.multiline:
+                node.set_parsed_content_nodes(internal_nodes)
+            elif len(internal_nodes) != 0:
+                # noinspection PyUnresolvedReferences
+                node.set_parsed_content_nodes(internal_nodes[0].nodes)
+        return node
+
+    def _scan_metadata(self, wikicode: str, metadata: WikicodeMetadata):
+        """
+        Scans the given expanded wikicode for link, category and file tags, following the same rules
+        as _parse_document(): tags are delimited the same way and the content of each tag is scanned recursively.
+
+        :param wikicode: The wikicode to scan, already escaped.
+        :param metadata: The object to add the found categories, links and files to.
+        """
+        state = self.TEXT
+        tag = None
+        tag_start = 0
+        length = len(wikicode)
+        i = 0
+
+        while i < length:
+            if self.__tokenizing_aborted:
+                break
+            if not self.__budget.limit_exceeded and time.perf_counter() > self.__budget.deadline:
+                self.__limit_exceeded = self.__budget.limit_exceeded = self.LIMIT_TIME
+                self.__tokenizing_aborted = True
+                break
+
+            if state == self.TEXT:
+                m = self.__text_delimiters_pattern.search(wikicode, i)
+            else:
+                m = self.__tags_delimiters_patterns[tag.open_delimiter].search(wikicode, i)
+            if not m:
+                break
+            delimiter = m.group()
+            i = m.end()
+
+            if state == self.TEXT:
+                if delimiter != '\n\n':
+                    tag = self.__special_tags[delimiter]
+                    tag_start = i
+                    state = self.SPECIAL_TAG
+            elif delimiter == '\n':  # The tag is aborted, its content is plain text
+                state = self.TEXT
+                i = m.start()
+            else:  # Special tags cannot be nested in themselves, the first closing delimiter closes the tag
+                content = wikicode[tag_start:m.start()]
+                if isinstance(tag, (_tags.InternalLinkOrCategoryTag, _tags.ExternalLinkTag, _tags.FileTag)):
+                    node = tag.parse_wikicode(content)
+                    if isinstance(node, _nodes.CategoryNode):
+                        metadata.categories[node.title] = node.sort_key
+                    elif isinstance(node, _nodes.InternalLinkNode):
+                        metadata.links.add(node.page_title)
+                    elif isinstance(node, _nodes.FileNode):
+                        metadata.files.add(node.file_name)
+                    content = node.content_to_parse
+                if content is not None:
+                    # Nested content is escaped again by _parse_document(), including substituted placeholders
+                    self._scan_metadata(self.make_safe(content), metadata)
+                state = self.TEXT
+                tag = None
+
+    def _limit_error(self, limit: str, context) -> str:
+        """
+        Flags the given resource limit as exceeded, unless another one already was, and returns an error placeholder.
+
+        :param limit: The exceeded limit, one of the LIMIT_* constants.
+        :param context: The context to use.
+        :type context: WikiPy.page_context.PageContext
+        :return: The error placeholder.
+        """
+        if not self.__limit_exceeded:
+            self.__limit_exceeded = limit
+        if not self.__budget.limit_exceeded:
+            self.__budget.limit_exceeded = limit
+        text = context.language.translate(f'parser.error.limit_exceeded.{limit}')
+        return self._generate_placeholder(
+            'error',
+            f'<span class="wpy-parser-error wpy-limit-exceeded">{text}</span>'
+        )
+
     def _generate_placeholder(self, name: str, content: str) -> str:
         """
         Generates a new placeholder with the given name and content.
@@ -683,22 +1347,32 @@ class WikicodeParser:
         :param content: The content this placeholder replaces.
         :return: The generated placeholder.
         """
-        n = random.randint(0, 0xffffffff)
-        placeholder = f"""?#`″PLACEHOLDER--{name}-{hex(n)[2:].rjust(8, '0').upper()}--REDLOHECALP″`#?"""
+        # Placeholders are numbered in generation order so that parsing the same wikicode
+        # always yields the same intermediary text
+        n = len(self.__placeholders)
+        placeholder = f"""?#`″PLACEHOLDER--{name}-{n:08X}--REDLOHECALP″`#?"""
         self.__placeholders[placeholder] = content
         return placeholder
 
-    def _substitute_placeholders(self, text: str) -> str:
+    def _substitute_placeholders(self, text: str, nowiki: bool = False) -> str:
         """
-        Substitutes all placeholders (except nowiki) in the given text by using the placeholders registry.
+        Substitutes all placeholders in the given text by using the placeholders registry.
+        Strings that look like placeholders but are absent from the registry are left untouched.
 
         :param text: The text.
+        :param nowiki: If true, nowiki placeholders will be substituted too.
         :return: The text with all placeholders substituted.
         """
-        for ph, subst in self.__placeholders.items():
-            if ph in text and 'nowiki' not in ph:
-                text = text.replace(ph, subst)
-        return text
+
+        def substitute(m: typ.Match[str]) -> str:
+            placeholder = m.group()
+            if placeholder in self.__placeholders and (nowiki or m.group(1) != 'nowiki'):
+                return self.__placeholders[placeholder]
+            return placeholder
+
+        if not self.__placeholders:
+            return text
+        return self.__placeholder_pattern.sub(substitute, text)
 
     @classmethod
     def _register_tag(cls, tag: _tags.ExtendedHTMLTag):
@@ -728,6 +1402,7 @@ class WikicodeParser:
         if mk.name in cls.__magic_keywords:
             raise ValueError(f'attempt to register two magic keywords with the same name "{mk.name}"')
         cls.__magic_keywords[mk.name] = mk
+        cls.__magic_keywords_pattern = re.compile('{{(' + '|'.join(map(re.escape, cls.__magic_keywords)) + ')}}')
 
     @classmethod
     def registered_magic_keywords(cls) -> typ.List[_registry.MagicKeyword]:
@@ -782,42 +1457,52 @@ class WikicodeParser:
                 return api_titles.get_actual_page_title(title), anchor
         return None
 
-    # TODO
     @staticmethod
-    def paste_sections(header: str, sections: typ.Dict[int, str]):
-        return header + '\n' + '\n'.join(sections.values())
+    def paste_sections(header: str, sections: typ.Dict[int, str]) -> str:
+        """
+        Joins the header and sections returned by split_sections() back into a single wikicode.
+        Parts that do not end with a line break are followed by one so that each section title stays on its own line.
 
-    # TODO
-    # noinspection PyUnusedLocal
-    @staticmethod
-    def split_sections(wikicode: str, level: int = 1) -> typ.Tuple[str, typ.Dict[int, str]]:
-        header = ''
+        :param header: The text before the first section.
+        :param sections: The sections, ordered by their index.
+        :return: The joined wikicode.
+        """
+        parts = [header, *(sections[i] for i in sorted(sections))]
+        return ''.join(part + '\n' if part and not part.endswith('\n') and i < len(parts) - 1 else part
+                       for i, part in enumerate(parts))
+
+    @classmethod
+    def split_sections(cls, wikicode: str) -> typ.Tuple[str, typ.Dict[int, str]]:
+        """
+        Splits the given wikicode into sections.
+        A section starts at a title line and ends right before the next title line, whatever their levels.
+        Title lines inside template calls are ignored. Line breaks are kept so that
+        paste_sections() returns the original wikicode.
+
+        :param wikicode: The wikicode to split.
+        :return: The text before the first section and the sections, indexed from 1 in order of appearance.
+        """
+        header = []
         sections = {}
-        section_found = False
-        section_index = 1
-
-        for line in wikicode.split('\n'):
-            if m := re.fullmatch(r'(=+)\s*.+?\s*\1', line):
-                section_level = len(m.group(1))
-                # if section_level <
-                sections[section_index] = line + '\n'
-                section_index += 1
-                section_found = True
-            elif not section_found:
-                header += line + '\n'
-            else:
-                sections[section_index] += line + '\n'
+        section_index = 0
+        opened_templates = 0
 
-        # Remove trailing \n
-        header = header[:-1]
-        for t in sections:
-            sections[t] = sections[t][:-1]
+        for line in cls.SECTION_LINE_PATTERN.findall(wikicode):
+            if opened_templates == 0 and cls.SECTION_TITLE_PATTERN.fullmatch(line.rstrip('\n')):
+                section_index += 1
+                sections[section_index] = []
+            (sections[section_index] if section_index else header).append(line)
+            for m in cls.SECTION_TEMPLATE_DELIMITERS_PATTERN.finditer(line):
+                opened_templates = max(0, opened_templates + (1 if m.group() == '{{' else -1))
 
-        return header, sections
+        return ''.join(header), {i: ''.join(lines) for i, lines in sections.items()}
 
 
 __all__ = [
     'WikicodeParser',
+    'WikicodeMetadata',
+    'ParserBudget',
+    'ParserProfile',
     'WikicodeNode',
     'RedirectNode',
     'ExtendedHTMLTagNode',
@@ -831,4 +1516,19 @@ __all__ = [
     'ParserFeature',
     'ParserFunction',
     'MagicKeyword',
+    'VOLATILE_TIME',
+    'VOLATILE_USER',
+    'VOLATILE_REVISION',
+    'PHASES',
+    'PHASE_PREPROCESSING',
+    'PHASE_MAGIC_KEYWORDS',
+    'PHASE_VARIABLES',
+    'PHASE_TRANSCLUSIONS',
+    'PHASE_FUNCTIONS',
+    'PHASE_DB_LOOKUPS',
+    'PHASE_TOKENIZING',
+    'PHASE_PLACEHOLDERS',
+    'PHASE_RENDERING',
+    'encode_node_tree',
+    'decode_node_tree',
 ]
@@ -0,0 +1,86 @@
+"""
+This module defines the lark grammar used by the alternative tokenizer of the parser.
+
+The grammar describes a single level of expanded wikicode as a sequence of tokens:
+    - text: any text that does not contain a special tag’s opening delimiter nor a paragraph break;
+    - paragraph breaks: two consecutive line breaks;
+    - closed tags: a special tag’s opening delimiter, its content and the first closing delimiter;
+    - aborted tags: an opening delimiter that is not closed before the end of the line or the wikicode.
+The content of a tag is not tokenized by the grammar, the parser tokenizes it again as a new level.
+Terminals are generated from the parser’s special tags so that both tokenizers always agree on delimiters.
+"""
+import re
+import typing as typ
+
+import lark
+
+from . import _tags
+
+TOKEN_TEXT = 'text'
+TOKEN_PARAGRAPH_BREAK = 'paragraph_break'
+TOKEN_TAG = 'tag'
+TOKEN_ABORTED_TAG = 'aborted_tag'
+
+
+class Grammar:
+    """
+    A LALR grammar of a single level of wikicode built from the given special tags.
+    Only special tags that cannot include other instances of themselves are supported,
+    as nested delimiters cannot be counted by a regular lexer.
+    """
+
+    def __init__(self, special_tags: typ.Dict[str, _tags.NonHTMLTag]):
+        """
+        :param special_tags: The special tags, identified by their opening delimiter.
+        :raise ValueError: If one of the tags may include other instances of itself.
+        """
+        # Maps each terminal’s name to the kind of token it produces and the associated tag
+        self.__terminals: typ.Dict[str, typ.Tuple[str, typ.Optional[_tags.NonHTMLTag]]] = {
+            'TEXT': (TOKEN_TEXT, None),
+            'PARAGRAPH_BREAK': (TOKEN_PARAGRAPH_BREAK, None),
+        }
+        opening_delimiters = '|'.join(map(self._escape, special_tags))
+        rules = [
+            r'PARAGRAPH_BREAK.2: "\n\n"',
+            f'TEXT: /(?:(?!{opening_delimiters}|\\n\\n)[\\s\\S])+/',
+        ]
+        for open_delimiter, tag in special_tags.items():
+            if tag.auto_recursive:
+                raise ValueError(f'tag "{tag.name}" cannot be described by the grammar as it is recursive')
+            name = tag.name.upper()
+            open_ = self._escape(open_delimiter)
+            close = self._escape(tag.close_delimiter)
+            char = r'[\s\S]' if tag.multiline else r'[^\n]'
+            # Tags are closed by the first closing delimiter, otherwise they are aborted by the first line break
+            rules.append(f'TAG_{name}.4: /{open_}(?:(?!{close}){char})*{close}/')
+            rules.append(f'ABORTED_TAG_{name}.3: /{open_}{char}*/')
+            self.__terminals[f'TAG_{name}'] = (TOKEN_TAG, tag)
+            self.__terminals[f'ABORTED_TAG_{name}'] = (TOKEN_ABORTED_TAG, tag)
+        rules.append('start: (' + ' | '.join(self.__terminals) + ')*')
+        self.__lark = lark.Lark('\n'.join(rules), parser='lalr', lexer='standard')
+
+    @staticmethod
+    def _escape(delimiter: str) -> str:
+        """Escapes the given delimiter to be included in a lark regular expression literal."""
+        return re.escape(delimiter).replace('/', r'\/')
+
+    def tokenize(self, wikicode: str) -> typ.Iterator[typ.Tuple[str, typ.Optional[_tags.NonHTMLTag], str, int]]:
+        """
+        Tokenizes the given wikicode.
+
+        :param wikicode: The wikicode to tokenize.
+        :return: An iterator of (token kind, tag, text, end position) tuples where the token kind is one of
+            the TOKEN_* constants and the tag is the special tag of the token, None for text and paragraph breaks.
+        """
+        for token in self.__lark.parse(wikicode).children:
+            kind, tag = self.__terminals[token.type]
+            yield kind, tag, str(token), token.end_pos
+
+
+__all__ = [
+    'Grammar',
+    'TOKEN_TEXT',
+    'TOKEN_PARAGRAPH_BREAK',
+    'TOKEN_TAG',
+    'TOKEN_ABORTED_TAG',
+]
@@ -33,12 +33,12 @@ def _get_year(context, user_time: bool) -> str:
     return str(_get_datetime(context, user_time=user_time).year)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_year(context):
     return _get_year(context, user_time=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_year(context):
     return _get_year(context, user_time=False)
 
@@ -53,22 +53,22 @@ def _get_month(context, user_time: bool, padded: bool) -> str:
     return month
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_month(context):
     return _get_month(context, user_time=True, padded=False)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_month(context):
     return _get_month(context, user_time=False, padded=False)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_month_padded(context):
     return _get_month(context, user_time=True, padded=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_month_padded(context):
     return _get_month(context, user_time=False, padded=True)
 
@@ -81,22 +81,22 @@ def _get_month_name(context, user_time: bool, abbr: bool) -> str:
     return lang.get_month_name(month)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_month_name(context):
     return _get_month_name(context, user_time=True, abbr=False)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_month_name(context):
     return _get_month_name(context, user_time=False, abbr=False)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_month_name_abbr(context):
     return _get_month_name(context, user_time=True, abbr=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_month_name_abbr(context):
     return _get_month_name(context, user_time=False, abbr=True)
 
@@ -111,22 +111,22 @@ def _get_day(context, user_time: bool, padded: bool) -> str:
     return d
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_day(context):
     return _get_day(context, user_time=True, padded=False)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_day(context):
     return _get_day(context, user_time=False, padded=False)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_day_padded(context):
     return _get_day(context, user_time=True, padded=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_day_padded(context):
     return _get_day(context, user_time=False, padded=True)
 
@@ -139,22 +139,22 @@ def _get_day_name(context, user_time: bool, abbr: bool) -> str:
     return lang.get_day_name(day)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_day_name(context):
     return _get_day_name(context, user_time=True, abbr=False)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_day_name(context):
     return _get_day_name(context, user_time=False, abbr=False)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_day_name_abbr(context):
     return _get_day_name(context, user_time=True, abbr=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_day_name_abbr(context):
     return _get_day_name(context, user_time=False, abbr=True)
 
@@ -169,12 +169,12 @@ def _get_time(context, user_time: bool) -> str:
     return f'{dt.hour:02}:{dt.minute:02}'
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_time(context):
     return _get_time(context, user_time=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_time(context):
     return _get_time(context, user_time=False)
 
@@ -186,12 +186,12 @@ def _get_hour(context, user_time: bool) -> str:
     return str(_get_datetime(context, user_time=user_time).hour).rjust(2, '0')
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_hour(context):
     return _get_hour(context, user_time=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_hour(context):
     return _get_hour(context, user_time=False)
 
@@ -203,12 +203,12 @@ def _get_minute(context, user_time: bool) -> str:
     return str(_get_datetime(context, user_time=user_time).minute).rjust(2, '0')
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_minute(context):
     return _get_minute(context, user_time=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_minute(context):
     return _get_minute(context, user_time=False)
 
@@ -220,12 +220,12 @@ def _get_week(context, user_time: bool) -> str:
     return str(_get_datetime(context, user_time=user_time).strftime('%V'))
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_week(context):
     return _get_datetime(context, user_time=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_week(context):
     return _get_datetime(context, user_time=False)
 
@@ -237,12 +237,12 @@ def _get_timestamp(context, user_time: bool) -> str:
     return str(int(_get_datetime(context, user_time=user_time).timestamp()))
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def user_current_timestamp(context):
     return _get_timestamp(context, user_time=True)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_TIME)
 def server_current_timestamp(context):
     return _get_timestamp(context, user_time=False)
 
@@ -310,52 +310,52 @@ def _get_revision_info(context, attr: str, get_attr=str):
     :param get_attr: The function to apply to the revision to get the value to return.
     :type get_attr: typing.Callable[[WikiPy.models.PageRevision], str]
     """
-    if hasattr(context, 'revision'):
+    if getattr(context, 'revision', None):
         return get_attr(getattr(context.revision, attr))
     return ''
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_id(context):
     return _get_revision_info(context, 'id')
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_year(context):
     return _get_revision_info(context, 'date', lambda d: str(d.year))
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_month(context):
     return _get_revision_info(context, 'date', lambda d: str(d.month))
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_month_padded(context):
     return _get_revision_info(context, 'date', lambda d: str(d.month).rjust(2, '0'))
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_day(context):
     return _get_revision_info(context, 'date', lambda d: str(d.day))
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_day_padded(context):
     return _get_revision_info(context, 'date', lambda d: str(d.day).rjust(2, '0'))
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_timestamp(context):
     return _get_revision_info(context, 'date', lambda d: str(d.timestamp()))
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_user(context):
     return _get_revision_info(context, 'author', lambda a: a.username)
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_REVISION)
 def revision_size(context):
     return _get_revision_info(context, 'diff_size')
 
@@ -380,6 +380,6 @@ def page_title(context):
     return context.page.title
 
 
-@_registry.magic_keyword(takes_context=True)
+@_registry.magic_keyword(takes_context=True, volatile=_registry.VOLATILE_USER)
 def username(context):
     return context.user.username
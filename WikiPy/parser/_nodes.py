@@ -7,8 +7,12 @@ from __future__ import annotations
 import abc
 import typing as typ
 
+_N = typ.TypeVar('_N', bound='WikicodeNode')
+
 
 class WikicodeNode(abc.ABC):
+    __slots__ = ('__inline', '_internal_nodes')
+
     def __init__(self, inline: bool):
         """The base class for nodes.
         Nodes are used to render the document they represent.
@@ -16,7 +20,7 @@ class WikicodeNode(abc.ABC):
         :param inline: Indicates whether this node represents inline text.
         """
         self.__inline = inline
-        self._internal_nodes = []
+        self._internal_nodes: typ.Sequence[WikicodeNode] = ()  # Empty tuples are shared by all nodes
 
     @property
     def is_inline(self):
@@ -36,40 +40,111 @@ class WikicodeNode(abc.ABC):
 
         :param nodes: The nodes resulting from the content_to_parse text.
         """
-        self._internal_nodes = nodes
+        self._internal_nodes = tuple(nodes)
 
-    def substitute_placeholders(self, placeholders: typ.Dict[str, str]):
+    def substitute_placeholders(self, substitute: typ.Callable[[str], str]):
         """Substitutes remaining placeholders in the text of
         this node and all its sub-nodes if any.
 
-        :param placeholders: The placeholders registry.
+        :param substitute: A function that returns the given text with all its placeholders substituted.
         """
         for node in self._internal_nodes:
-            node.substitute_placeholders(placeholders)
+            node.substitute_placeholders(substitute)
 
-    @abc.abstractmethod
     def render(self, skin, context) -> str:
         """Renders this node as HTML.
         Returned string is considered HTML-safe.
 
+        The tree is walked with an explicit stack instead of recursive calls, so that deeply nested nodes
+        cannot exceed the recursion limit. Each node is rendered by its _render() method once all its subnodes
+        have been rendered. Nodes that override this method instead are rendered by calling it.
+
+        :param skin: The current skin.
+        :type skin: WikiPy.skins.Skin
+        :param context: The context for the page being rendered.
+        :type context: WikiPy.page_context.PageContext
+        :return: The HTML code.
+        """
+        output = []
+        # Nodes whose subnodes have been rendered are pushed with the start index of their subnodes’ output
+        stack: typ.List[typ.Tuple[WikicodeNode, typ.Optional[int]]] = [(self, None)]
+        while stack:
+            node, start = stack.pop()
+            if start is not None:
+                content = ''.join(output[start:])
+                del output[start:]
+                output.append(node._render(skin, context, content))
+            elif node is not self and type(node).render is not WikicodeNode.render:
+                output.append(node.render(skin, context))
+            elif node._internal_nodes:
+                stack.append((node, len(output)))
+                stack.extend((child, None) for child in reversed(node._internal_nodes))
+            else:
+                output.append(node._render(skin, context, ''))
+        return ''.join(output)
+
+    def render_chunks(self, skin, context) -> typ.Iterator[str]:
+        """Renders this node as HTML, piece by piece.
+        The concatenation of all yielded chunks is equal to the output of render().
+
         :param skin: The current skin.
         :type skin: WikiPy.skins.Skin
         :param context: The context for the page being rendered.
         :type context: WikiPy.page_context.PageContext
+        :return: A generator of HTML code chunks.
+        """
+        yield self.render(skin, context)
+
+    def _render(self, skin, context, content: str) -> str:
+        """Renders this node as HTML from the already rendered HTML of its subnodes.
+        Subclasses must override either this method or render().
+
+        :param skin: The current skin.
+        :type skin: WikiPy.skins.Skin
+        :param context: The context for the page being rendered.
+        :type context: WikiPy.page_context.PageContext
+        :param content: The HTML code of this node’s subnodes.
         :return: The HTML code.
         """
-        pass
+        raise NotImplementedError(f'{type(self).__name__} does not implement rendering')
 
     def get_categories(self) -> typ.List[CategoryNode]:
         """Returns the list of CategoryNode instances among this node’s subnodes.
         If this node is itself a CategoryNode, it returns itself.
         """
-        return [category for node in self._internal_nodes for category in node.get_categories()]
+        return self._find_nodes(CategoryNode)
+
+    def get_internal_links(self) -> typ.List[InternalLinkNode]:
+        """Returns the list of InternalLinkNode instances among this node’s subnodes.
+        If this node is itself an InternalLinkNode, it is included.
+        """
+        return self._find_nodes(InternalLinkNode)
+
+    def get_files(self) -> typ.List[FileNode]:
+        """Returns the list of FileNode instances among this node’s subnodes.
+        If this node is itself a FileNode, it is included.
+        """
+        return self._find_nodes(FileNode)
+
+    def _find_nodes(self, node_type: typ.Type[_N]) -> typ.List[_N]:
+        """Returns the list of all nodes of the given type in the tree rooted at this node, in document order.
+
+        :param node_type: The type of the nodes to find.
+        :return: The list of matching nodes.
+        """
+        nodes = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, node_type):
+                nodes.append(node)
+            stack.extend(reversed(node._internal_nodes))
+        return nodes
 
     def _render_internal_nodes(self, skin, context):
         """
         Renders this node’s internal nodes as HTML.
-        This method is meant to be used by subclasses in their render() method.
+        This method is meant to be used by subclasses that override render().
 
         :param skin: The current skin.
         :type skin: WikiPy.skins.Skin
@@ -77,23 +152,12 @@ class WikicodeNode(abc.ABC):
         :type context: WikiPy.page_context.PageContext
         :return: The HTML code.
         """
-        return ''.join(map(lambda n: n.render(skin, context), self._internal_nodes))
-
-    @staticmethod
-    def _do_substitute_placeholders(text: str, placeholders: typ.Dict[str, str]) -> str:
-        """Helper method to substitute placeholder in a given string.
-
-        :param text: The text to substitute from.
-        :param placeholders: The placeholders registry.
-        :return: The modified text.
-        """
-        for ph, subst in placeholders.items():
-            text = text.replace(ph, subst)
-        return text
+        return ''.join([n.render(skin, context) for n in self._internal_nodes])
 
 
 class TopLevelNode(WikicodeNode, abc.ABC):
     """A top level node is a node that is at the root of the page document."""
+    __slots__ = ()
 
     def __init__(self):
         super().__init__(inline=False)
@@ -101,12 +165,15 @@ class TopLevelNode(WikicodeNode, abc.ABC):
 
 class InlineNode(WikicodeNode, abc.ABC):
     """An inline node is a node that is part of a paragraph, title or table cell."""
+    __slots__ = ()
 
     def __init__(self):
         super().__init__(inline=True)
 
 
 class DocumentNode(TopLevelNode):
+    __slots__ = ()
+
     def __init__(self, *nodes: TopLevelNode):
         """The Document node is the topmost node in any node tree representing a page.
 
@@ -128,14 +195,21 @@ class DocumentNode(TopLevelNode):
         """The list of all direct subnodes of this document."""
         return self._internal_nodes
 
-    def render(self, skin, context):
-        return ''.join(map(lambda n: n.render(skin, context), self._internal_nodes))
+    def render_chunks(self, skin, context):
+        """Renders this document as HTML, one top level node at a time."""
+        for node in self._internal_nodes:
+            yield node.render(skin, context)
+
+    def _render(self, skin, context, content):
+        return content
 
     def __repr__(self):
         return 'DocumentNode[' + ', '.join([repr(node) for node in self.nodes]) + ']'
 
 
 class TitleNode(TopLevelNode):
+    __slots__ = ('__content', '__level')
+
     def __init__(self, content: WikicodeNode, level: int):
         """The Title node represents a section title.
 
@@ -156,7 +230,7 @@ class TitleNode(TopLevelNode):
         """The section level."""
         return self.__level
 
-    def render(self, skin, context) -> str:
+    def _render(self, skin, context, content) -> str:
         pass  # TODO
 
     def __repr__(self):
@@ -164,6 +238,8 @@ class TitleNode(TopLevelNode):
 
 
 class ParagraphNode(TopLevelNode):
+    __slots__ = ()
+
     def __init__(self, *text_nodes: WikicodeNode):
         """Paragraph nodes are top-level nodes that contain a list of text nodes.
 
@@ -192,14 +268,16 @@ class ParagraphNode(TopLevelNode):
         """
         self._internal_nodes.append(text_node)
 
-    def render(self, skin, context):
-        return '<p>' + ''.join(map(lambda n: n.render(skin, context), self.nodes)) + '</p>'
+    def _render(self, skin, context, content):
+        return '<p>' + content + '</p>'
 
     def __repr__(self):
         return 'ParagraphNode[' + ', '.join([repr(node) for node in self.nodes]) + ']'
 
 
 class CategoryNode(InlineNode):
+    __slots__ = ('__title', '__sort_key')
+
     def __init__(self, title: str, sort_key: str = None):
         """Category nodes represent the categories the document they appear in belongs to.
 
@@ -222,17 +300,16 @@ class CategoryNode(InlineNode):
         """The sort key of the document for this category."""
         return self.__sort_key
 
-    def render(self, skin, context) -> str:
+    def _render(self, skin, context, content) -> str:
         return ''
 
-    def get_categories(self) -> typ.List[CategoryNode]:
-        return [self]
-
     def __repr__(self):
         return f'CategoryNode[title={self.__title!r},sort_key={self.__sort_key!r}]'
 
 
 class TextNode(InlineNode):
+    __slots__ = ('__text',)
+
     def __init__(self, text: str):
         """Text nodes represent links, styled or plain text.
 
@@ -246,13 +323,13 @@ class TextNode(InlineNode):
         """This node’s text."""
         return self.__text
 
-    def substitute_placeholders(self, placeholders: typ.Dict[str, str]):
+    def substitute_placeholders(self, substitute):
         if self._internal_nodes:
-            super().substitute_placeholders(placeholders)
+            super().substitute_placeholders(substitute)
         else:
-            self.__text = self._do_substitute_placeholders(self.__text, placeholders)
+            self.__text = substitute(self.__text)
 
-    def render(self, skin, context):
+    def _render(self, skin, context, content):
         return self.text
 
     def __repr__(self):
@@ -260,6 +337,8 @@ class TextNode(InlineNode):
 
 
 class InternalLinkNode(TextNode):
+    __slots__ = ('__page_title', '__anchor', '__params')
+
     def __init__(self, page_title: str, anchor: str = None, params: typ.Dict[str, typ.Union[str, typ.List[str]]] = None,
                  text: str = None):
         """This node represents a link to another page on the same wiki.
@@ -304,14 +383,15 @@ class InternalLinkNode(TextNode):
     def content_to_parse(self) -> typ.Optional[str]:
         return self.text
 
-    def render(self, skin, context):
+    def _render(self, skin, context, content):
         return skin.format_internal_link(
             context.language,
             current_page_title=context.page.full_title,
             page_title=self.page_title,
-            text=self._render_internal_nodes(skin, context),
+            text=content,
             anchor=self.anchor,
-            url_params=self.params
+            url_params=self.params,
+            link_batch=context.link_batch
         )
 
     def __repr__(self):
@@ -320,6 +400,8 @@ class InternalLinkNode(TextNode):
 
 
 class ExternalLinkNode(TextNode):
+    __slots__ = ('__url',)
+
     def __init__(self, url: str, text: str = None):
         """This node represents a link to an URL outside of the wiki (may be the same site).
 
@@ -337,8 +419,8 @@ class ExternalLinkNode(TextNode):
     def content_to_parse(self) -> typ.Optional[str]:
         return self.text
 
-    def render(self, skin, context):
-        return skin.format_external_link(self.url, self._render_internal_nodes(skin, context))
+    def _render(self, skin, context, content):
+        return skin.format_external_link(self.url, content)
 
     def __repr__(self):
         return f'ExternalLinkNode[url={self.url!r},text={self.text!r}]'
@@ -346,13 +428,14 @@ class ExternalLinkNode(TextNode):
 
 class BoldTextNode(TextNode):
     """This node represents bold text."""
+    __slots__ = ()
 
     @property
     def content_to_parse(self) -> typ.Optional[str]:
         return self.text
 
-    def render(self, skin, context):
-        return f'<strong class="text-bold">{self._render_internal_nodes(skin, context)}</strong>'
+    def _render(self, skin, context, content):
+        return f'<strong class="text-bold">{content}</strong>'
 
     def __repr__(self):
         return f'BoldTextNode[text={repr(self.text)}]'
@@ -360,13 +443,14 @@ class BoldTextNode(TextNode):
 
 class ItalicTextNode(TextNode):
     """This node represents italicized text."""
+    __slots__ = ()
 
     @property
     def content_to_parse(self) -> typ.Optional[str]:
         return self.text
 
-    def render(self, skin, context):
-        return f'<em class="text-italic">{self._render_internal_nodes(skin, context)}</em>'
+    def _render(self, skin, context, content):
+        return f'<em class="text-italic">{content}</em>'
 
     def __repr__(self):
         return f'ItalicTextNode[text={self.text!r}]'
@@ -374,13 +458,14 @@ class ItalicTextNode(TextNode):
 
 class UnderlinedTextNode(TextNode):
     """This node represents underlined text."""
+    __slots__ = ()
 
     @property
     def content_to_parse(self) -> typ.Optional[str]:
         return self.text
 
-    def render(self, skin, context):
-        return f'<span class="text-underlined">{self._render_internal_nodes(skin, context)}</span>'
+    def _render(self, skin, context, content):
+        return f'<span class="text-underlined">{content}</span>'
 
     def __repr__(self):
         return f'UnderlinedTextNode[text={self.text!r}]'
@@ -388,13 +473,14 @@ class UnderlinedTextNode(TextNode):
 
 class OverlinedTextNode(TextNode):
     """This node represents text with a line above it."""
+    __slots__ = ()
 
     @property
     def content_to_parse(self) -> typ.Optional[str]:
         return self.text
 
-    def render(self, skin, context):
-        return f'<span class="text-overlined">{self._render_internal_nodes(skin, context)}</span>'
+    def _render(self, skin, context, content):
+        return f'<span class="text-overlined">{content}</span>'
 
     def __repr__(self):
         return f'OverlinedTextNode[text={self.text!r}]'
@@ -402,19 +488,22 @@ class OverlinedTextNode(TextNode):
 
 class StrikethroughTextNode(TextNode):
     """This node represents strikethrough text."""
+    __slots__ = ()
 
     @property
     def content_to_parse(self) -> typ.Optional[str]:
         return self.text
 
-    def render(self, skin, context):
-        return f'<s class="text-stroke">{self._render_internal_nodes(skin, context)}</s>'
+    def _render(self, skin, context, content):
+        return f'<s class="text-stroke">{content}</s>'
 
     def __repr__(self):
         return f'Strikethrough[text={self.text!r}]'
 
 
 class FileNode(WikicodeNode):
+    __slots__ = ('__file_name', '__width', '__legend')
+
     def __init__(self, file_name: str, width: str = None, legend: str = None):
         """This node represents an embedded multimedia file.
 
@@ -447,7 +536,7 @@ class FileNode(WikicodeNode):
     def content_to_parse(self) -> typ.Optional[str]:
         return self.__legend
 
-    def render(self, skin, context):
+    def _render(self, skin, context, content):
         from ..api import pages as api_pages
         from .. import media_backends
 
@@ -471,7 +560,7 @@ class FileNode(WikicodeNode):
   {{tag}}
   <figcaption style="max-width: {width or ''}">
     <a href="#" role="button" class="mdi mdi-resize pull-right" title="{tooltip}"></a>
-    {self._render_internal_nodes(skin, context) or ''}
+    {content}
   </figcaption>
 </figure>
 """.strip()
@@ -507,6 +596,8 @@ class FileNode(WikicodeNode):
 
 
 class ExtendedHTMLTagNode(WikicodeNode, abc.ABC):
+    __slots__ = ('__name', '__attributes', '__content')
+
     def __init__(self, name: str, inline: bool, content: str, **attributes: str):
         """Extended HTML tags are special tags that use the HTML syntax.
 
@@ -539,6 +630,8 @@ class ExtendedHTMLTagNode(WikicodeNode, abc.ABC):
 
 
 class RedirectNode(TopLevelNode):
+    __slots__ = ('__target_page', '__anchor')
+
     def __init__(self, target_page: str, anchor: str = None):
         """This special node represents a redirection.
         Redirect nodes should never be inside a Document node.
@@ -560,7 +653,7 @@ class RedirectNode(TopLevelNode):
         """The optional anchor in the target page."""
         return self.__anchor
 
-    def render(self, skin, context):
+    def _render(self, skin, context, content):
         text = self.target_page
         if self.anchor:
             text += '#' + self.anchor
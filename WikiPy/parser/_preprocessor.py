@@ -0,0 +1,106 @@
+"""
+This module defines the preprocessor that handles the nowiki, noinclude, includeonly and onlyinclude tags
+before any substitution or transclusion is performed.
+
+    - <nowiki>text</nowiki>: the text is neither expanded nor parsed, it is displayed as is.
+      <nowiki/> is removed but still separates the surrounding characters.
+    - <noinclude>text</noinclude>: the text is only kept when the page is displayed, not when it is transcluded.
+    - <includeonly>text</includeonly>: the text is only kept when the page is transcluded.
+    - <onlyinclude>text</onlyinclude>: if a page contains at least one of these tags,
+      only their content is kept when the page is transcluded.
+
+Tag names are case-insensitive. Unclosed noinclude, includeonly and onlyinclude tags extend to the end of the wikicode
+and stray closing tags are removed, unclosed and stray nowiki tags are plain text.
+"""
+import functools
+import re
+import typing as typ
+
+# Maximum number of template revisions whose preprocessed wikicode is cached
+PREPROCESSED_REVISIONS_CACHE_SIZE = 2048
+
+_TAGS_PATTERN = re.compile(r'<(/?)(nowiki|noinclude|includeonly|onlyinclude)\s*(/?)>', re.IGNORECASE)
+_NOWIKI_CLOSE_PATTERN = re.compile(r'</nowiki\s*>', re.IGNORECASE)
+
+
+def preprocess(wikicode: str, transcluded: bool) -> typ.Tuple[str, ...]:
+    """
+    Preprocesses the given wikicode in a single pass.
+
+    :param wikicode: The wikicode to preprocess.
+    :param transcluded: Whether the wikicode is being transcluded into another page.
+    :return: The preprocessed wikicode as a tuple of chunks. Chunks at even indices are wikicode,
+        chunks at odd indices are the raw contents of nowiki tags that appeared between them.
+    """
+    if not _TAGS_PATTERN.search(wikicode):
+        return wikicode,
+
+    # (is nowiki, in onlyinclude, text) tuples for each kept piece of text
+    pieces: typ.List[typ.Tuple[bool, bool, str]] = []
+    noinclude = includeonly = onlyinclude = has_onlyinclude = False
+    i = 0
+
+    while m := _TAGS_PATTERN.search(wikicode, i):
+        closing, name, self_closing = m.group(1), m.group(2).lower(), m.group(3)
+        excluded = noinclude if transcluded else includeonly
+        if not excluded:
+            pieces.append((False, onlyinclude, wikicode[i:m.start()]))
+        i = m.end()
+
+        if name == 'nowiki':
+            # Nowiki tags are skipped over even in excluded text so that other tags they contain are ignored
+            if not closing and self_closing:
+                content = ''
+            elif not closing and (close := _NOWIKI_CLOSE_PATTERN.search(wikicode, i)):
+                content = wikicode[i:close.start()]
+                i = close.end()
+            else:
+                content = None
+            if not excluded:
+                pieces.append((False, onlyinclude, m.group()) if content is None else (True, onlyinclude, content))
+        elif self_closing:
+            continue
+        elif name == 'noinclude':
+            noinclude = not closing
+        elif name == 'includeonly':
+            includeonly = not closing
+        else:
+            onlyinclude = not closing
+            has_onlyinclude = True
+
+    if not (noinclude if transcluded else includeonly):
+        pieces.append((False, onlyinclude, wikicode[i:]))
+
+    chunks = []
+    buffer = []
+    for is_nowiki, in_onlyinclude, text in pieces:
+        if transcluded and has_onlyinclude and not in_onlyinclude:
+            continue
+        if is_nowiki:
+            chunks.append(''.join(buffer))
+            chunks.append(text)
+            buffer = []
+        else:
+            buffer.append(text)
+    chunks.append(''.join(buffer))
+    return tuple(chunks)
+
+
+@functools.lru_cache(maxsize=PREPROCESSED_REVISIONS_CACHE_SIZE)
+def preprocess_template(revision) -> typ.Tuple[str, ...]:
+    """
+    Preprocesses the wikicode of the given template revision for transclusion.
+    Results are cached per revision as revisions never change.
+
+    :param revision: The template revision.
+    :type revision: WikiPy.models.PageRevision
+    :return: The preprocessed wikicode, as returned by preprocess().
+    """
+    return preprocess(revision.content, transcluded=True)
+
+
+__all__ = [
+    'preprocess',
+    'preprocess_template',
+    'PREPROCESSED_REVISIONS_CACHE_SIZE',
+]
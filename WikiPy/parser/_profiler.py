@@ -0,0 +1,144 @@
+"""
+This module defines the parser profiler that records how much time is spent in each phase of a parse.
+"""
+from __future__ import annotations
+
+import contextlib
+import time
+import typing as typ
+
+PHASE_PREPROCESSING = 'preprocessing'
+PHASE_MAGIC_KEYWORDS = 'magic_keywords'
+PHASE_VARIABLES = 'variables'
+PHASE_TRANSCLUSIONS = 'transclusions'
+PHASE_FUNCTIONS = 'functions'
+PHASE_DB_LOOKUPS = 'db_lookups'
+PHASE_TOKENIZING = 'tokenizing'
+PHASE_PLACEHOLDERS = 'placeholders'
+PHASE_RENDERING = 'rendering'
+PHASES = (
+    PHASE_PREPROCESSING,
+    PHASE_MAGIC_KEYWORDS,
+    PHASE_VARIABLES,
+    PHASE_TRANSCLUSIONS,
+    PHASE_FUNCTIONS,
+    PHASE_DB_LOOKUPS,
+    PHASE_TOKENIZING,
+    PHASE_PLACEHOLDERS,
+    PHASE_RENDERING,
+)
+
+
+class ParserProfile:
+    """
+    Records the wall time and the number of runs of each parsing phase.
+
+    Phases may be nested, for instance a transclusion triggers database lookups and substitutions.
+    The time of a phase does not include the time spent in nested phases, hence the sum of all phases’ times
+    is the total time of the parse. The time spent expanding each template is recorded separately,
+    including all nested phases.
+    """
+
+    def __init__(self):
+        self.__times = {phase: 0.0 for phase in PHASES}
+        self.__counts = {phase: 0 for phase in PHASES}
+        self.__templates_times: typ.Dict[str, float] = {}
+        self.__templates_counts: typ.Dict[str, int] = {}
+        self.__stack: typ.List[typ.List[typ.Union[str, float]]] = []
+
+    @contextlib.contextmanager
+    def measure(self, phase: str):
+        """
+        Context manager that measures the time spent in the given phase.
+
+        :param phase: The phase to measure, one of the PHASE_* constants.
+        """
+        now = time.perf_counter()
+        if self.__stack:  # Pause the enclosing phase
+            self.__times[self.__stack[-1][0]] += now - self.__stack[-1][1]
+        self.__counts[phase] += 1
+        self.__stack.append([phase, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, start = self.__stack.pop()
+            self.__times[phase] += now - start
+            if self.__stack:  # Resume the enclosing phase
+                self.__stack[-1][1] = now
+
+    @contextlib.contextmanager
+    def measure_template(self, title: str):
+        """
+        Context manager that measures the time spent expanding the given template.
+
+        :param title: The template’s full title.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__templates_times[title] = self.__templates_times.get(title, 0) + time.perf_counter() - start
+            self.__templates_counts[title] = self.__templates_counts.get(title, 0) + 1
+
+    @property
+    def times(self) -> typ.Dict[str, float]:
+        """The time spent in each phase in milliseconds."""
+        return {phase: t * 1000 for phase, t in self.__times.items()}
+
+    @property
+    def counts(self) -> typ.Dict[str, int]:
+        """The number of times each phase was run."""
+        return dict(self.__counts)
+
+    @property
+    def total_time(self) -> float:
+        """The total time spent in all phases in milliseconds."""
+        return sum(self.__times.values()) * 1000
+
+    def most_expensive_templates(self, limit: int = 10) -> typ.List[typ.Tuple[str, float, int]]:
+        """
+        Returns the templates that took the most time to expand.
+
+        :param limit: The maximum number of templates to return.
+        :return: A list of (template title, time in milliseconds, number of expansions) tuples,
+            sorted by decreasing time.
+        """
+        templates = sorted(self.__templates_times.items(), key=lambda e: e[1], reverse=True)[:limit]
+        return [(title, t * 1000, self.__templates_counts[title]) for title, t in templates]
+
+    def to_dict(self) -> typ.Dict[str, typ.Any]:
+        """Returns this profile as a JSON-serializable dict."""
+        return {
+            'total_ms': round(self.total_time, 3),
+            'phases': {
+                phase: {'ms': round(t, 3), 'count': self.__counts[phase]}
+                for phase, t in self.times.items()
+            },
+            'templates': [
+                {'title': title, 'ms': round(t, 3), 'count': count}
+                for title, t, count in self.most_expensive_templates()
+            ],
+        }
+
+    def format(self) -> str:
+        """Returns a human-readable report of this profile, one line per phase and per expensive template."""
+        lines = [f'{phase}: {t:0.4} ms ({self.__counts[phase]})' for phase, t in self.times.items()]
+        lines.extend(f'Template "{title}": {t:0.4} ms ({count})'
+                     for title, t, count in self.most_expensive_templates())
+        return '\n'.join(lines)
+
+
+__all__ = [
+    'ParserProfile',
+    'PHASES',
+    'PHASE_PREPROCESSING',
+    'PHASE_MAGIC_KEYWORDS',
+    'PHASE_VARIABLES',
+    'PHASE_TRANSCLUSIONS',
+    'PHASE_FUNCTIONS',
+    'PHASE_DB_LOOKUPS',
+    'PHASE_TOKENIZING',
+    'PHASE_PLACEHOLDERS',
+    'PHASE_RENDERING',
+]
@@ -2,6 +2,8 @@
 This module defines functions to register magic keywords and parser functions.
 """
 import dataclasses
+import functools
+import inspect
 import re
 import traceback
 import typing as typ
@@ -14,6 +16,16 @@ _NAME_REGEX = re.compile(r'^\w+$')
 _magic_keywords = {}
 _parser_functions = {}
 
+# Maximum number of results memoized for each pure parser function
+PURE_FUNCTIONS_CACHE_SIZE = 4096
+
+# The value of the magic keyword changes over time, renders using it may only be cached for a limited time
+VOLATILE_TIME = 'time'
+# The value of the magic keyword depends on the current user, renders using it may only be cached per user
+VOLATILE_USER = 'user'
+# The value of the magic keyword depends on the rendered revision, renders using it may only be cached per revision
+VOLATILE_REVISION = 'revision'
+
 
 def _get_extension() -> typ.Optional[extensions.Extension]:
     path = traceback.extract_stack()[-4].filename
@@ -22,7 +34,7 @@ def _get_extension() -> typ.Optional[extensions.Extension]:
     return None
 
 
-def parser_function(name=None, function=None):
+def parser_function(name=None, function=None, *, pure: bool = False, page_argument: int = None):
     """
     Decorator function to register a new parser function.
 
@@ -35,36 +47,44 @@ def parser_function(name=None, function=None):
             When calling this function directly, the first argument is the parser function’s name,
             the second is the actual function.
 
+    Parser functions are called from wikicode with the {{#name:arg1|arg2|…}} syntax.
+    Each argument is passed to the function as a string.
+
     :param name: The name of the parser function if called in the second or third way.
         The decorated function if called in the first way without the parentheses. None otherwise.
         The function’s name should only contain letters, digits and underscores.
     :param function: The actual function if called in the third way, None otherwise.
+    :param pure: If true, the function’s result must only depend on its arguments and the function must not have
+        any side effect. Its results will then be memoized across parses, keyed by the arguments.
+    :param page_argument: If the function’s result depends on a page, like its existence, the index of the argument
+        that holds the page’s title. The page will then be recorded as linked by the parsed page,
+        so that its renders are invalidated when the page is created.
     :return: The wrapper function.
     """
     if name is None and function is None:
         # @parser_function()
         def aux(f):
-            return _register_function(f.__name__, f)
+            return _register_function(f.__name__, f, pure, page_argument)
 
         return aux
     elif name is not None and function is None:
         if callable(name):
             # @parser_function
-            return _register_function(name.__name__, name)
+            return _register_function(name.__name__, name, pure, page_argument)
         else:
             # @parser_function('somename')
             def aux(f):
-                return _register_function(name, f)
+                return _register_function(name, f, pure, page_argument)
 
             return aux
     elif name is not None and function is not None:
         # parser_function('somename', somefunc)
-        return _register_function(name, function)
+        return _register_function(name, function, pure, page_argument)
 
     raise ValueError(f'Unsupported arguments to register_function: ({name!r}, {function!r})')
 
 
-def magic_keyword(name=None, function=None, *, takes_context: bool = False):
+def magic_keyword(name=None, function=None, *, takes_context: bool = False, volatile: str = None):
     """
     Decorator function to register a new magic keyword.
 
@@ -81,28 +101,30 @@ def magic_keyword(name=None, function=None, *, takes_context: bool = False):
         The decorated function if called in the first way without the parentheses. None otherwise.
         The magic keyword’s name should only contain letters, digits and underscores.
     :param function: The actual function if called in the third way, None otherwise.
-    :param takes_context:
+    :param takes_context: If true, the first argument of the function will be the page context.
+    :param volatile: If the keyword’s value is not the same for every render of a given page revision,
+        either VOLATILE_TIME, VOLATILE_USER or VOLATILE_REVISION. None otherwise.
     :return: The wrapper function.
     """
     if name is None and function is None:
         # @magic_keyword()
         def aux(f):
-            return _register_magic_keyword(f.__name__, f, takes_context)
+            return _register_magic_keyword(f.__name__, f, takes_context, volatile)
 
         return aux
     elif name is not None and function is None:
         if callable(name):
             # @magic_keyword
-            return _register_magic_keyword(name.__name__, name, takes_context)
+            return _register_magic_keyword(name.__name__, name, takes_context, volatile)
         else:
             # @magic_keyword('somename')
             def aux(f):
-                return _register_magic_keyword(name, f, takes_context)
+                return _register_magic_keyword(name, f, takes_context, volatile)
 
             return aux
     elif name is not None and function is not None:
         # @magic_keyword('somename', somefunc)
-        return _register_magic_keyword(name, function, takes_context)
+        return _register_magic_keyword(name, function, takes_context, volatile)
 
     raise ValueError(f'Unsupported arguments to register_function: ({name!r}, {function!r})')
 
@@ -125,21 +147,46 @@ class ParserFunction(ParserFeature):
     """
     Parser functions are functions that can be called from the wikicode.
     They produce a result depending on the value of their arguments.
+    The results of pure functions are memoized.
     """
     _function: typ.Callable[[typ.Any], str]
+    pure: bool = False
+    # Index of the argument holding the title of the page the result depends on, None if it depends on no page
+    page_argument: typ.Optional[int] = None
     do_not_call_in_templates = True
 
     def __call__(self, *args, **kwargs) -> str:
         return self._function(*args, **kwargs)
 
+    def accepts(self, *args: str) -> bool:
+        """
+        Checks whether the underlying function can be called with the given positional arguments.
+
+        :param args: The arguments.
+        :return: True if the number of arguments matches the function’s signature, false otherwise.
+        """
+        try:
+            _get_signature(self._function).bind(*args)
+        except TypeError:
+            return False
+        return True
+
+
+@functools.lru_cache(maxsize=None)
+def _get_signature(function: typ.Callable) -> inspect.Signature:
+    """Returns the signature of the given function. Signatures are cached as they are costly to compute."""
+    return inspect.signature(function)
+
 
 @dataclasses.dataclass(frozen=True)
 class MagicKeyword(ParserFeature):
     """
     Magic keywords are template-like features that are substituted by the result returned by their inner function.
+    Volatile magic keywords have a value that may change between two renders of the same page revision.
     """
     takes_context: bool
     _function: typ.Callable
+    volatile: typ.Optional[str] = None
     do_not_call_in_templates = True
 
     def __call__(self, *args, **kwargs) -> str:
@@ -156,13 +203,14 @@ def get_registered_functions() -> typ.Dict[str, ParserFunction]:
     return dict(_parser_functions)
 
 
-def _register_magic_keyword(name: str, function, takes_context: bool) -> MagicKeyword:
+def _register_magic_keyword(name: str, function, takes_context: bool, volatile: typ.Optional[str]) -> MagicKeyword:
     """
     Registers a magic keyword.
 
     :param name: The keyword’s name.
     :param function: The keyword’s underlying function.
     :param takes_context: If true, the first argument of the function will be the page context.
+    :param volatile: The keyword’s volatility, either VOLATILE_TIME, VOLATILE_USER, VOLATILE_REVISION or None.
     :return: The magic keyword.
     :raises ValueError: If a magic keyword with the same name is already registered or the keyword’s name is invalid.
     """
@@ -171,17 +219,22 @@ def _register_magic_keyword(name: str, function, takes_context: bool) -> MagicKe
         raise ValueError(f'Duplicate declaration for magic keyword name "{name}"')
     if not re.fullmatch(_NAME_REGEX, name):
         raise ValueError(f'Invalid magic keyword name "{name}"')
-    wrapper = MagicKeyword(name=name, extension=_get_extension(), takes_context=takes_context, _function=function)
+    if volatile not in (None, VOLATILE_TIME, VOLATILE_USER, VOLATILE_REVISION):
+        raise ValueError(f'Invalid volatility "{volatile}" for magic keyword "{name}"')
+    wrapper = MagicKeyword(name=name, extension=_get_extension(), takes_context=takes_context, _function=function,
+                           volatile=volatile)
     _magic_keywords[name] = wrapper
     return wrapper
 
 
-def _register_function(name: str, function) -> ParserFunction:
+def _register_function(name: str, function, pure: bool, page_argument: typ.Optional[int]) -> ParserFunction:
     """
     Registers a parser function.
 
     :param name: The parser function’s name.
     :param function: The parser function’s underlying function.
+    :param pure: Whether the function’s results may be memoized.
+    :param page_argument: The index of the argument holding the title of the page the function’s result depends on.
     :return: The parser function.
     :raises ValueError: If a function with the same name is already registered or the function’s name is invalid.
     """
@@ -189,7 +242,10 @@ def _register_function(name: str, function) -> ParserFunction:
         raise ValueError(f'Duplicate declaration for function name "{name}"')
     if not re.fullmatch(_NAME_REGEX, name):
         raise ValueError(f'Invalid function name "{name}"')
-    wrapper = ParserFunction(name=name, extension=_get_extension(), _function=function)
+    if pure:
+        function = functools.lru_cache(maxsize=PURE_FUNCTIONS_CACHE_SIZE)(function)
+    wrapper = ParserFunction(name=name, extension=_get_extension(), _function=function, pure=pure,
+                             page_argument=page_argument)
     _parser_functions[name] = wrapper
     return wrapper
 
@@ -202,4 +258,7 @@ __all__ = [
     'ParserFeature',
     'ParserFunction',
     'MagicKeyword',
+    'VOLATILE_TIME',
+    'VOLATILE_USER',
+    'VOLATILE_REVISION',
 ]
@@ -0,0 +1,241 @@
+"""
+This module defines a compact binary format to store parsed node trees.
+
+An encoded tree has the following layout:
+    - the magic bytes b'WPYN' followed by the format version as a single byte;
+    - the strings table: the number of strings, then each string as its length in bytes followed by its UTF-8 bytes;
+    - the root node.
+
+Each node is encoded as its type tag, its fields, the number of its subnodes then each subnode.
+Strings fields are encoded as 0 for None or as the index of the string in the table plus one,
+so that each distinct string is stored only once. All integers are unsigned LEB128 varints.
+"""
+from __future__ import annotations
+
+import typing as typ
+
+from . import _nodes
+
+MAGIC = b'WPYN'
+VERSION = 1
+
+_STR = 'str'
+_INT = 'int'
+_NODE = 'node'
+_PARAMS = 'params'
+
+
+class _NodeType(typ.NamedTuple):
+    """Describes how to encode and decode nodes of a given class."""
+    tag: int
+    cls: typ.Type[_nodes.WikicodeNode]
+    fields: typ.Tuple[typ.Tuple[str, typ.Callable[[typ.Any], typ.Any]], ...]
+    # Whether subnodes are passed to the constructor instead of set_parsed_content_nodes()
+    children_in_constructor: bool = False
+
+
+# Tags must never be reused or changed, new node types must be appended with new tags
+_NODE_TYPES = (
+    _NodeType(1, _nodes.DocumentNode, (), children_in_constructor=True),
+    _NodeType(2, _nodes.ParagraphNode, (), children_in_constructor=True),
+    _NodeType(3, _nodes.TitleNode, ((_NODE, lambda n: n.content), (_INT, lambda n: n.level))),
+    _NodeType(4, _nodes.CategoryNode, ((_STR, lambda n: n.title), (_STR, lambda n: n.sort_key))),
+    _NodeType(5, _nodes.TextNode, ((_STR, lambda n: n.text),)),
+    _NodeType(6, _nodes.InternalLinkNode, (
+        (_STR, lambda n: n.page_title),
+        (_STR, lambda n: n.anchor),
+        (_PARAMS, lambda n: n.params),
+        (_STR, lambda n: n.text),
+    )),
+    _NodeType(7, _nodes.ExternalLinkNode, ((_STR, lambda n: n.url), (_STR, lambda n: n.text))),
+    _NodeType(8, _nodes.BoldTextNode, ((_STR, lambda n: n.text),)),
+    _NodeType(9, _nodes.ItalicTextNode, ((_STR, lambda n: n.text),)),
+    _NodeType(10, _nodes.UnderlinedTextNode, ((_STR, lambda n: n.text),)),
+    _NodeType(11, _nodes.OverlinedTextNode, ((_STR, lambda n: n.text),)),
+    _NodeType(12, _nodes.StrikethroughTextNode, ((_STR, lambda n: n.text),)),
+    _NodeType(13, _nodes.FileNode, (
+        (_STR, lambda n: n.file_name),
+        (_STR, lambda n: n.width),
+        (_STR, lambda n: n.legend),
+    )),
+    _NodeType(14, _nodes.RedirectNode, ((_STR, lambda n: n.target_page), (_STR, lambda n: n.anchor))),
+)
+_TYPES_BY_CLASS = {t.cls: t for t in _NODE_TYPES}
+_TYPES_BY_TAG = {t.tag: t for t in _NODE_TYPES}
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings: typ.Dict[str, int] = {}
+        self.buffer = bytearray()
+
+    def write_int(self, n: int):
+        while n > 0x7f:
+            self.buffer.append(n & 0x7f | 0x80)
+            n >>= 7
+        self.buffer.append(n)
+
+    def write_str(self, s: typ.Optional[str]):
+        if s is None:
+            self.write_int(0)
+        else:
+            self.write_int(self.strings.setdefault(s, len(self.strings)) + 1)
+
+    def write_params(self, params: typ.Dict[str, typ.Union[str, typ.List[str]]]):
+        self.write_int(len(params))
+        for k, v in params.items():
+            self.write_str(k)
+            if isinstance(v, str):
+                self.write_int(0)
+                self.write_str(v)
+            else:  # Lists are prefixed by their length plus one to tell them apart from single strings
+                self.write_int(len(v) + 1)
+                for item in v:
+                    self.write_str(item)
+
+    def write_node(self, node: _nodes.WikicodeNode):
+        node_type = _TYPES_BY_CLASS.get(type(node))
+        if not node_type:
+            raise ValueError(f'cannot encode node of type {type(node).__name__}')
+        self.write_int(node_type.tag)
+        for kind, getter in node_type.fields:
+            value = getter(node)
+            if kind == _STR:
+                self.write_str(value)
+            elif kind == _INT:
+                self.write_int(value)
+            elif kind == _NODE:
+                self.write_node(value)
+            else:
+                self.write_params(value)
+        # noinspection PyProtectedMember
+        children = node._internal_nodes
+        self.write_int(len(children))
+        for child in children:
+            self.write_node(child)
+
+
+class _Decoder:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.index = 0
+        self.strings: typ.List[str] = []
+
+    def read_int(self) -> int:
+        try:
+            b = self.data[self.index]
+            self.index += 1
+            if b < 0x80:  # Most integers fit in a single byte
+                return b
+            n = b & 0x7f
+            shift = 7
+            while True:
+                b = self.data[self.index]
+                self.index += 1
+                n |= (b & 0x7f) << shift
+                if b < 0x80:
+                    return n
+                shift += 7
+        except IndexError:
+            raise ValueError('truncated node tree data')
+
+    def read_raw_str(self) -> str:
+        length = self.read_int()
+        end = self.index + length
+        if end > len(self.data):
+            raise ValueError('truncated node tree data')
+        s = self.data[self.index:end].decode('UTF-8')
+        self.index = end
+        return s
+
+    def read_str(self) -> typ.Optional[str]:
+        i = self.read_int()
+        if i == 0:
+            return None
+        try:
+            return self.strings[i - 1]
+        except IndexError:
+            raise ValueError(f'invalid string index {i - 1}')
+
+    def read_params(self) -> typ.Dict[str, typ.Union[str, typ.List[str]]]:
+        params = {}
+        for _ in range(self.read_int()):
+            key = self.read_str()
+            length = self.read_int()
+            if length == 0:
+                params[key] = self.read_str()
+            else:
+                params[key] = [self.read_str() for _ in range(length - 1)]
+        return params
+
+    def read_node(self) -> _nodes.WikicodeNode:
+        tag = self.read_int()
+        node_type = _TYPES_BY_TAG.get(tag)
+        if not node_type:
+            raise ValueError(f'unknown node type tag {tag}')
+        args = []
+        for kind, _ in node_type.fields:
+            if kind == _STR:
+                args.append(self.read_str())
+            elif kind == _INT:
+                args.append(self.read_int())
+            elif kind == _NODE:
+                args.append(self.read_node())
+            else:
+                args.append(self.read_params())
+        children = [self.read_node() for _ in range(self.read_int())]
+        if node_type.children_in_constructor:
+            return node_type.cls(*args, *children)
+        node = node_type.cls(*args)
+        if children:
+            node.set_parsed_content_nodes(children)
+        return node
+
+
+def encode_node_tree(node: _nodes.WikicodeNode) -> bytes:
+    """
+    Encodes the given node tree into bytes.
+
+    :param node: The root node of the tree to encode.
+    :return: The encoded tree.
+    :raises ValueError: If the tree contains nodes of a type that cannot be encoded, like extended HTML tags.
+    """
+    encoder = _Encoder()
+    encoder.write_node(node)
+    body = encoder.buffer
+
+    encoder.buffer = bytearray(MAGIC)
+    encoder.buffer.append(VERSION)
+    encoder.write_int(len(encoder.strings))
+    for s in encoder.strings:  # Dicts preserve insertion order, i.e. indices order
+        b = s.encode('UTF-8')
+        encoder.write_int(len(b))
+        encoder.buffer.extend(b)
+    return bytes(encoder.buffer + body)
+
+
+def decode_node_tree(data: bytes) -> _nodes.WikicodeNode:
+    """
+    Decodes a node tree encoded by encode_node_tree().
+
+    :param data: The encoded tree.
+    :return: The root node of the decoded tree.
+    :raises ValueError: If the data is not a valid encoded tree or was encoded with another version of the format.
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('not an encoded node tree')
+    if len(data) <= len(MAGIC) or data[len(MAGIC)] != VERSION:
+        raise ValueError('unsupported node tree format version')
+    decoder = _Decoder(data)
+    decoder.index = len(MAGIC) + 1
+    decoder.strings = [decoder.read_raw_str() for _ in range(decoder.read_int())]
+    node = decoder.read_node()
+    if decoder.index != len(data):
+        raise ValueError('trailing data after node tree')
+    return node
+
+
+__all__ = [
+    'encode_node_tree',
+    'decode_node_tree',
+]
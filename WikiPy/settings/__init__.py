@@ -60,6 +60,23 @@ DIFF_SIZE_TAG_IMPORTANT = 500
 
 MEDIA_BACKEND_ID = ''
 
+PARSER_CACHE_BACKEND = PARSER_CACHE_BACKEND_DJANGO
+PARSER_CACHE_EXPIRY = 86400  # Seconds
+PARSER_CACHE_VOLATILE_EXPIRY = 3600  # Seconds, for renders that depend on the current time
+PARSER_CACHE_MAX_ENTRIES = 1000
+PARSER_CACHE_PRUNE_PROBABILITY = 0.01  # Probability that a write to the database backend prunes the table
+
+PARSER_PROFILING = False
+
+PARSER_BACKEND = PARSER_BACKEND_STATE_MACHINE
+
+PARSER_MAX_EXPANSION_SIZE = 2_000_000  # Characters
+PARSER_MAX_TEMPLATE_CALLS = 5000
+PARSER_MAX_NODES = 1_000_000
+PARSER_MAX_TIME = 10  # Seconds
+
+STREAMING_RENDERING = False
+
 WIKI_NS: Namespace
 SPECIAL_NS: Namespace
 MAIN_NS: Namespace
@@ -86,8 +103,11 @@ def init(base_dir: _pathlib.Path):
         HIDE_TITLE_ON_MAIN_PAGE, CASE_SENSITIVE_TITLE, INVALID_TITLE_REGEX, TIME_ZONE, NAMESPACES, \
         GROUPS, FROM_EMAIL, EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD, EMAIL_USE_TLS, \
         EMAIL_USE_SSL, EMAIL_TIMEOUT, EMAIL_SSL_KEYFILE, EMAIL_SSL_CERTFILE, SPECIAL_PAGES_LOCAL_NAMES, \
-        MEDIA_BACKEND_ID, WIKI_NS, SPECIAL_NS, MAIN_NS, CATEGORY_NS, WIKIPY_NS, USER_NS, TEMPLATE_NS, MODULE_NS, \
-        HELP_NS, FILE_NS, GADGET_NS, _skin_names, _extension_names, BASE_DIR, WIKI_APP_DIR
+        MEDIA_BACKEND_ID, PARSER_CACHE_BACKEND, PARSER_CACHE_EXPIRY, PARSER_CACHE_VOLATILE_EXPIRY, \
+        PARSER_CACHE_MAX_ENTRIES, PARSER_CACHE_PRUNE_PROBABILITY, PARSER_PROFILING, PARSER_BACKEND, \
+        PARSER_MAX_EXPANSION_SIZE, PARSER_MAX_TEMPLATE_CALLS, PARSER_MAX_NODES, PARSER_MAX_TIME, STREAMING_RENDERING, \
+        WIKI_NS, SPECIAL_NS, MAIN_NS, CATEGORY_NS, WIKIPY_NS, USER_NS, TEMPLATE_NS, MODULE_NS, HELP_NS, FILE_NS, \
+        GADGET_NS, _skin_names, _extension_names, BASE_DIR, WIKI_APP_DIR
 
     _logging.basicConfig(format=_apps.WikiPyConfig.name + ':%(levelname)s:%(message)s', level=_logging.DEBUG)
 
@@ -131,6 +151,34 @@ def init(base_dir: _pathlib.Path):
 
         MEDIA_BACKEND_ID = str(json_config['media_backend'])
 
+        parser_cache_obj = json_config.get('parser_cache')
+        if parser_cache_obj:
+            PARSER_CACHE_BACKEND = str(parser_cache_obj.get('backend', PARSER_CACHE_BACKEND))
+            if PARSER_CACHE_BACKEND not in PARSER_CACHE_BACKENDS:
+                raise ValueError(f'invalid parser cache backend "{PARSER_CACHE_BACKEND}"')
+            PARSER_CACHE_EXPIRY = int(parser_cache_obj.get('expiry', PARSER_CACHE_EXPIRY))
+            PARSER_CACHE_VOLATILE_EXPIRY = int(parser_cache_obj.get('volatile_expiry', PARSER_CACHE_VOLATILE_EXPIRY))
+            PARSER_CACHE_MAX_ENTRIES = int(parser_cache_obj.get('max_entries', PARSER_CACHE_MAX_ENTRIES))
+            PARSER_CACHE_PRUNE_PROBABILITY = float(parser_cache_obj.get('prune_probability',
+                                                                        PARSER_CACHE_PRUNE_PROBABILITY))
+            if not 0 <= PARSER_CACHE_PRUNE_PROBABILITY <= 1:
+                raise ValueError(f'invalid parser cache prune probability {PARSER_CACHE_PRUNE_PROBABILITY}')
+
+        PARSER_PROFILING = bool(json_config.get('parser_profiling', PARSER_PROFILING))
+
+        PARSER_BACKEND = str(json_config.get('parser_backend', PARSER_BACKEND))
+        if PARSER_BACKEND not in PARSER_BACKENDS:
+            raise ValueError(f'invalid parser backend "{PARSER_BACKEND}"')
+
+        parser_limits_obj = json_config.get('parser_limits')
+        if parser_limits_obj:
+            PARSER_MAX_EXPANSION_SIZE = int(parser_limits_obj.get('max_expansion_size', PARSER_MAX_EXPANSION_SIZE))
+            PARSER_MAX_TEMPLATE_CALLS = int(parser_limits_obj.get('max_template_calls', PARSER_MAX_TEMPLATE_CALLS))
+            PARSER_MAX_NODES = int(parser_limits_obj.get('max_nodes', PARSER_MAX_NODES))
+            PARSER_MAX_TIME = float(parser_limits_obj.get('max_time', PARSER_MAX_TIME))
+
+        STREAMING_RENDERING = bool(json_config.get('streaming_rendering', STREAMING_RENDERING))
+
         local_rights = dict(json_config['rights'])
         # TODO handle custom groups definition
         # additional_groups = dict(**json_config['additional_groups'])
@@ -108,6 +108,25 @@ PAGE_TYPE_MODULE = 'module'
 
 PAGE_TYPES = tuple(v for k, v in sys.modules[__name__].__dict__.items() if k.startswith('PAGE_TYPE_'))
 
+#########################
+# Parser cache backends #
+#########################
+
+PARSER_CACHE_BACKEND_DJANGO = 'django_cache'
+PARSER_CACHE_BACKEND_DATABASE = 'database'
+
+PARSER_CACHE_BACKENDS = tuple(v for k, v in sys.modules[__name__].__dict__.items()
+                              if k.startswith('PARSER_CACHE_BACKEND_'))
+
+###################
+# Parser backends #
+###################
+
+PARSER_BACKEND_STATE_MACHINE = 'state_machine'
+PARSER_BACKEND_LARK = 'lark'
+
+PARSER_BACKENDS = tuple(v for k, v in sys.modules[__name__].__dict__.items() if k.startswith('PARSER_BACKEND_'))
+
 ##############
 # File types #
 ##############
@@ -39,8 +39,8 @@ import urllib.parse
 import django.utils.safestring as dj_safe
 from django.conf import settings as dj_settings
 
-from .. import apps, settings, special_pages, page_context
-from ..api import titles as api_titles, pages as api_pages
+from .. import apps, parser, settings, special_pages, page_context
+from ..api import titles as api_titles, pages as api_pages, link_batch as api_link_batch
 
 
 @dataclasses.dataclass(frozen=True)
@@ -139,6 +139,16 @@ class PageTemplate:
 
         return list(filter(f, self.__menus_links.get(menu_id, [])))
 
+    def has_menu_item(self, menu_id: str, item_id: str) -> bool:
+        """
+        Checks whether the given menu has an item with the given ID, regardless of any page context.
+
+        :param menu_id: ID of the menu.
+        :param item_id: ID of the item.
+        :return: True if the menu has the item, false otherwise.
+        """
+        return any(item.item_id == item_id for item in self.__menus_links.get(menu_id, []))
+
 
 _PAGE_TEMPLATE = PageTemplate()
 
@@ -159,18 +169,15 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
         """The string of attributes to add to the body tag."""
         return dj_safe.mark_safe(' '.join(map(lambda e: f'{e[0]}="{e[1]}"', self.__body_attrs.items())))
 
-    @property
-    def additional_menus(self) -> typ.List[str]:
-        """Returns a list of menus defined in the WikiPy:SideMenus pages, but not present in the page template."""
-        side_menus = api_pages.get_page_content(settings.WIKIPY_NS.id, 'SideMenus', performer=None)
-        items = []
-        if side_menus:
-            for line in side_menus.split('\n'):
-                if line.startswith('*') and not line.startswith('**'):
-                    name = line[1:].strip()
-                    if name != 'navigation':
-                        items.append(name)
-        return items
+    @staticmethod
+    def get_additional_menus(context) -> typ.List[str]:
+        """Returns a list of menus defined in the WikiPy:SideMenus pages, but not present in the page template.
+
+        :param context: Context of the page being rendered.
+        :type context: WikiPy.page_context.PageContext
+        :return: The names of the menus.
+        """
+        return [name for name in api_pages.get_side_menus(context) if name != 'navigation']
 
     def get_rendered_menu_items(self, menu_id: str, context, *link_classes: str) -> typ.List[str]:
         """Returns the items for a specific menu ID.
@@ -186,6 +193,8 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
         c: page_context.PageContext = context['wpy_context']
 
         if menu_id == 'categories' and hasattr(c, 'page_categories'):
+            for category_page, _ in c.page_categories:
+                c.link_batch.add(api_titles.get_full_page_title(settings.CATEGORY_NS.id, category_page.title))
             for category_page, category_data in c.page_categories:
                 tooltip = c.language.translate('title.maintenance_category.tooltip')
                 icon = (f'<span class="mdi mdi-tools" title="{tooltip}"></span> ' if category_data.maintenance else '')
@@ -194,41 +203,31 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
                     current_page_title=c.page.full_title,
                     page_title=api_titles.get_full_page_title(settings.CATEGORY_NS.id, category_page.title),
                     text=category_page.title,
-                    css_classes=link_classes
+                    css_classes=link_classes,
+                    link_batch=c.link_batch
                 ))
 
         else:
             items = _PAGE_TEMPLATE.get_menu_items(menu_id, c)
 
-            if menu_id == 'navigation' or menu_id in self.additional_menus:
-                # TODO optimiser
-                side_menus = api_pages.get_page_content(settings.WIKIPY_NS.id, 'SideMenus', performer=c.user)
+            side_menus = api_pages.get_side_menus(c)
+            if menu_id == 'navigation' or menu_id in side_menus:
                 default_items = {i.item_id: i for i in items}
-                current_menu = None
                 items = []
 
-                if side_menus:
-                    for line in side_menus.split('\n'):
-                        if line.startswith('**') and current_menu == menu_id:
-                            line = line[2:].strip()
-                            if '|' in line:
-                                url, text = line.strip().split('|', maxsplit=1)
-                            else:
-                                url = line.strip()
-                                text = url
-                            if url == 'main_page':
-                                if text == url:
-                                    text = settings.MAIN_PAGE_TITLE
-                                url = api_titles.get_full_page_title(settings.MAIN_PAGE_NAMESPACE_ID,
-                                                                     settings.MAIN_PAGE_TITLE)
-                            if url in default_items:
-                                items.append(default_items[url])
-                            else:
-                                items.append(MenuItem(text=text, url=url))
-
-                        elif line.startswith('*'):
-                            current_menu = line[1:].strip()
-
+                if c.user.can_read_page(settings.WIKIPY_NS.id, api_pages.SIDE_MENUS_PAGE_TITLE):
+                    # Register the links of all side menus so that their existence is resolved in a single batch
+                    for name, entries in side_menus.items():
+                        for entry in entries:
+                            if not _PAGE_TEMPLATE.has_menu_item(name, entry.url):
+                                c.link_batch.add(entry.page_title)
+                    for entry in side_menus.get(menu_id, ()):
+                        if entry.url in default_items:
+                            items.append(default_items[entry.url])
+                        else:
+                            items.append(MenuItem(text=entry.text, url=entry.url))
+
+            links = []
             for item in items:
                 args = {}
 
@@ -306,7 +305,8 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
                     if icon:
                         text = f'<span class="mdi mdi-{icon}"></span> ' + text
 
-                    rendered_items.append(self.format_internal_link(
+                    rendered_items.append(None)  # Links are rendered once all targets have been registered
+                    links.append((len(rendered_items) - 1, dict(
                         language=c.language,
                         current_page_title='',
                         page_title=api_titles.get_full_page_title(ns_id, title),
@@ -315,8 +315,14 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
                         tooltip=tooltip,
                         access_key=access_key if not item.disable_access_key else None,
                         css_classes=link_classes,
-                        url_params=args
-                    ))
+                        url_params=args,
+                        link_batch=c.link_batch
+                    )))
+
+            for _, link_args in links:
+                c.link_batch.add(link_args['page_title'], talk=link_args['url_params'].get('action') == 'talk')
+            for i, link_args in links:
+                rendered_items[i] = self.format_internal_link(**link_args)
 
         return rendered_items
 
@@ -324,7 +330,8 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
                              tooltip: str = None, anchor: str = None, no_red_link: bool = False,
                              css_classes: typ.Sequence[str] = None, access_key: str = None, only_url: bool = False,
                              new_tab: bool = False, id_: str = None, data_attributes: typ.Dict[str, str] = None,
-                             url_params: typ.Dict[str, typ.Any] = None) -> str:
+                             url_params: typ.Dict[str, typ.Any] = None,
+                             link_batch: api_link_batch.LinkBatch = None) -> str:
         """Renders an internal link.
 
         :param language: The current page language.
@@ -341,11 +348,21 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
         :param id_: The link’s id attribute’s value.
         :param data_attributes: Data attributes to add to the link.
         :param url_params: Parameters to add to the URL.
+        :param link_batch: If specified, the existence of the target page will be looked up in this batch
+            instead of being queried for this link only. Links to redirections then get the wpy-redirect-link class.
         :return: The HTML link or the URL.
         """
         url_params = url_params or {}
-        ns_id, title = api_titles.extract_namespace_and_title(page_title, ns_as_id=True)
-        page_exists = no_red_link or api_pages.page_exists(ns_id, title, talk=url_params.get('action') == 'talk')
+        talk = url_params.get('action') == 'talk'
+        css_classes = list(css_classes or [])
+        if link_batch:
+            ns_id, title = link_batch.split_title(page_title)
+            page_exists = no_red_link or link_batch.page_exists(ns_id, title, talk=talk)
+            if not talk and not no_red_link and link_batch.is_redirect(ns_id, title):
+                css_classes.append('wpy-redirect-link')
+        else:
+            ns_id, title = api_titles.extract_namespace_and_title(page_title, ns_as_id=True)
+            page_exists = no_red_link or api_pages.page_exists(ns_id, title, talk=talk)
         url = api_titles.get_page_url(ns_id, title)
         link_text = text or page_title
         if tooltip is not None:
@@ -374,7 +391,7 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
 
         if only_url:
             return url
-        return self._format_link(url, link_text, link_tooltip, page_exists, css_classes or [], access_key,
+        return self._format_link(url, link_text, link_tooltip, page_exists, css_classes, access_key,
                                  external=new_tab, id_=id_, **(data_attributes or {}))
 
     def format_external_link(self, url: str, text: str = None, css_classes: typ.Sequence[str] = None) -> str:
@@ -408,7 +425,8 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
         """
         pass
 
-    def render_wikicode(self, parsed_wikicode, context, enable_comment: bool = False) -> str:
+    def render_wikicode(self, parsed_wikicode, context, enable_comment: bool = False,
+                        profile: parser.ParserProfile = None) -> str:
         """Renders the given parsed wikicode (node tree).
 
         :param parsed_wikicode: The parsed wikicode, as a node tree.
@@ -416,22 +434,61 @@ class Skin(settings.resource_loader.ExternalResource, abc.ABC):
         :param context: Context of the page being rendered.
         :type context: WikiPy.page_context.PageContext
         :param enable_comment: If true, the generation comment will be appended to the rendered HTML.
+        :param profile: The profile of the parse that produced the node tree. If specified, the rendering time
+            will be recorded in it and the whole profile will be added to the generation comment.
         :return: The wikicode rendered as HTML.
         """
         start = time.time()
-        render = parsed_wikicode.render(self, context)
+        render = ''.join(self.render_wikicode_chunks(parsed_wikicode, context, profile=profile))
         total = (time.time() - start) * 1000
         if enable_comment:
-            comment = f"""
-<!--
-Page generated by WikiPy in {total:0.4} ms.
-Skin: {self.name(context.language)}
--->"""
+            comment = self.get_generation_comment(context, total, profile=profile)
         else:
             comment = ''
 
         return render + comment
 
+    def render_wikicode_chunks(self, parsed_wikicode, context,
+                               profile: parser.ParserProfile = None) -> typ.Iterator[str]:
+        """Renders the given parsed wikicode (node tree) piece by piece.
+        Chunks are rendered lazily, when they are requested.
+
+        :param parsed_wikicode: The parsed wikicode, as a node tree.
+        :type parsed_wikicode: WikiPy.parser.WikicodeNode
+        :param context: Context of the page being rendered.
+        :type context: WikiPy.page_context.PageContext
+        :param profile: The profile of the parse that produced the node tree.
+            If specified, the rendering time will be recorded in it.
+        :return: A generator of HTML code chunks.
+        """
+        context.link_batch.add_links(parsed_wikicode)
+        chunks = parsed_wikicode.render_chunks(self, context)
+        while True:
+            if profile:
+                with profile.measure(parser.PHASE_RENDERING):
+                    chunk = next(chunks, None)
+            else:
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def get_generation_comment(self, context, total: float, profile: parser.ParserProfile = None) -> str:
+        """Returns the HTML comment that is appended to rendered pages.
+
+        :param context: Context of the page being rendered.
+        :type context: WikiPy.page_context.PageContext
+        :param total: The time it took to render the page, in milliseconds.
+        :param profile: If specified, the profile of the parse that will be added to the comment.
+        :return: The HTML comment.
+        """
+        profile_report = f'Parser profile ({profile.total_time:0.4} ms):\n{profile.format()}\n' if profile else ''
+        return f"""
+<!--
+Page generated by WikiPy in {total:0.4} ms.
+Skin: {self.name(context.language)}
+{profile_report}-->"""
+
 
 _loaded_skins = {}
 
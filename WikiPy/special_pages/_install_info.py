@@ -7,7 +7,7 @@ from django.conf import settings as dj_settings
 
 from . import SpecialPage, MISC_CAT
 from .. import page_context, extensions as exts, parser, settings, skins as skins_
-from ..api import titles as api_titles
+from ..api import titles as api_titles, parser_cache as api_parser_cache
 
 
 @dataclasses.dataclass(init=False)
@@ -18,6 +18,7 @@ class InstallInfoPageContext(page_context.PageContext):
     install_info_media_backend: str
     install_info_db_manager: str
     install_info_email_backend: str
+    install_info_parser_cache: api_parser_cache.ParserCacheStats
     install_info_extensions: typ.List[exts.Extension]
     install_info_skins: typ.List[skins_.Skin]
     install_info_parser_functions: typ.List[parser.ParserFunction]
@@ -35,6 +36,7 @@ class InstallInfoPageContext(page_context.PageContext):
             media_backend: str,
             db_manager: str,
             email_backend: str,
+            parser_cache: api_parser_cache.ParserCacheStats,
             skins: typ.List[skins_.Skin],
             extensions: typ.List[exts.Extension],
             parser_functions: typ.List[parser.ParserFunction],
@@ -48,6 +50,7 @@ class InstallInfoPageContext(page_context.PageContext):
         self.install_info_media_backend = media_backend
         self.install_info_db_manager = db_manager
         self.install_info_email_backend = email_backend
+        self.install_info_parser_cache = parser_cache
         self.install_info_wikipy_version = wikipy_version
         self.install_info_skins = skins
         self.install_info_extensions = extensions
@@ -118,6 +121,7 @@ class InstallInfoPage(SpecialPage):
                 media_backend=settings.MEDIA_BACKEND_ID,
                 db_manager=dj_settings.DATABASES['default']['ENGINE'],
                 email_backend=dj_settings.EMAIL_BACKEND,
+                parser_cache=api_parser_cache.get_stats(),
                 wikipy_version=settings.VERSION,
                 skins=sorted(skins_.get_loaded_skins(), key=lambda s: s.name(base_context.language)),
                 extensions=sorted(exts.get_loaded_extensions(), key=lambda e: e.name(base_context.language)),
@@ -1,14 +1,25 @@
 import dataclasses
+import typing as typ
 
 from . import SpecialPage, PAGE_TOOLS_CAT
-from .. import page_context
+from .. import page_context, models, settings, util
+from ..api import pages as api_pages, titles as api_titles
 
 
 @dataclasses.dataclass(init=False)
 class LinkedPagesContext(page_context.PageContext):
+    linked_pages_target: typ.Optional[str]
+    linked_pages_results: typ.List[models.Page]
+    linked_pages_next_from: typ.Optional[int]
+    linked_pages_limit: int
 
-    def __init__(self, context: page_context.PageContext, /):
+    def __init__(self, context: page_context.PageContext, /, target: typ.Optional[str],
+                 results: typ.List[models.Page], next_from: typ.Optional[int], limit: int):
         self._context = context
+        self.linked_pages_target = target
+        self.linked_pages_results = results
+        self.linked_pages_next_from = next_from
+        self.linked_pages_limit = limit
 
 
 class LinkedPagesPage(SpecialPage):
@@ -16,10 +27,27 @@ class LinkedPagesPage(SpecialPage):
         super().__init__('linked_pages', 'Linked pages', category=PAGE_TOOLS_CAT, icon='link-variant', access_key='l')
 
     def _get_data_impl(self, sub_title, base_context, request, **kwargs):
-        # TODO
-        context = LinkedPagesContext(base_context)
-
-        return context, [], None
+        target = None
+        results = []
+        next_from = None
+        title = None
+        limit = min(settings.REVISIONS_LIST_PAGE_MAX,
+                    max(settings.REVISIONS_LIST_PAGE_MIN,
+                        util.get_param(request.GET, 'limit', expected_type=int,
+                                       default=base_context.user.data.default_revisions_list_size)))
+
+        if sub_title:
+            ns_id, page_title = api_titles.extract_namespace_and_title('/'.join(sub_title), ns_as_id=True)
+            target = api_titles.get_full_page_title(ns_id, page_title)
+            # Keyset pagination: the ID of the last page of the previous results
+            from_page_id = max(0, util.get_param(request.GET, 'from', expected_type=int, default=0))
+            results, next_from = api_pages.get_linking_pages(ns_id, page_title, from_page_id=from_page_id,
+                                                             limit=limit)
+            title = base_context.language.translate('special.linked_pages.title_page', page=target)
+
+        context = LinkedPagesContext(base_context, target=target, results=results, next_from=next_from, limit=limit)
+
+        return context, [], title
 
 
 def load_special_page() -> SpecialPage:
@@ -56,3 +56,9 @@ def wpy_skin_render(context: page_context.TemplateContext, key: str, **kwargs: t
     if isinstance(res, str):
         return dj_safe.mark_safe(res)
     return list(map(dj_safe.mark_safe, res))
+
+
+@register.simple_tag(takes_context=True)
+def wpy_skin_additional_menus(context: page_context.TemplateContext) -> typ.List[str]:
+    wpy_context: page_context.PageContext = context.get('wpy_context')
+    return wpy_context.skin.get_additional_menus(wpy_context)
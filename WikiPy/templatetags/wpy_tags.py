@@ -405,7 +405,8 @@ def wpy_inner_link(
         tooltip = full_title
     classes = css_classes.split() if css_classes else []
     link = skin.format_internal_link(language, current_title, full_title, text, tooltip, no_red_link=no_red_link,
-                                     css_classes=classes, only_url=only_url, new_tab=new_tab, url_params=url_params)
+                                     css_classes=classes, only_url=only_url, new_tab=new_tab, url_params=url_params,
+                                     link_batch=wpy_context.link_batch)
     return dj_safe.mark_safe(link)
 
 
@@ -0,0 +1,99 @@
+"""
+Differential tests of the lark-based tokenizer against the hand-written state machine.
+"""
+import random
+import typing as typ
+
+import django.test as dj_test
+
+from .. import parser, settings
+from ..parser import _nodes
+
+# Snippets without templates, variables, functions, magic keywords nor redirections,
+# which are expanded before tokenizing and would need a full page context
+CORPUS = (
+    '',
+    'plain text',
+    'a\n\nb',
+    'a\nb\n\n\n\nc',
+    '**bold** //italic// __underlined__ ++overlined++ ~~strikethrough~~',
+    '**a //b// c**',
+    '**a //b** c//',
+    '**a\nb**',
+    '**unclosed',
+    '****',
+    '[[Page]]',
+    '[[Page|text]]',
+    '[[Page|**bold** text]]',
+    '[[Page#anchor|text]]',
+    '[[Page?a=1&a=2&b=3|text]]',
+    '[[Namespace:Page|]]',
+    '[[Page',
+    '[[Page|text\nmore]]',
+    '[[]]',
+    ']]',
+    '[[@Category]] [[@Category|sort key]]',
+    '[[File:Image.png]]',
+    '[[File:Image.png|100px|A **legend**]]',
+    '[(https://example.com)]',
+    '[(https://example.com text)]',
+    '[(https://example.com **text**)]',
+    '<nowiki>**not bold**</nowiki> **bold**',
+    '<nowiki>[[not a link]]</nowiki>',
+    '= Title =\ntext',
+    '== Title ==',
+    'a\n* b\n* c',
+    'é ✓ \t tabs',
+    '**[[Page|//text//]]**',
+    '[[Page|[[Nested]]]]',
+    '//a **b __c ~~d ++e++ d~~ c__ b** a//',
+)
+
+# Tokens used to build random snippets
+ALPHABET = (
+    '[', ']', '|', '=', '*', '/', '_', '~', '+', '(', ')', '\n', '\n\n', ' ', 'a', 'b', 'Page', '[[', ']]', '**',
+    '//', '__', '~~', '++', '[(', ')]', '@', '#', '?', '&', ':', 'File:', '<', '>', '<nowiki>', '</nowiki>', 'é',
+    '\t', '[[@Cat|k]]', '[(https://example.com t)]', '!',
+)
+RANDOM_SNIPPETS = 2000
+SEED = 21
+
+
+def _reprs(node: _nodes.WikicodeNode) -> typ.List[typ.Any]:
+    """Returns the repr() of the given node and those of its subnodes, recursively, as they are not always included."""
+    # noinspection PyProtectedMember
+    return [repr(node), [_reprs(child) for child in node._internal_nodes]]
+
+
+def _parse(wikicode: str, backend: str) -> typ.List[typ.Any]:
+    """
+    Parses the given wikicode with the given tokenizer.
+
+    :param wikicode: The wikicode to parse.
+    :param backend: The tokenizer to use.
+    :return: The repr() of the root node and the result of _reprs(), or the type of the raised exception.
+    """
+    try:
+        # The context is only used by templates, magic keywords, redirections and resource limits errors
+        root = parser.WikicodeParser(backend=backend).parse_wikicode(wikicode, None)
+    except Exception as e:  # Both tokenizers must fail the same way, e.g. for empty link targets
+        return [type(e)]
+    return [repr(root), _reprs(root)]
+
+
+class GrammarTestCase(dj_test.SimpleTestCase):
+    def assertSameTree(self, wikicode: str):
+        self.assertEqual(_parse(wikicode, settings.PARSER_BACKEND_STATE_MACHINE),
+                         _parse(wikicode, settings.PARSER_BACKEND_LARK))
+
+    def test_corpus(self):
+        for wikicode in CORPUS:
+            with self.subTest(wikicode=wikicode):
+                self.assertSameTree(wikicode)
+
+    def test_random_snippets(self):
+        rnd = random.Random(SEED)
+        for _ in range(RANDOM_SNIPPETS):
+            wikicode = ''.join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 40)))
+            with self.subTest(wikicode=wikicode):
+                self.assertSameTree(wikicode)
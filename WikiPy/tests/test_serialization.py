@@ -0,0 +1,179 @@
+"""
+Tests for the binary encoding of parsed node trees.
+"""
+import typing as typ
+
+import django.test as dj_test
+
+from .. import parser
+from ..parser import _nodes, _serialization
+
+
+def _dump(node: _nodes.WikicodeNode) -> typ.Tuple[str, str, typ.Any, typ.List]:
+    """
+    Returns a comparable representation of the given node tree.
+    Subnodes are not always part of the nodes’ repr() so they are walked explicitly.
+
+    :param node: The root node of the tree.
+    :return: The type name, repr() and, if any, title content and subnodes of each node, recursively.
+    """
+    content = _dump(node.content) if isinstance(node, _nodes.TitleNode) else None
+    # noinspection PyProtectedMember
+    return type(node).__name__, repr(node), content, [_dump(child) for child in node._internal_nodes]
+
+
+def _with_children(node: _nodes.WikicodeNode, *children: _nodes.WikicodeNode) -> _nodes.WikicodeNode:
+    node.set_parsed_content_nodes(children)
+    return node
+
+
+class SerializationTestCase(dj_test.SimpleTestCase):
+    def assertRoundTrip(self, node: _nodes.WikicodeNode):
+        decoded = parser.decode_node_tree(parser.encode_node_tree(node))
+        self.assertEqual(_dump(node), _dump(decoded))
+
+    def test_document(self):
+        self.assertRoundTrip(_nodes.DocumentNode())
+
+    def test_paragraph(self):
+        self.assertRoundTrip(_nodes.DocumentNode(_nodes.ParagraphNode(_nodes.TextNode('a'), _nodes.TextNode('b'))))
+
+    def test_title(self):
+        self.assertRoundTrip(_nodes.TitleNode(_nodes.ParagraphNode(_nodes.TextNode('Section')), 2))
+
+    def test_title_nested_content(self):
+        content = _nodes.ParagraphNode(
+            _nodes.TextNode('A '),
+            _with_children(_nodes.BoldTextNode('**b** //i//'), _nodes.TextNode('b '),
+                           _with_children(_nodes.ItalicTextNode('i'), _nodes.TextNode('i'))),
+        )
+        self.assertRoundTrip(_nodes.DocumentNode(_nodes.TitleNode(content, 3)))
+
+    def test_category(self):
+        self.assertRoundTrip(_nodes.CategoryNode('Cat', 'key'))
+
+    def test_category_no_sort_key(self):
+        self.assertRoundTrip(_nodes.CategoryNode('Cat'))
+
+    def test_text(self):
+        self.assertRoundTrip(_nodes.TextNode('été ✓ \x00'))
+
+    def test_text_empty(self):
+        self.assertRoundTrip(_nodes.TextNode(''))
+
+    def test_internal_link(self):
+        self.assertRoundTrip(_nodes.InternalLinkNode('Page', anchor='a', params={'a': '1'}, text='text'))
+
+    def test_internal_link_list_params(self):
+        node = _nodes.InternalLinkNode('Page', params={'a': ['1', '2'], 'b': '3', 'c': [], 'd': ['']})
+        self.assertRoundTrip(node)
+
+    def test_internal_link_children(self):
+        self.assertRoundTrip(_with_children(_nodes.InternalLinkNode('Page', text='**x**'),
+                                            _with_children(_nodes.BoldTextNode('x'), _nodes.TextNode('x'))))
+
+    def test_external_link(self):
+        self.assertRoundTrip(_nodes.ExternalLinkNode('https://example.com', 'text'))
+
+    def test_external_link_no_text(self):
+        self.assertRoundTrip(_nodes.ExternalLinkNode('https://example.com'))
+
+    def test_bold(self):
+        self.assertRoundTrip(_with_children(_nodes.BoldTextNode('b'), _nodes.TextNode('b')))
+
+    def test_italic(self):
+        self.assertRoundTrip(_with_children(_nodes.ItalicTextNode('i'), _nodes.TextNode('i')))
+
+    def test_underlined(self):
+        self.assertRoundTrip(_with_children(_nodes.UnderlinedTextNode('u'), _nodes.TextNode('u')))
+
+    def test_overlined(self):
+        self.assertRoundTrip(_with_children(_nodes.OverlinedTextNode('o'), _nodes.TextNode('o')))
+
+    def test_strikethrough(self):
+        self.assertRoundTrip(_with_children(_nodes.StrikethroughTextNode('s'), _nodes.TextNode('s')))
+
+    def test_file(self):
+        self.assertRoundTrip(_with_children(_nodes.FileNode('a.png', '100px', 'legend'), _nodes.TextNode('legend')))
+
+    def test_file_no_options(self):
+        self.assertRoundTrip(_nodes.FileNode('a.png'))
+
+    def test_redirect(self):
+        self.assertRoundTrip(_nodes.RedirectNode('Page', 'anchor'))
+
+    def test_redirect_no_anchor(self):
+        self.assertRoundTrip(_nodes.RedirectNode('Page'))
+
+    def test_all_types_covered(self):
+        tested = {type(node) for node in [
+            _nodes.DocumentNode(), _nodes.ParagraphNode(), _nodes.TitleNode(_nodes.TextNode(''), 1),
+            _nodes.CategoryNode('c'), _nodes.TextNode(''), _nodes.InternalLinkNode('p'), _nodes.ExternalLinkNode('u'),
+            _nodes.BoldTextNode(''), _nodes.ItalicTextNode(''), _nodes.UnderlinedTextNode(''),
+            _nodes.OverlinedTextNode(''), _nodes.StrikethroughTextNode(''), _nodes.FileNode('f'),
+            _nodes.RedirectNode('p'),
+        ]}
+        # noinspection PyProtectedMember
+        self.assertEqual({t.cls for t in _serialization._NODE_TYPES}, tested)
+
+    def test_strings_interned(self):
+        one = parser.encode_node_tree(_nodes.ParagraphNode(_nodes.TextNode('some long text')))
+        two = parser.encode_node_tree(_nodes.ParagraphNode(_nodes.TextNode('some long text'),
+                                                           _nodes.TextNode('some long text')))
+        # Only the tag, string index and subnodes count of the second node are added, not a second copy of the text
+        self.assertEqual(len(one) + 3, len(two))
+
+    def test_large_varints(self):
+        text = 'x' * 100_000
+        self.assertRoundTrip(_nodes.ParagraphNode(*[_nodes.TextNode(f'{text}{i}') for i in range(200)]))
+
+    def test_bad_magic(self):
+        data = parser.encode_node_tree(_nodes.TextNode('a'))
+        with self.assertRaisesMessage(ValueError, 'not an encoded node tree'):
+            parser.decode_node_tree(b'XXXX' + data[4:])
+
+    def test_empty_data(self):
+        with self.assertRaises(ValueError):
+            parser.decode_node_tree(b'')
+
+    def test_unsupported_version(self):
+        data = parser.encode_node_tree(_nodes.TextNode('a'))
+        with self.assertRaisesMessage(ValueError, 'unsupported node tree format version'):
+            parser.decode_node_tree(_serialization.MAGIC + bytes([_serialization.VERSION + 1]) + data[5:])
+
+    def test_missing_version(self):
+        with self.assertRaisesMessage(ValueError, 'unsupported node tree format version'):
+            parser.decode_node_tree(_serialization.MAGIC)
+
+    def test_truncated(self):
+        data = parser.encode_node_tree(_nodes.DocumentNode(_nodes.ParagraphNode(_nodes.TextNode('abc'))))
+        for length in range(len(_serialization.MAGIC) + 1, len(data)):
+            with self.subTest(length=length), self.assertRaises(ValueError):
+                parser.decode_node_tree(data[:length])
+
+    def test_truncated_string(self):
+        data = parser.encode_node_tree(_nodes.TextNode('some text'))
+        with self.assertRaisesMessage(ValueError, 'truncated node tree data'):
+            parser.decode_node_tree(data[:8])
+
+    def test_trailing_data(self):
+        data = parser.encode_node_tree(_nodes.TextNode('a'))
+        with self.assertRaisesMessage(ValueError, 'trailing data after node tree'):
+            parser.decode_node_tree(data + b'\x00')
+
+    def test_unknown_tag(self):
+        # Empty strings table followed by a node with an unassigned tag
+        data = _serialization.MAGIC + bytes([_serialization.VERSION, 0, 0x7f, 0])
+        with self.assertRaisesMessage(ValueError, 'unknown node type tag 127'):
+            parser.decode_node_tree(data)
+
+    def test_invalid_string_index(self):
+        # Empty strings table followed by a text node referencing its first string
+        data = _serialization.MAGIC + bytes([_serialization.VERSION, 0, 5, 1, 0])
+        with self.assertRaisesMessage(ValueError, 'invalid string index 0'):
+            parser.decode_node_tree(data)
+
+    def test_unencodable_node(self):
+        node = _nodes.DocumentNode(_nodes.ParagraphNode(parser.ExtendedHTMLTagNode('tag', True, 'content')))
+        with self.assertRaisesMessage(ValueError, 'cannot encode node of type ExtendedHTMLTagNode'):
+            parser.encode_node_tree(node)
@@ -5,4 +5,5 @@ from . import views
 app_name = 'wikipy_api'
 urlpatterns = [
     path('', views.api_handler, name='index'),
+    path('config/<str:language_code>.<str:version>.js', views.js_config, name='js_config'),
 ]
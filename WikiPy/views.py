@@ -1,3 +1,6 @@
+import functools
+import hashlib
+import itertools
 import json
 import typing as typ
 import urllib.parse as url_parse
@@ -5,8 +8,8 @@ import urllib.parse as url_parse
 import django.core.handlers.wsgi as dj_wsgi
 import django.http as dj_http
 import django.shortcuts as dj_scut
+import django.template.loader as dj_loader
 import django.utils.safestring as dj_safe
-import slimit
 
 from . import apps, web_api, setup, settings, page_context, models, util, skins, page_handlers, special_pages
 from .api import titles as api_titles, pages as api_pages, users as api_users, errors as api_errors
@@ -16,6 +19,8 @@ SESSION_REDIRECTED_FROM = 'redirected_from'
 SESSION_NO_REDIRECT = 'no_redirect'
 # GET keys
 GET_NO_REDIRECT = 'no_redirect'
+# Lifetime of the JavaScript configuration bundles in browser caches, their URL changes with their content
+JS_CONFIG_MAX_AGE = 365 * 24 * 3600
 
 
 def page(request: dj_wsgi.WSGIRequest, raw_page_title: str = '') -> dj_http.HttpResponse:
@@ -93,7 +98,8 @@ def _get_page(
         skin_id=skin_id,
         redirect_enabled=redirect_enabled,
         redirects_list=redirects_list,
-        special_page_kwargs=special_page_kwargs
+        special_page_kwargs=special_page_kwargs,
+        stream=settings.STREAMING_RENDERING
     )
     context, status = action_handler.get_page_context()
 
@@ -105,8 +111,10 @@ def _get_page(
             if getattr(context, 'display_redirect'):
                 if not request.session.get(SESSION_REDIRECTED_FROM):
                     request.session[SESSION_REDIRECTED_FROM] = []
-                # Keep track of all cascading redirections
+                # Keep track of all cascading redirections, including those followed while resolving the target,
+                # so that the target page shows the first one and loops are detected as if each was visited
                 request.session[SESSION_REDIRECTED_FROM].append(page_title)
+                request.session[SESSION_REDIRECTED_FROM].extend(getattr(context, 'followed_redirects', []))
             return _redirect('page', path, anchor=getattr(context, 'redirect_anchor'), **special_page_kwargs)
         else:
             return dj_scut.HttpResponseRedirect(path)
@@ -133,12 +141,47 @@ def _render(request: dj_wsgi.WSGIRequest, wpy_context: page_context.PageContext,
     context = {
         'wpy_context': wpy_context,
         'js_data': dj_safe.mark_safe(_generate_js(wpy_context)),
+        'js_config_url': _get_js_config_url(wpy_context.language),
     }
     for ns in settings.NAMESPACES.values():
         context[f'NS_{ns.canonical_name.upper()}'] = ns.id
 
     template_file = f'{apps.WikiPyConfig.name}/skins/{wpy_context.skin.id}/base.html'
-    return dj_scut.render(request, template_file, context=context, status=status)
+    chunks = getattr(wpy_context, 'rendered_page_chunks', None)
+    if chunks is None:
+        return dj_scut.render(request, template_file, context=context, status=status)
+
+    # Send everything before the content while it is being rendered, then everything after it
+    html = dj_loader.render_to_string(template_file, context=context, request=request)
+    head, placeholder, tail = html.partition(page_context.STREAMED_CONTENT_PLACEHOLDER)
+    if not placeholder:  # The skin does not display the content
+        return dj_http.HttpResponse(html, status=status)
+    return dj_http.StreamingHttpResponse(itertools.chain((head,), chunks, (tail,)), status=status)
+
+
+def js_config(request: dj_wsgi.WSGIRequest, language_code: str, version: str) -> dj_http.HttpResponse:
+    """
+    Returns the script that defines the WPY_CONF values shared by all pages in a language.
+
+    The bundle is served under “<language_code>.<version>.js” where the version is a hash of its content,
+    hence any change to the bundle changes its URL. The current version is cached by browsers
+    for JS_CONFIG_MAX_AGE seconds and marked as immutable. Outdated versions, requested by pages rendered before
+    the bundle changed, get the current bundle without being cached. Unknown languages get a 404 page.
+
+    :param request: The HTTP request.
+    :param language_code: Code of the bundle’s language.
+    :param version: Version of the bundle from the requested URL.
+    :return: The JavaScript response.
+    """
+    if not settings.i18n.get_language(language_code):
+        return handle404(request)
+    script, current_version = _generate_js_config(language_code)
+    response = dj_http.HttpResponse(script, content_type='text/javascript; charset=UTF-8')
+    if version == current_version:
+        response['Cache-Control'] = f'public, max-age={JS_CONFIG_MAX_AGE}, immutable'
+    else:  # Requested by a page rendered before the bundle changed, the current one must not be cached under this URL
+        response['Cache-Control'] = 'no-cache'
+    return response
 
 
 def api_handler(request: dj_wsgi.WSGIRequest):
@@ -193,8 +236,51 @@ def _get_skin_id(user: models.User, request: dj_wsgi.WSGIRequest) -> str:
     return skin_id
 
 
+def _to_js(value) -> str:
+    # Escape closing tags so that the value can be inlined in a script tag
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
 def _generate_js(context: page_context.PageContext) -> str:
-    language = context.language
+    """
+    Generates the script that defines the configuration values specific to the given page and user.
+    Values shared by all pages in the same language are defined by the bundle returned by _generate_js_config().
+    """
+    return 'window.WPY_CONF=' + _to_js({
+        'wpyPageTitle': context.page.title,
+        'wpyUrlPageTitle': context.page.url_title,
+        'wpyFullPageTitle': context.page.full_title,
+        'wpyUrlFullPageTitle': context.page.url_full_title,
+        'wpySpecialPageTitle': getattr(context, 'special_page_title', ''),
+        'wpyUrlSpecialPageTitle': getattr(context, 'url_special_page_title', ''),
+        'wpyCanonicalSpecialPageTitle': getattr(context, 'canonical_special_page_title', ''),
+        'wpyUrlCanonicalSpecialPageTitle': getattr(context, 'url_canonical_special_page_title', ''),
+        'wpyCanonicalNamespaceName': context.page.namespace.get_name(local=False),
+        'wpyUrlCanonicalNamespaceName': context.page.namespace.get_name(local=False, as_url=True),
+        'wpyNamespaceName': context.page.namespace.get_name(local=True),
+        'wpyUrlNamespaceName': context.page.namespace.get_name(local=True, as_url=True),
+        'wpyNamespaceId': str(context.page.namespace_id),
+        'wpyUserName': context.user.username,
+        'wpyUserGroups': list(context.user.group_ids),
+        'wpyUserId': str(context.user.django_user.id),
+        'wpyUserIsLoggedIn': context.user.is_logged_in,
+        'wpyAction': context.mode,
+        'wpySkin': context.skin.id,
+        'wpyContentModel': context.page.content_model,
+    }) + ';'
+
+
+@functools.lru_cache(maxsize=None)
+def _generate_js_config(language_code: str) -> typ.Tuple[str, str]:
+    """
+    Generates the script that defines the configuration values shared by all pages in the given language:
+    namespaces, groups, URL paths and translations.
+    Bundles are generated once per process as translations and namespaces are only loaded on startup.
+
+    :param language_code: Code of the language.
+    :return: The script and its version, the hash of its content.
+    """
+    language = settings.i18n.get_language(language_code)
     ns_name_to_id = {}
     ns_id_to_name = {}
     for ns_id, ns in settings.NAMESPACES.items():
@@ -203,43 +289,25 @@ def _generate_js(context: page_context.PageContext) -> str:
         ns_name_to_id[ns.get_name(local=True)] = ns_id
         if ns.alias:
             ns_name_to_id[ns.alias] = ns_id
-
-    url_path = api_titles.get_wiki_url_path()
-    api_url_path = api_titles.get_api_url_path()
-    groups = {g.name: g.label(context.language) for g in settings.GROUPS.values()}
-
-    return slimit.minify(f"""
-window.WPY_CONF = {{
-    wpyPageTitle: "{context.page.title}",
-    wpyUrlPageTitle: "{context.page.url_title}",
-    wpyFullPageTitle: "{context.page.full_title}",
-    wpyUrlFullPageTitle: "{context.page.url_full_title}",
-    wpySpecialPageTitle: "{getattr(context, 'special_page_title', '')}",
-    wpyUrlSpecialPageTitle: "{getattr(context, 'url_special_page_title', '')}",
-    wpyCanonicalSpecialPageTitle: "{getattr(context, 'canonical_special_page_title', '')}",
-    wpyUrlCanonicalSpecialPageTitle: "{getattr(context, 'url_canonical_special_page_title', '')}",
-    wpyCanonicalNamespaceName: "{context.page.namespace.get_name(local=False)}",
-    wpyUrlCanonicalNamespaceName: "{context.page.namespace.get_name(local=False, as_url=True)}",
-    wpyNamespaceName: "{context.page.namespace.get_name(local=True)}",
-    wpyUrlNamespaceName: "{context.page.namespace.get_name(local=True, as_url=True)}",
-    wpyNamespaceId: "{context.page.namespace_id}",
-    wpyUserName: "{context.user.username}",
-    wpyUserGroups: {context.user.group_ids},
-    wpyUserId: "{context.user.django_user.id}",
-    wpyUserIsLoggedIn: {str(context.user.is_logged_in).lower()},
-    wpyAction: "{context.mode}",
-    wpySkin: "{context.skin.id}",
-    wpyLanguageCode: "{language.code}",
-    wpyLanguageCodes: {[lang.name for lang in context.languages]},
-    wpyWritingDirection: "{language.writing_direction}",
-    wpyContentModel: "{context.page.content_model}",
-    wpyMainNamespaceName: "{language.main_namespace_name}",
-    wpyAllNamespacesName: "{language.translate('form.all_namespaces')}",
-    wpyNamespaces: {ns_id_to_name},
-    wpyNamespacesIds: {ns_name_to_id},
-    wpyGroups: {groups},
-    wpyUrlPath: "{url_path}",
-    wpyApiUrlPath: "{api_url_path}",
-    wpyTranslations: {json.dumps(language.javascript_mappings)}
-}};
-""")
+    languages = sorted(settings.i18n.get_languages().values(), key=lambda l: l.name)
+
+    # Values of the page’s script take precedence
+    script = 'window.WPY_CONF=Object.assign(' + _to_js({
+        'wpyLanguageCode': language.code,
+        'wpyLanguageCodes': [lang.name for lang in languages],
+        'wpyWritingDirection': language.writing_direction,
+        'wpyMainNamespaceName': language.main_namespace_name,
+        'wpyAllNamespacesName': language.translate('form.all_namespaces'),
+        'wpyNamespaces': ns_id_to_name,
+        'wpyNamespacesIds': ns_name_to_id,
+        'wpyGroups': {g.name: g.label(language) for g in settings.GROUPS.values()},
+        'wpyUrlPath': api_titles.get_wiki_url_path(),
+        'wpyApiUrlPath': api_titles.get_api_url_path(),
+        'wpyTranslations': language.javascript_mappings,
+    }) + ',window.WPY_CONF);'
+    return script, hashlib.sha1(script.encode('UTF-8')).hexdigest()[:16]
+
+
+def _get_js_config_url(language: settings.i18n.Language) -> str:
+    _, version = _generate_js_config(language.code)
+    return dj_scut.reverse('wikipy_api:js_config', kwargs={'language_code': language.code, 'version': version})